@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+build_cache
+===========
+
+Content-hash build cache for the generated artifacts: solver code, Godley
+md/tex/pdf, the LaTeX model document and the HTML report.
+
+Each artifact is a target with a set of input files (the model TOML,
+templates, result files and the source of the tool that builds it, which
+stands in for the generator version) and options.  The target is rebuilt
+only when the SHA-256 of an input or an option changes, or when an output
+is missing or was changed since it was built.  `models/.build_manifest.json`
+records, per target, the input and output hashes, when it was built and
+how long that took:
+```json
+{"version": 1,
+ "targets": {"models/pendulum_cmdl.jl": {
+     "inputs": {"models/pendulum.toml": "9f2c...", ...},
+     "params": {}, "outputs": {"models/pendulum_cmdl.jl": "41be..."},
+     "built": "2025-06-01T12:00:00", "seconds": 0.012}},
+ "files": {"models/pendulum.toml": {"size": 812, "mtime_ns": ..., "sha256": "9f2c..."}}}
+```
+Files are hashed at most once per change: `files` keeps each hash with the
+file's size and mtime.  `write_if_changed` leaves identical outputs
+untouched, so their mtimes (and anything keyed on them downstream, such as
+Julia precompilation) survive a rebuild.
+
+Every tool takes `--force` to rebuild regardless.
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import time
+
+MANIFEST_PATH = Path("models") / ".build_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def sha256_file(path, chunk=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(chunk):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_if_changed(path, text):
+    """Write `text` to `path` unless it already holds exactly that.
+    Returns True if the file was written."""
+    path = Path(path)
+    data = text.encode()
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+class BuildCache:
+    """Targets, their input/output hashes and build times, kept in a JSON
+    manifest."""
+    def __init__(self, manifest_path=MANIFEST_PATH):
+        self.manifest_path = Path(manifest_path)
+        self.manifest = self._load()
+
+    def _load(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except (FileNotFoundError, ValueError):
+            pass
+        return {"version": MANIFEST_VERSION, "targets": {}, "files": {}}
+
+    def save(self):
+        """Merge into the manifest on disk (another tool may have recorded
+        targets meanwhile) and replace it atomically."""
+        on_disk = self._load()
+        on_disk["targets"].update(self.manifest["targets"])
+        on_disk["files"].update(self.manifest["files"])
+        self.manifest = on_disk
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_name(self.manifest_path.name + f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def file_hash(self, path):
+        """SHA-256 of a file, or None if it doesn't exist.  Reuses the hash
+        recorded for the same size and mtime."""
+        key = str(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.manifest["files"].pop(key, None)
+            return None
+        known = self.manifest["files"].get(key)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            return known["sha256"]
+        digest = sha256_file(path)
+        self.manifest["files"][key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def _hashes(self, paths):
+        return {str(p): self.file_hash(p) for p in paths}
+
+    def is_fresh(self, target, inputs, outputs, params=None):
+        """True if `target` was built from these inputs and options and its
+        outputs are still as built."""
+        entry = self.manifest["targets"].get(str(target))
+        if entry is None:
+            return False
+        if entry["params"] != json.loads(json.dumps(params or {})):
+            return False
+        if entry["inputs"] != self._hashes(inputs):
+            return False
+        current = self._hashes(outputs)
+        return None not in current.values() and entry["outputs"] == current
+
+    def record(self, target, inputs, outputs, params=None, seconds=0.0):
+        self.manifest["targets"][str(target)] = {
+            "inputs": self._hashes(inputs),
+            "params": json.loads(json.dumps(params or {})),
+            "outputs": self._hashes(outputs),
+            "built": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(seconds, 6),
+        }
+        self.save()
+
+    def build(self, target, inputs, outputs, action, params=None, force=False):
+        """Run `action()` to make `outputs` unless the target is fresh.
+        Returns True if it ran."""
+        if not force and self.is_fresh(target, inputs, outputs, params):
+            print(f"Up to date: {target}")
+            return False
+        start = time.perf_counter()
+        action()
+        self.record(target, inputs, outputs, params, time.perf_counter() - start)
+        return True
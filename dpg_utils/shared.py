@@ -9,11 +9,11 @@ from multiprocessing import shared_memory
 import os
 import toml
 import subprocess
+from shared_mem import attach_segment, create_ctypes_struct, new_session_name
 
 # -------- Configuration --------
 INIT_PATH = "./init"
 MODELS_DIR = "./models"
-SHM_NAME = "pukaha_shared"
 
 
 def load_model_spec(model_path):
@@ -37,31 +37,16 @@ def load_model_spec(model_path):
     return parsed
 
 
-def create_ctypes_struct(param_dict):
-    """Enhanced struct creation - order matters for Julia compatibility"""
-    fields = [("state", ctypes.c_char)]
-    # Add t0, t1 first (to match Julia struct order)
-    if "t0" in param_dict:
-        fields.append(("t0", ctypes.c_double))
-    if "t1" in param_dict:
-        fields.append(("t1", ctypes.c_double))
-    
-    # Add other parameters
-    for name, (typ, _) in param_dict.items():
-        if name not in ["t0", "t1"]:  # Skip these, already added
-            fields.append((name, getattr(ctypes, typ)))
-    return type("ParamStruct", (ctypes.Structure,), {"_fields_": fields})
-
-
 class SharedSimState:
-    def __init__(self, param_dict):
+    def __init__(self, param_dict, model_name="model", session=None):
+        self.session = session or new_session_name(model_name)
         self.ParamStruct = create_ctypes_struct(param_dict)
         self.struct_size = ctypes.sizeof(self.ParamStruct)
         try:
-            self.shm = shared_memory.SharedMemory(name=SHM_NAME, create=True, size=self.struct_size)
+            self.shm = shared_memory.SharedMemory(name=self.session, create=True, size=self.struct_size)
             self.is_owner = True
         except FileExistsError:
-            self.shm = shared_memory.SharedMemory(name=SHM_NAME, create=False, size=self.struct_size)
+            self.shm = attach_segment(self.session)
             self.is_owner = False
         
         self.buf = self.shm.buf
@@ -109,7 +94,7 @@ class SharedSimState:
             
         try:
             self.julia_process = subprocess.Popen(
-                ["julia", julia_script],
+                ["julia", julia_script, self.session],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True  # For easier debugging
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+eigen_analysis
+==============
+
+Post-hoc stability analysis: eigenvalues of the Jacobian df/du along an
+existing trajectory, computed in Python from the model's generated NumPy
+right-hand side (`models/<model>_numpy.py`).
+
+Nothing has to be switched on before the run and the solver's step loop is
+left alone.  The Jacobians of all sampled time steps are built at once as a
+`(T, n, n)` stack, by batched central differences or the complex-step
+method, and `np.linalg.eigvals` takes the whole stack.  The result goes to
+`models/<model>_eigen.pkr`, the same eigen result format the Julia
+solvers write, so `stability.py` and `plots4model.py` pick it up: the
+report includes its stability section whenever that file exists, without
+`[eigenvalues] all` (which is only needed for the in-solver analysis).
+
+Example:
+```bash
+python numpy_solver.py pendulum               # or julia models/pendulum_cmdl.jl
+python eigen_analysis.py pendulum --stride 10
+./plots4model.py pendulum
+```
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+from pathlib import Path
+import time
+import numpy as np
+
+from numpy_solver import MODELS_DIR, load_backend, model_params
+from result_io import RESULT_SUFFIX, load_result, write_result
+
+JACOBIAN_METHODS = ("central", "complex")
+COMPLEX_STEP = 1e-20
+MAX_BATCH_ELEMENTS = 1 << 22   # bound on T * n * n per batch
+
+
+def batched_jacobian(rhs, t, u, p, method="central"):
+    """Jacobians df/du at every row of `u` `(T, n)`, as a `(T, n, n)` array.
+
+    Each state is perturbed one variable at a time in a single broadcast
+    call: the perturbed states are stacked as `(T, n, n)` (row `j` of
+    sample `k` is `u[k] + h e_j`) and `rhs` evaluates them all together.
+    The complex step needs an `rhs` that is analytic in `u` (no `abs`,
+    `max`, `min`); central differences work for any `rhs`.
+    """
+    t = np.asarray(t, dtype=np.float64)[:, None]   # broadcasts over the perturbations
+    u = np.asarray(u, dtype=np.float64)
+    n = u.shape[1]
+    eye = np.eye(n)
+    if method == "complex":
+        f = rhs(t, u[:, None, :] + 1j * COMPLEX_STEP * eye, p)
+        return np.swapaxes(f.imag / COMPLEX_STEP, 1, 2)
+    if method != "central":
+        raise ValueError(f"Unknown Jacobian method '{method}' (use one of {JACOBIAN_METHODS})")
+    # Step balancing truncation against round-off, scaled per variable
+    h = np.cbrt(np.finfo(np.float64).eps) * np.maximum(np.abs(u), 1.0)
+    step = h[:, :, None] * eye
+    f_plus = rhs(t, u[:, None, :] + step, p)
+    f_minus = rhs(t, u[:, None, :] - step, p)
+    return np.swapaxes((f_plus - f_minus) / (2.0 * h[:, :, None]), 1, 2)
+
+
+def trajectory_eigenvalues(rhs, t, u, p, method="central"):
+    """Eigenvalues of df/du along a trajectory, `(T, n)` complex128.
+
+    Works in batches so the `(T, n, n)` stacks stay bounded in memory.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    u = np.asarray(u, dtype=np.float64)
+    n = u.shape[1]
+    eigs = np.empty((len(t), n), dtype=np.complex128)
+    batch = max(MAX_BATCH_ELEMENTS // (n * n), 1)
+    for start in range(0, len(t), batch):
+        stop = start + batch
+        J = batched_jacobian(rhs, t[start:stop], u[start:stop], p, method)
+        eigs[start:stop] = np.linalg.eigvals(J)
+    return eigs
+
+
+def analyze_result(model_name, stride=1, method="central", params=None, models_dir=MODELS_DIR):
+    """Eigenanalysis of a model's latest result file, every `stride`-th
+    sample.  Writes `<model>_eigen.pkr` and returns `(path, t, eigs)`."""
+    backend = load_backend(model_name, models_dir)
+    result = load_result(model_name, models_dir)
+    t = np.asarray(result.column("t"))[::stride]
+    u = result.columns(backend.VARIABLE_NAMES)[::stride]
+    eigs = trajectory_eigenvalues(backend.rhs, t, u, model_params(backend, params), method)
+    names = ["t"] + [f"e{i + 1}" for i in range(eigs.shape[1])]
+    path = Path(models_dir) / f"{model_name}_eigen{RESULT_SUFFIX}"
+    write_result(path, names, np.column_stack([t, eigs]), dtype=np.complex128)
+    return path, t, eigs
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Jacobian eigenvalues along a model's stored trajectory.")
+    parser.add_argument("model_name", help="Model in ./models, e.g. pendulum")
+    parser.add_argument("--stride", type=int, default=1, help="Use every n-th time sample (default: 1)")
+    parser.add_argument("--method", choices=JACOBIAN_METHODS, default="central",
+                        help="Jacobian by central differences or complex step (default: central)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path, t, eigs = analyze_result(args.model_name, args.stride, args.method)
+    elapsed = time.perf_counter() - start
+    max_real = np.fmax.reduce(eigs.real, axis=1)
+    print(f"Wrote {len(t)} x {eigs.shape[1]} eigenvalues to {path} in {elapsed:.3f}s")
+    print(f"max Re(λ) ranges from {np.nanmin(max_real):.4g} to {np.nanmax(max_real):.4g}")
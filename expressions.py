@@ -0,0 +1,857 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+expressions
+===========
+
+One parser for the model expressions in the TOML specs (the Julia-like
+right-hand sides of `[equations]` and the Godley flow amounts).
+
+`parse(text)` tokenizes and parses an expression into a small AST once and
+caches it, so the code generator, the plotting tools and the LaTeX export
+all share the same tree and symbol set instead of re-scanning the string
+with regular expressions:
+
+```python
+>>> e = parse("-damping * omega - (g / length) * sin(theta)")
+>>> sorted(e.symbols)
+['damping', 'g', 'length', 'omega', 'theta']
+>>> e.to_numpy()
+'-damping * omega - (g / length) * np.sin(theta)'
+>>> e.to_latex()
+'-damping \\cdot \\omega - \\frac{g}{length} \\cdot \\sin\\left(\\theta\\right)'
+```
+
+The grammar is the part of Julia the models use: numbers, names, calls,
+`+ - * / ^` (and their dotted forms), unary `+ -`, comparisons, parentheses
+and numeric coefficients such as `2x`.  Precedence follows Julia: `^` is
+right associative and binds tighter than unary minus (`-x^2 == -(x^2)`).
+Emitters keep the parentheses written in the model and add only those the
+target language needs.
+
+`derivative` differentiates a tree symbolically and `jacobian` assembles
+the sparse Jacobian of a set of equations by the chain rule, for the
+generated `jac!` and `jac_prototype`.
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+from collections import deque
+from functools import lru_cache
+import keyword
+import re
+
+
+class ExpressionError(ValueError):
+    """A model expression that cannot be tokenized or parsed."""
+
+
+# -------- Syntax tree --------
+# Binding powers, as in Julia
+COMPARISON, SUM, PRODUCT, PREFIX, POWER, ATOM = 10, 20, 30, 40, 50, 100
+BINARY_POWER = {
+    "<": COMPARISON, "<=": COMPARISON, ">": COMPARISON, ">=": COMPARISON,
+    "==": COMPARISON, "!=": COMPARISON,
+    "+": SUM, "-": SUM, "*": PRODUCT, "/": PRODUCT, "^": POWER,
+}
+BINARY_POWER.update({"." + op: BINARY_POWER[op] for op in "+-*/^"})   # broadcasting
+
+
+def _binding_power(op):
+    return BINARY_POWER.get(op)
+
+
+class Node:
+    __slots__ = ("grouped",)
+    fields = ()
+    power = ATOM
+
+    def __repr__(self):
+        args = ", ".join(repr(getattr(self, f)) for f in self.fields)
+        return f"{type(self).__name__}({args})"
+
+
+class Number(Node):
+    """A numeric literal, kept as written."""
+    __slots__ = ("text",)
+    fields = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+        self.grouped = False
+
+
+class Name(Node):
+    __slots__ = ("id",)
+    fields = ("id",)
+
+    def __init__(self, id):
+        self.id = id
+        self.grouped = False
+
+
+class Unary(Node):
+    __slots__ = ("op", "operand")
+    fields = ("op", "operand")
+    power = PREFIX
+
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+        self.grouped = False
+
+
+class Binary(Node):
+    """`op` is the operator as written, e.g. `.*`; `base_op` drops the dot."""
+    __slots__ = ("op", "left", "right", "power")
+    fields = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.grouped = False
+        self.power = _binding_power(op)
+
+    @property
+    def base_op(self):
+        return self.op[1:] if self.op.startswith(".") else self.op
+
+
+class Call(Node):
+    __slots__ = ("func", "args")
+    fields = ("func", "args")
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = tuple(args)
+        self.grouped = False
+
+
+# -------- Tokenizer --------
+TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<number>(?:\d[\d_]*(?:\.[\d_]*)?|\.\d[\d_]*)(?:[eE][+-]?\d+)?)
+    | (?P<name>[^\W\d]\w*)
+    | (?P<op>\.[-+*/^]|[<>=!]=|[-+*/^<>(),])
+    )""", re.VERBOSE)
+
+
+def tokenize(text):
+    """`(kind, value, position)` tokens, ending with `("end", "", len(text))`."""
+    tokens = []
+    pos = 0
+    end = len(text.rstrip())
+    for m in TOKEN.finditer(text, 0, end):
+        if m.start() != pos:
+            break
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind), m.start(kind)))
+        pos = m.end()
+    if pos < end:
+        pos += len(text[pos:]) - len(text[pos:].lstrip())
+        raise ExpressionError(f"Unexpected character {text[pos]!r} at position {pos} in '{text}'")
+    tokens.append(("end", "", end))
+    return tokens
+
+
+# -------- Parser --------
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.i = 0
+        self.symbols = set()
+        self.functions = set()
+
+    def peek(self):
+        return self.tokens[self.i]
+
+    def advance(self):
+        token = self.tokens[self.i]
+        self.i += 1
+        return token
+
+    def error(self, message):
+        _, value, pos = self.peek()
+        found = f"'{value}'" if value else "end of expression"
+        return ExpressionError(f"{message}, found {found} at position {pos} in '{self.text}'")
+
+    def expect(self, value):
+        if self.peek()[1] != value:
+            raise self.error(f"Expected '{value}'")
+        self.advance()
+
+    def parse(self):
+        node = self.expression(0)
+        if self.peek()[0] != "end":
+            raise self.error("Unexpected token")
+        return node
+
+    def expression(self, min_power):
+        left = self.prefix()
+        while True:
+            kind, op, _ = self.peek()
+            power = _binding_power(op) if kind == "op" else None
+            if power is None or power <= min_power:
+                return left
+            self.advance()
+            # ^ is right associative: a^b^c is a^(b^c)
+            right = self.expression(power - 1 if power == POWER else power)
+            left = Binary(op, left, right)
+
+    def prefix(self):
+        kind, value, _ = self.peek()
+        if kind == "op" and value in ("-", "+"):
+            self.advance()
+            # Unary minus binds looser than ^: -x^2 is -(x^2)
+            return Unary(value, self.expression(PREFIX))
+        return self.primary()
+
+    def primary(self):
+        kind, value, _ = self.advance()
+        if kind == "number":
+            node = Number(value)
+            nxt_kind, nxt, _ = self.peek()
+            if nxt_kind == "name" or nxt == "(":
+                # Numeric coefficient, 2x or 2(x + 1): binds tighter than * and /
+                node = Binary("*", node, self.expression(PREFIX))
+            return node
+        if kind == "name":
+            if self.peek()[1] == "(":
+                self.advance()
+                args = []
+                if self.peek()[1] != ")":
+                    args.append(self.expression(0))
+                    while self.peek()[1] == ",":
+                        self.advance()
+                        args.append(self.expression(0))
+                self.expect(")")
+                self.functions.add(value)
+                return Call(value, args)
+            self.symbols.add(value)
+            return Name(value)
+        if value == "(":
+            node = self.expression(0)
+            self.expect(")")
+            node.grouped = True
+            return node
+        self.i -= 1
+        raise self.error("Expected a number, name or '('")
+
+
+class Expression:
+    """A parsed model expression: the syntax `tree`, the `symbols` (names
+    it reads) and `functions` (names it calls)."""
+    __slots__ = ("text", "tree", "symbols", "functions")
+
+    def __init__(self, text):
+        parser = _Parser(text)
+        self.text = text
+        self.tree = parser.parse()
+        self.symbols = frozenset(parser.symbols)
+        self.functions = frozenset(parser.functions)
+
+    def __repr__(self):
+        return f"Expression({self.text!r})"
+
+    def to_julia(self, names=None):
+        return to_julia(self.tree, names)
+
+    def to_numpy(self, names=None):
+        return to_numpy(self.tree, names)
+
+    def to_latex(self, symbols=None, dotted=False, variables=()):
+        return to_latex(self.tree, symbols, dotted, variables)
+
+
+@lru_cache(maxsize=None)
+def parse(text):
+    """The parsed `Expression` for `text` (cached: each distinct expression
+    is parsed once per process)."""
+    return Expression(text)
+
+
+# -------- Dependency graph --------
+class CircularDependencyError(ValueError):
+    """Equations that depend on each other; `components` lists each cycle
+    (strongly connected component) by equation name, `a -> b` reading
+    "a uses b"."""
+    def __init__(self, components):
+        self.components = components
+        cycles = "; ".join(" -> ".join(c + [c[0]]) for c in components)
+        super().__init__(f"Circular dependency between equations: {cycles}")
+
+
+def dependency_graph(equations, known=None, aliases=None):
+    """`{name: names in known that its expression uses}` for a dict of
+    `{name: expression}`; `known` defaults to the equation names.
+
+    One parse per expression and a hash lookup per symbol, so building the
+    graph is linear in the size of the model.  `aliases` maps symbols to
+    the equation they stand for (e.g. `dX` to `f_X`).
+    """
+    known = equations.keys() if known is None else known
+    graph = {}
+    for name, expr in equations.items():
+        symbols = parse(expr).symbols
+        if aliases:
+            symbols = {aliases.get(s, s) for s in symbols}
+        graph[name] = {s for s in symbols if s in known}
+    return graph
+
+
+def topological_order(graph):
+    """Kahn's algorithm over `{name: dependencies}`, keeping the given order
+    among equations that are ready together.
+
+    Returns `(order, blocked)`: blocked names are on a cycle (a name that
+    uses itself is one) or depend on one.
+    """
+    users = {name: [] for name in graph}
+    waiting = {}
+    for name, deps in graph.items():
+        waiting[name] = len(deps)
+        for dep in deps:
+            users[dep].append(name)
+    ready = deque(name for name in graph if waiting[name] == 0)
+    order = []
+    while ready:
+        name = ready.popleft()
+        order.append(name)
+        for user in users[name]:
+            waiting[user] -= 1
+            if waiting[user] == 0:
+                ready.append(user)
+    done = set(order)
+    return order, [name for name in graph if name not in done]
+
+
+def strongly_connected_components(graph, nodes=None):
+    """The cycles of `graph`: its strongly connected components with more
+    than one member, or a single member that uses itself (iterative Tarjan,
+    restricted to `nodes` if given)."""
+    nodes = list(graph) if nodes is None else list(nodes)
+    inside = set(nodes)
+    index, low, on_stack = {}, {}, set()
+    stack, components = [], []
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(sorted(graph[root] & inside)))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, deps = work[-1]
+            for dep in deps:
+                if dep not in index:
+                    index[dep] = low[dep] = len(index)
+                    stack.append(dep)
+                    on_stack.add(dep)
+                    work.append((dep, iter(sorted(graph[dep] & inside))))
+                    break
+                if dep in on_stack:
+                    low[node] = min(low[node], index[dep])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in graph[node]:
+                        components.append(component[::-1])
+    return components
+
+
+def sort_equations(equations, aliases=None):
+    """Equation names in an order where each comes after the equations it
+    uses.  Raises `CircularDependencyError` naming the cycles."""
+    graph = dependency_graph(equations, aliases=aliases)
+    order, blocked = topological_order(graph)
+    if blocked:
+        raise CircularDependencyError(strongly_connected_components(graph, blocked))
+    return order
+
+
+# -------- Differentiation --------
+# Nodes built by `derivative`, folding the zeros and ones the product and
+# chain rules produce.  `None` stands for an exact zero.
+ZERO = Number("0.0")
+ONE = Number("1.0")
+
+
+def _value(node):
+    if isinstance(node, Number):
+        return float(node.text.replace("_", ""))
+    if isinstance(node, Unary) and isinstance(node.operand, Number):
+        value = _value(node.operand)
+        return -value if node.op == "-" else value
+    return None
+
+
+def _number(value):
+    value = float(value)
+    if value < 0:
+        return Unary("-", _number(-value))
+    return Number(str(int(value)) if value.is_integer() else repr(value))
+
+
+def _neg(a):
+    if a is None:
+        return None
+    if isinstance(a, Unary) and a.op == "-":
+        return a.operand
+    return Unary("-", a)
+
+
+def _add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if isinstance(b, Unary) and b.op == "-":
+        return Binary("-", a, b.operand)
+    return Binary("+", a, b)
+
+
+def _sub(a, b):
+    return _add(a, _neg(b))
+
+
+def _mul(a, b):
+    if a is None or b is None:
+        return None
+    if _value(a) == 1.0:
+        return b
+    if _value(b) == 1.0:
+        return a
+    if isinstance(a, Unary) and a.op == "-":
+        return _neg(_mul(a.operand, b))
+    if isinstance(b, Unary) and b.op == "-":
+        return _neg(_mul(a, b.operand))
+    return Binary("*", a, b)
+
+
+def _div(a, b):
+    if a is None:
+        return None
+    if _value(b) == 1.0:
+        return a
+    if isinstance(a, Unary) and a.op == "-":
+        return _neg(_div(a.operand, b))
+    return Binary("/", a, b)
+
+
+def _pow(a, b):
+    if _value(b) == 1.0:
+        return a
+    return Binary("^", a, b)
+
+
+def _call(func, *args):
+    return Call(func, args)
+
+
+# d f(x) / dx for the functions the models use, in terms of x
+_CHAIN_RULES = {
+    "sin": lambda x: _call("cos", x),
+    "cos": lambda x: _neg(_call("sin", x)),
+    "tan": lambda x: _add(ONE, _pow(_call("tan", x), Number("2"))),
+    "sinh": lambda x: _call("cosh", x),
+    "cosh": lambda x: _call("sinh", x),
+    "tanh": lambda x: _sub(ONE, _pow(_call("tanh", x), Number("2"))),
+    "exp": lambda x: _call("exp", x),
+    "log": lambda x: _div(ONE, x),
+    "log10": lambda x: _div(ONE, _mul(x, _call("log", Number("10")))),
+    "sqrt": lambda x: _div(ONE, _mul(Number("2"), _call("sqrt", x))),
+    "asin": lambda x: _div(ONE, _call("sqrt", _sub(ONE, _pow(x, Number("2"))))),
+    "acos": lambda x: _neg(_div(ONE, _call("sqrt", _sub(ONE, _pow(x, Number("2")))))),
+    "atan": lambda x: _div(ONE, _add(ONE, _pow(x, Number("2")))),
+    "abs": lambda x: _call("sign", x),
+}
+
+
+def derivative(node, symbol):
+    """The syntax tree of d node / d symbol, or None where it is zero.
+
+    Comparisons and `sign` are piecewise constant; `max`, `min` and
+    `ifelse` differentiate the branch they select.
+    """
+    if isinstance(node, Number):
+        return None
+    if isinstance(node, Name):
+        return ONE if node.id == symbol else None
+    if isinstance(node, Unary):
+        d = derivative(node.operand, symbol)
+        return _neg(d) if node.op == "-" else d
+    if isinstance(node, Call):
+        return _call_derivative(node, symbol)
+    op = node.base_op
+    if node.power == COMPARISON:
+        return None
+    # Long sums are differentiated term by term in a loop
+    if op in ("+", "-"):
+        terms = []
+        while isinstance(node, Binary) and node.base_op in ("+", "-"):
+            d = derivative(node.right, symbol)
+            terms.append(_neg(d) if node.base_op == "-" else d)
+            node = node.left
+        result = derivative(node, symbol)
+        for d in reversed(terms):
+            result = _add(result, d)
+        return result
+    a, b = node.left, node.right
+    da, db = derivative(a, symbol), derivative(b, symbol)
+    if op == "*":
+        return _add(_mul(da, b), _mul(a, db))
+    if op == "/":
+        return _sub(_div(da, b), _div(_mul(a, db), _pow(b, Number("2"))))
+    if op == "^":
+        if db is None:
+            exponent = _value(b)
+            reduced = _number(exponent - 1) if exponent is not None else _sub(b, ONE)
+            return _mul(_mul(b, _pow(a, reduced)), da)
+        return _mul(node, _add(_mul(db, _call("log", a)), _div(_mul(b, da), a)))
+    raise ExpressionError(f"Cannot differentiate operator '{node.op}'")
+
+
+def _call_derivative(node, symbol):
+    func, args = node.func, node.args
+    if func == "sign":
+        return None
+    if func in ("max", "min", "ifelse") and len(args) == (3 if func == "ifelse" else 2):
+        if func == "ifelse":
+            condition, branches = args[0], args[1:]
+        else:
+            condition = Binary(">=" if func == "max" else "<=", *args)
+            branches = args
+        da, db = (derivative(arg, symbol) for arg in branches)
+        if da is None and db is None:
+            return None
+        return _call("ifelse", condition, da or ZERO, db or ZERO)
+    if func in _CHAIN_RULES and len(args) == 1:
+        d = derivative(args[0], symbol)
+        return _mul(_CHAIN_RULES[func](args[0]), d) if d is not None else None
+    raise ExpressionError(f"Cannot differentiate '{func}' with {len(args)} argument(s)")
+
+
+def _is_simple(node):
+    if isinstance(node, Unary):
+        node = node.operand
+    return isinstance(node, (Name, Number))
+
+
+def partial_name(name, variable):
+    """Name of the temporary holding d name / d variable in generated code."""
+    return f"J_{name}__{variable}"
+
+
+class JacobianTooLarge(ExpressionError):
+    """The Jacobian has more nonzero entries than asked for."""
+
+
+def jacobian(equations, order, variables, aliases=None, max_entries=None):
+    """Symbolic Jacobian of `equations` with respect to `variables`, by the
+    chain rule through the intermediate (e.g. auxiliary) equations.
+
+    `order` is a dependency order of the equation names (see
+    `sort_equations`) and `aliases` maps symbols to the equation they stand
+    for.  Every equation gets a row `{variable: tree}` over the variables it
+    depends on, directly or through other equations: the sparsity pattern
+    of the dependency graph.  Entries that are not a (negated) name or
+    number are computed once, as temporaries named by `partial_name`, so a chain of
+    auxiliary equations costs one term per link.
+
+    Returns `(partials, rows)`: `partials` lists `(temporary, tree)` in
+    evaluation order, `rows` maps each equation to its row, with `ZERO`
+    where a dependency has no derivative (e.g. through a comparison).
+    Raises `JacobianTooLarge` once more than `max_entries` entries are
+    needed, and `ExpressionError` for functions it cannot differentiate.
+    """
+    aliases = aliases or {}
+    variables = set(variables)
+    # The pattern first, which is cheap, so an oversized Jacobian is
+    # refused before any derivative is built
+    sources, pattern = {}, {}
+    n_entries = 0
+    for name in order:
+        sources[name] = {}
+        for symbol in sorted(parse(equations[name]).symbols):
+            target = aliases.get(symbol, symbol)
+            if target in variables or target in pattern:
+                sources[name][symbol] = target
+        columns = set()
+        for target in sources[name].values():
+            if target in variables:
+                columns.add(target)
+            else:
+                columns |= pattern[target]
+        pattern[name] = columns
+        n_entries += len(columns)
+        if max_entries is not None and n_entries > max_entries:
+            raise JacobianTooLarge(f"Jacobian needs more than {max_entries} entries")
+
+    partials, rows = [], {}
+    for name in order:
+        tree = parse(equations[name]).tree
+        row = dict.fromkeys(sorted(pattern[name]))
+        for symbol, target in sources[name].items():
+            d = derivative(tree, symbol)
+            through = {target: ONE} if target in variables else rows[target]
+            for variable, chain in through.items():
+                term = _mul(d, None if chain is ZERO else chain)
+                row[variable] = _add(row[variable], term)
+        for variable, entry in row.items():
+            if entry is None:
+                row[variable] = ZERO
+            elif not _is_simple(entry):
+                temporary = partial_name(name, variable)
+                partials.append((temporary, entry))
+                row[variable] = Name(temporary)
+        rows[name] = row
+    return partials, rows
+
+
+# -------- Emitters --------
+def _wrap(text, needed):
+    return f"({text})" if needed else text
+
+
+def _emit_binary(node, emit, op_text):
+    """Emit a binary node, parenthesising operands where the grouping would
+    otherwise change.  Left-nested chains of one precedence (`a + b - c`)
+    are emitted in a loop, so long sums don't recurse once per term."""
+    power = node.power
+    if node.base_op == "^" or power == COMPARISON:
+        # ^ is right associative; comparisons chain in Julia and Python
+        left, right = node.left, node.right
+        lp, rp = left.power, right.power
+        return (_wrap(emit(left), left.grouped or lp <= power)
+                + op_text(node.op)
+                + _wrap(emit(right), right.grouped or rp < power or (power == COMPARISON and rp == power)))
+    chain = []
+    while True:
+        chain.append(node)
+        node = node.left
+        if node.grouped or node.power != power:
+            break
+    parts = [_wrap(emit(node), node.grouped or node.power < power)]
+    for link in reversed(chain):
+        right = link.right
+        parts.append(op_text(link.op))
+        parts.append(_wrap(emit(right), right.grouped or right.power <= power))
+    return "".join(parts)
+
+
+def _unary_operand(node, emit):
+    operand = emit(node.operand)
+    if node.operand.grouped or node.operand.power < PREFIX or isinstance(node.operand, Unary):
+        operand = f"({operand})"
+    return operand
+
+
+def _julia_op(op):
+    return op if op in ("^", ".^") else f" {op} "
+
+
+def to_julia(node, names=None):
+    """Julia source for `node`; `names` maps identifiers to replacement text."""
+    names = names or {}
+
+    def emit(node):
+        if isinstance(node, Number):
+            return node.text
+        if isinstance(node, Name):
+            return names.get(node.id, node.id)
+        if isinstance(node, Unary):
+            return node.op + _unary_operand(node, emit)
+        if isinstance(node, Call):
+            return f"{node.func}({', '.join(emit(a) for a in node.args)})"
+        return _emit_binary(node, emit, _julia_op)
+
+    return emit(node)
+
+
+# Julia functions in model expressions and their NumPy (broadcasting) forms
+NUMPY_FUNCTIONS = {
+    "sin": "np.sin", "cos": "np.cos", "tan": "np.tan",
+    "asin": "np.arcsin", "acos": "np.arccos", "atan": "np.arctan",
+    "sinh": "np.sinh", "cosh": "np.cosh", "tanh": "np.tanh",
+    "exp": "np.exp", "log": "np.log", "log10": "np.log10", "sqrt": "np.sqrt",
+    "abs": "np.abs", "sign": "np.sign", "max": "np.maximum", "min": "np.minimum",
+    "ifelse": "np.where",
+}
+NUMPY_CONSTANTS = {"pi": "np.pi", "π": "np.pi", "ℯ": "np.e", "Inf": "np.inf", "NaN": "np.nan"}
+
+
+def python_name(name):
+    """Model names that are Python keywords (e.g. `lambda`) get a trailing _"""
+    return f"{name}_" if keyword.iskeyword(name) else name
+
+
+def _numpy_op(op):
+    op = op[1:] if op.startswith(".") else op
+    return "**" if op == "^" else f" {op} "
+
+
+def to_numpy(node, names=None):
+    """NumPy source for `node`.  `names` maps identifiers to replacement
+    text; other names are Julia constants or pass through `python_name`."""
+    names = names or {}
+
+    def emit(node):
+        if isinstance(node, Number):
+            return node.text
+        if isinstance(node, Name):
+            if node.id in names:
+                return names[node.id]
+            return NUMPY_CONSTANTS.get(node.id) or python_name(node.id)
+        if isinstance(node, Unary):
+            return node.op + _unary_operand(node, emit)
+        if isinstance(node, Call):
+            func = NUMPY_FUNCTIONS.get(node.func, python_name(node.func))
+            return f"{func}({', '.join(emit(a) for a in node.args)})"
+        return _emit_binary(node, emit, _numpy_op)
+
+    return emit(node)
+
+
+# -------- LaTeX --------
+GREEK = {
+    "alpha", "beta", "gamma", "delta", "epsilon", "varepsilon", "zeta", "eta",
+    "theta", "vartheta", "iota", "kappa", "lambda", "mu", "nu", "xi", "pi",
+    "varpi", "rho", "varrho", "sigma", "varsigma", "tau", "upsilon", "phi",
+    "varphi", "chi", "psi", "omega",
+    "Gamma", "Delta", "Theta", "Lambda", "Xi", "Pi", "Sigma", "Upsilon", "Phi",
+    "Psi", "Omega",
+}
+LATEX_FUNCTIONS = {
+    "sin": r"\sin", "cos": r"\cos", "tan": r"\tan",
+    "asin": r"\arcsin", "acos": r"\arccos", "atan": r"\arctan",
+    "sinh": r"\sinh", "cosh": r"\cosh", "tanh": r"\tanh",
+    "exp": r"\exp", "log": r"\ln", "log10": r"\log_{10}",
+    "max": r"\max", "min": r"\min",
+}
+LATEX_COMPARISONS = {"<": "<", "<=": r"\le", ">": ">", ">=": r"\ge", "==": "=", "!=": r"\ne"}
+
+
+def latex_symbol(name, symbols=None):
+    """LaTeX for a model name: an entry of `symbols` if there is one,
+    Greek letter names as letters, and `a_b` as a subscript."""
+    symbols = symbols or {}
+    if name in symbols:
+        return symbols[name]
+    if name in GREEK:
+        return "\\" + name
+    base, sep, sub = name.partition("_")
+    if sep and base:
+        sub = sub.replace("_", r"\_")
+        return f"{latex_symbol(base, symbols)}_{{{sub}}}"
+    return name.replace("_", r"\_")
+
+
+def latex_derivative(symbol, dotted=False):
+    return f"\\dot{{{symbol}}}" if dotted else f"\\frac{{d{symbol}}}{{dt}}"
+
+
+def latex_number(text, symbols=None):
+    if symbols and text in symbols:
+        return symbols[text]
+    mantissa, _, exponent = text.replace("_", "").lower().partition("e")
+    if mantissa.endswith(".0"):
+        mantissa = mantissa[:-2]
+    elif mantissa.endswith("."):
+        mantissa = mantissa[:-1]
+    if not exponent:
+        return mantissa
+    exponent = str(int(exponent))
+    return f"10^{{{exponent}}}" if mantissa == "1" else f"{mantissa} \\times 10^{{{exponent}}}"
+
+
+def to_latex(node, symbols=None, dotted=False, variables=()):
+    """LaTeX (math mode) for `node`.
+
+    `symbols` maps model names to LaTeX.  `f_X`, and `dX` for `X` in
+    `variables`, are written as time derivatives of `X` (`dotted` for
+    Newton's notation).
+    """
+    symbols = symbols or {}
+    variables = set(variables)
+
+    def name(id):
+        if id.startswith("f_") and len(id) > 2:
+            return latex_derivative(latex_symbol(id[2:], symbols), dotted)
+        if id.startswith("d") and id[1:] in variables:
+            return latex_derivative(latex_symbol(id[1:], symbols), dotted)
+        return latex_symbol(id, symbols)
+
+    def precedence(node):
+        # \frac{}{} and ^{} group their operands themselves
+        if isinstance(node, Binary) and node.base_op == "/":
+            return ATOM
+        return node.power
+
+    def paren(text):
+        return f"\\left({text}\\right)"
+
+    def operand(node, power, strict):
+        text = emit(node)
+        p = precedence(node)
+        return paren(text) if p < power or (strict and p == power) else text
+
+    def emit(node):
+        if isinstance(node, Number):
+            return latex_number(node.text, symbols)
+        if isinstance(node, Name):
+            return name(node.id)
+        if isinstance(node, Unary):
+            inner = emit(node.operand)
+            if precedence(node.operand) < PREFIX or isinstance(node.operand, Unary):
+                inner = paren(inner)
+            return node.op + inner
+        if isinstance(node, Call):
+            args = ", ".join(emit(a) for a in node.args)
+            if node.func == "sqrt":
+                return f"\\sqrt{{{args}}}"
+            if node.func == "abs":
+                return f"\\left|{args}\\right|"
+            func = LATEX_FUNCTIONS.get(node.func)
+            if func is None:
+                func = "\\operatorname{%s}" % node.func.replace("_", r"\_")
+            return func + paren(args)
+        op = node.base_op
+        if op == "/":
+            return f"\\frac{{{emit(node.left)}}}{{{emit(node.right)}}}"
+        if op == "^":
+            return f"{operand(node.left, POWER, True)}^{{{emit(node.right)}}}"
+        power = node.power
+        if power == SUM:
+            chain = []
+            while True:
+                chain.append(node)
+                node = node.left
+                if node.grouped or precedence(node) != SUM:
+                    break
+            parts = [operand(node, SUM, False)]
+            for link in reversed(chain):
+                parts.append(f" {link.base_op} ")
+                parts.append(operand(link.right, SUM, link.base_op == "-"))
+            return "".join(parts)
+        left = operand(node.left, power, False)
+        right = operand(node.right, power, True)
+        if op == "*":
+            # 2x, but x \cdot y and 2 \cdot 3
+            if isinstance(node.left, Number) and not right[:1].isdigit() and not right.startswith("-"):
+                return f"{left} {right}"
+            return f"{left} \\cdot {right}"
+        return f"{left} {LATEX_COMPARISONS.get(op, op)} {right}"
+
+    return emit(node)
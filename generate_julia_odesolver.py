@@ -14,7 +14,8 @@ Example:
 This presumes an ODES model specification `pendulum.toml` exists in
 the `./models` directory. If successful, the generated Julia code will be
 in `./models/pendulum.jl`. Another cmdl only version will be generated
-as `./models/pendulum_cmdl.jl`.
+as `./models/pendulum_cmdl.jl`, and a pure NumPy reference backend as
+`./models/pendulum_numpy.py` (run it with `python numpy_solver.py pendulum`).
 
 | Copyright: (c) 2025 Bijou M. Smith
 | License: GNU General Public License v3.0 <https://www.gnu.org/licenses/gpl-3.0.html>
@@ -22,8 +23,21 @@ as `./models/pendulum_cmdl.jl`.
 
 from pathlib import Path
 import tomllib
-import re
-from collections import defaultdict, deque
+from collections import defaultdict
+
+from build_cache import write_if_changed
+from expressions import (
+    ZERO, CircularDependencyError, ExpressionError, jacobian, parse, python_name, sort_equations,
+    to_julia, to_numpy
+)
+
+# Solvers for the implicit form dae!(out, du, u, p, t); any other method is
+# an ODE solver for the explicit form ode!(du, u, p, t)
+DAE_METHODS = ("IDA", "DFBDF", "DImplicitEuler", "DABDF2")
+# Explicit methods that run at the fixed [solver] dt, as in numpy_solver.py
+FIXED_STEP_METHODS = ("Euler", "RK4")
+# Larger Jacobians are left to the solver's automatic differentiation
+MAX_JACOBIAN_ENTRIES = 100_000
 
 def julia_type(ctype_str):
     if ctype_str == "c_double":
@@ -47,71 +61,41 @@ def parse_godley_flows(godley_section):
 
 def get_dependencies(expr: str, all_eq_names: list) -> list:
     """
-    Finds which derivative equations an expression depends on.
-    Uses a more robust regex to find 'f_' prefixed variable names.
+    Finds which derivative equations an expression depends on, from the
+    parsed expression's symbol set (see expressions.py).
     """
-    dependencies = []
-    for eq_name in all_eq_names:
-        # Use regex to find the equation name as a whole word
-        if re.search(r'\b' + re.escape(eq_name) + r'\b', expr):
-            dependencies.append(eq_name)
-    return dependencies
+    symbols = parse(expr).symbols
+    return [eq_name for eq_name in all_eq_names if eq_name in symbols]
 
 def topological_sort(ode_equations: dict) -> list:
     """
-    Sorts ODE equations based on dependencies to prevent UndefVarError.
-    This implementation is more robust and correctly handles complex dependencies.
+    Sorts equations based on dependencies to prevent UndefVarError.
+    Linear in the model size; a circular dependency raises a
+    CircularDependencyError (a ValueError) naming the equations on the cycle.
     """
-    graph = defaultdict(list)
-    in_degree = defaultdict(int)
-    all_eq_names = list(ode_equations.keys())
-
-    # Build the dependency graph and compute in-degrees
-    for eq_name, expr in ode_equations.items():
-        dependencies = get_dependencies(expr, all_eq_names)
-        for dep in dependencies:
-            if dep != eq_name:
-                graph[dep].append(eq_name)
-                in_degree[eq_name] += 1
-
-    # Initialize a queue with all nodes that have no incoming edges
-    queue = deque([eq for eq in all_eq_names if in_degree[eq] == 0])
-    sorted_equations = []
-
-    # Perform the topological sort
-    while queue:
-        node = queue.popleft()
-        sorted_equations.append(node)
-
-        for neighbor in graph[node]:
-            in_degree[neighbor] -= 1
-            if in_degree[neighbor] == 0:
-                queue.append(neighbor)
-    
-    # Check for cycles
-    if len(sorted_equations) != len(ode_equations):
-        # This means there's a circular dependency.
-        raise ValueError("Circular dependency detected. Cannot sort.")
-
-    return sorted_equations
-
-
-def render_template(template: str, context: dict) -> str:
+    return sort_equations(ode_equations)
+
+
+def render_template(template: str, context: dict, **options) -> str:
     from jinja2 import Template
-    return Template(template).render(**context)
+    return Template(template, **options).render(**context)
+
+
+def derivative_names(variable_names: list) -> dict:
+    """Julia names of the derivative references dX in model expressions."""
+    return {f"d{var}": f"d{var}_dt" for var in variable_names}
 
 
 def substitute_expressions(expr: str, variable_names: list) -> str:
     """Substitutes derivative variable names."""
-    for var in variable_names:
-        expr = re.sub(rf'\bd{var}\b', f'd{var}_dt', expr)
-    return expr
+    return parse(expr).to_julia(derivative_names(variable_names))
 
 
-def generate_julia_code(model_name: str, template: str, gui_version: bool = False):
+def load_model_context(model_name: str) -> dict:
+    """Read `models/<model_name>.toml` and prepare the template context
+    shared by the Julia and NumPy backends."""
     model_dir = Path("models")
     toml_path = model_dir / f"{model_name}.toml"
-    suffix = "_gui" if gui_version else "_cmdl"
     if not toml_path.exists():
         raise FileNotFoundError(f"Model file not found: {toml_path}")
 
@@ -129,6 +113,25 @@ def generate_julia_code(model_name: str, template: str, gui_version: bool = Fals
     t1 = config["tspan"]["t1"]
     dt = config["solver"]["dt"]
     method = config["solver"].get("method", "Tsit5")
+    # Adaptive steps within abstol/reltol; results are written on a grid of
+    # output_dt (default dt), widened if needed to at most max_rows rows
+    abstol = config["solver"].get("abstol", 1e-8)
+    reltol = config["solver"].get("reltol", 1e-6)
+    output_dt = config["solver"].get("output_dt", dt)
+    max_rows = config["solver"].get("max_rows", 0)
+    if not output_dt > 0:
+        raise ValueError(f"[solver] output_dt must be positive, not {output_dt}")
+    if not isinstance(max_rows, int) or max_rows < 0:
+        raise ValueError(f"[solver] max_rows must be a whole number >= 0, not {max_rows}")
+    # Results go to a binary result file (see result_io.py) unless
+    # [output] format = "csv". The GUI solver streams through shared memory;
+    # the file is an optional archival sink there (the cmdl solver always
+    # writes it). `csv = false` is the older spelling of `archive = false`.
+    output = config.get("output", {})
+    output_format = output.get("format", "binary")
+    if output_format not in ("binary", "csv"):
+        raise ValueError(f"[output] format must be 'binary' or 'csv', not '{output_format}'")
+    write_output = output.get("archive", output.get("csv", True))
 
     # Merge Godley flows into ode_equations, if any
     ode_equations = ode_equations_toml.copy()
@@ -138,28 +141,58 @@ def generate_julia_code(model_name: str, template: str, gui_version: bool = Fals
         if eqname not in ode_equations:
             ode_equations[eqname] = " + ".join(terms)
 
-    # Sort equations topologically to ensure dependencies are met
-    try:
-        sorted_equation_names = topological_sort(ode_equations)
-    except ValueError as e:
-        raise e
-
-    # Prepare derivative computations for the template
-    derivative_computations = []
-    for f_var_name in sorted_equation_names:
-        original_var = f_var_name[2:]
-        expr = substitute_expressions(ode_equations[f_var_name], variable_names)
-        derivative_computations.append((f_var_name, expr))
-
-    # Prepare auxiliary equations
-    aux_subst = {}
-    for k, v in auxiliary_equations.items():
-        expr = substitute_expressions(v, variable_names)
-        aux_subst[k] = expr
+    # Auxiliary equations and f_<var> expressions (ODE terms and Godley
+    # flows) are assigned in one block, sorted together so that each comes
+    # after everything it uses
+    clash = auxiliary_equations.keys() & ode_equations.keys()
+    if clash:
+        raise ValueError(f"Names defined as both auxiliary and ODE equations: {sorted(clash)}")
+    all_equations = {**auxiliary_equations, **ode_equations}
+    sorted_names = topological_sort(all_equations)
+    sorted_equation_names = [name for name in sorted_names if name in ode_equations]
+
+    # Prepare the assignments for the template
+    julia_names = derivative_names(variable_names)
+    equations = [(name, parse(all_equations[name]).to_julia(julia_names)) for name in sorted_names]
+    derivative_computations = [(name, expr) for name, expr in equations if name in ode_equations]
+    aux_subst = {name: expr for name, expr in equations if name in auxiliary_equations}
 
     # Generate the list of boolean values for differential_vars
     differential_vars_list = ["true" for _ in variable_names]
 
+    # With no algebraic constraints, i.e. no loop through the derivative
+    # references dX once each is read as f_X, the model is an explicit ODE:
+    # ode! evaluates it directly and the requested method integrates it.
+    # Otherwise, or if a DAE method is requested, dae! and IDA solve it.
+    explicit = explicit_names(variable_names)
+    try:
+        explicit_order = sort_equations(all_equations, aliases=explicit)
+    except CircularDependencyError as e:
+        print(f"Implicit equations, solving as a DAE with IDA: {e}")
+        explicit_order = None
+    explicit_ode = explicit_order is not None and method not in DAE_METHODS
+    if explicit_ode:
+        # Only expressions with derivative references differ from dae!'s
+        julia_code = dict(equations)
+        explicit_equations = [
+            (name, parse(all_equations[name]).to_julia(explicit)
+             if parse(all_equations[name]).symbols & explicit.keys() else julia_code[name])
+            for name in explicit_order
+        ]
+    else:
+        explicit_equations = []
+        if method not in DAE_METHODS:
+            method = "IDA"
+
+    # Analytic Jacobian: jac!(J, u, p, t) = df/du with a sparse jac_prototype
+    # for ode!, or dae_jac!(J, du, u, p, jac_gamma, t) = dout/du + jac_gamma
+    # dout/ddu for dae!, where out = du - f(u, du)
+    if explicit_ode:
+        jac = model_jacobian(all_equations, explicit_order, variable_names, explicit, explicit)
+    else:
+        jac = model_jacobian(all_equations, sorted_names, variable_names, julia_names)
+    jac_partials, jac_entries = jac or ([], [])
+
     # Detect if eigenvalue printing is requested
     eigenvalue_config = config.get("eigenvalues", {})
     eigenvalue_enabled = eigenvalue_config.get("all", False)
@@ -170,20 +203,42 @@ def generate_julia_code(model_name: str, template: str, gui_version: bool = Fals
     else:
         eigenvalue_method = None
 
+    # Julia field types for the shared parameter block (see create_ctypes_struct)
+    parameter_types = {
+        name: julia_type("c_double" if isinstance(val, float) else "c_int")
+        for name, val in parameters.items()
+    }
+
     context = {
         #"model_name": config["model_name"],   # No!!! Use the toml filename!
         "model_name": model_name,
         "parameters": parameters,
+        "parameter_types": parameter_types,
         "variable_names": variable_names,
         "initial_conditions": init_vals,
+        "equations": equations,
         "derivative_computations": derivative_computations,
         "auxiliary_equations": aux_subst,
         "t0": t0,
         "t1": t1,
         "dt": dt,
         "method": method,
+        "abstol": abstol,
+        "reltol": reltol,
+        "output_dt": output_dt,
+        "max_rows": max_rows,
+        "output_format": output_format,
+        "write_output": write_output,
         "variable_count": len(variable_names),
         "differential_vars_list": differential_vars_list,
+        "explicit_ode": explicit_ode,
+        "explicit_equations": explicit_equations,
+        "adaptive": method not in FIXED_STEP_METHODS,
+        "analytic_jacobian": jac is not None,
+        "jac_partials": jac_partials,
+        "jac_entries": jac_entries,
+        "jac_rows": [i for i, _, _, _ in jac_entries],
+        "jac_cols": [j for _, j, _, _ in jac_entries],
     }
 
     # Add to context for template rendering
@@ -191,31 +246,150 @@ def generate_julia_code(model_name: str, template: str, gui_version: bool = Fals
         "eigenvalue_enabled": eigenvalue_enabled,
         "eigenvalue_method": eigenvalue_method,
     })
+    # Untranslated equations, for backends other than Julia
+    context.update({
+        "ode_equations": {name: ode_equations[name] for name in sorted_equation_names},
+        "raw_auxiliary_equations": dict(auxiliary_equations),
+        "raw_equations": all_equations,
+    })
+    return context
+
+
+def model_jacobian(equations: dict, order: list, variable_names: list, names: dict,
+                   aliases: dict = None, emit: str = "julia"):
+    """Jacobian of the f_<var> expressions for the templates, or None (with
+    a note) if it is too large or uses functions that cannot be
+    differentiated.  Returns `(partials, entries)`: `(temporary, code)`
+    pairs in evaluation order, and `(row, column, code, wrt_derivative)` for
+    each nonzero entry, 1-based for Julia and 0-based for NumPy.
+
+    Without `aliases` (the DAE form) a derivative reference dX is a variable
+    of its own, and its entries have `wrt_derivative` set.
+    """
+    columns = {name: j for j, name in enumerate(variable_names)}
+    wrt = list(variable_names)
+    if aliases is None:
+        wrt += [f"d{name}" for name in variable_names]
+    try:
+        partials, rows = jacobian(equations, order, wrt, aliases, max_entries=MAX_JACOBIAN_ENTRIES)
+    except ExpressionError as e:
+        print(f"No analytic Jacobian, the solver will approximate it: {e}")
+        return None
+    base, emitter = (1, to_julia) if emit == "julia" else (0, to_numpy)
+    # Only the sparse ode! Jacobian stores zeros: its pattern is the
+    # dependency graph
+    keep_zeros = emit == "julia" and aliases is not None
+    entries = []
+    for i, name in enumerate(variable_names):
+        row = []
+        for variable, node in rows[f"f_{name}"].items():
+            if node is ZERO and not keep_zeros:
+                continue
+            derivative = variable not in columns
+            j = columns[variable[1:]] if derivative else columns[variable]
+            row.append((i + base, j + base, emitter(node, names), derivative))
+        entries.extend(sorted(row, key=lambda entry: (entry[3], entry[1])))
+    partials = [(python_name(name), emitter(node, names)) for name, node in partials]
+    return partials, entries
+
+
+def explicit_names(variable_names: list) -> dict:
+    """Explicit ODE: a derivative reference dX is the right-hand side f_X"""
+    return {f"d{var}": f"f_{var}" for var in variable_names}
+
+
+def julia_to_numpy(expr: str, variable_names: list) -> str:
+    """Translate a model expression from the TOML's Julia syntax to NumPy."""
+    return parse(expr).to_numpy(explicit_names(variable_names))
+
+
+def generate_numpy_code(model_name: str, template: str, context: dict = None):
+    """Emit `models/<model_name>_numpy.py`: the model as a vectorised RHS
+    for the reference integrators in `numpy_solver.py`."""
+    model_dir = Path("models")
+    context = dict(context or load_model_context(model_name))
+    variable_names = context["variable_names"]
+    init_vals = context["initial_conditions"]
+    names = explicit_names(variable_names)
+    raw_equations = context["raw_equations"]
+    # dX is f_X in the explicit form, so it orders like a use of f_X
+    order = sort_equations(raw_equations, aliases=names)
+    jac = model_jacobian(raw_equations, order, variable_names, names, names, emit="numpy")
+    context.update({
+        "py_variables": [python_name(name) for name in variable_names],
+        # Ordered like the state vector; unset variables start at 0
+        "py_initial_conditions": [float(init_vals.get(name, 0.0)) for name in variable_names],
+        "py_parameters": [
+            (python_name(name), f"p.{name}" if name == python_name(name) else f'getattr(p, "{name}")')
+            for name in context["parameters"]
+        ],
+        "py_equations": [(python_name(name), parse(raw_equations[name]).to_numpy(names)) for name in order],
+        "py_rhs_names": [python_name(f"f_{name}") for name in variable_names],
+        "py_jacobian": jac is not None,
+        "py_jac_partials": jac[0] if jac else [],
+        "py_jac_entries": jac[1] if jac else [],
+    })
+    # Python is whitespace sensitive: keep the block tags off the output
+    code = render_template(template, context, trim_blocks=True, lstrip_blocks=True,
+                           keep_trailing_newline=True)
+    outpath = model_dir / f"{model_name}_numpy.py"
+    if write_if_changed(outpath, code):
+        print(f"Wrote NumPy code to: {outpath}")
+    else:
+        print(f"NumPy code unchanged: {outpath}")
+
+
+def generate_julia_code(model_name: str, template: str, gui_version: bool = False,
+                        context: dict = None):
+    model_dir = Path("models")
+    suffix = "_gui" if gui_version else "_cmdl"
+    context = context or load_model_context(model_name)
 
     julia_code = render_template(template, context)
     outpath = model_dir / f"{model_name}{suffix}.jl"
-    with open(outpath, "w") as f:
-        f.write(julia_code)
-    print(f"Wrote Julia code to: {outpath}")
+    # Identical code keeps its mtime, so Julia need not recompile it
+    if write_if_changed(outpath, julia_code):
+        print(f"Wrote Julia code to: {outpath}")
+    else:
+        print(f"Julia code unchanged: {outpath}")
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 2:
-        print("Usage: python3 generate_julia_odesolver.py <model_name>")
-        sys.exit(1)
+    import argparse
+    from functools import cache
+    from build_cache import BuildCache
+
+    parser = argparse.ArgumentParser(description="Generate the Julia and NumPy solvers for a model.")
+    parser.add_argument("model_name", help="Model in ./models, e.g. pendulum")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate even if the build cache has the code up to date")
+    args = parser.parse_args()
 
     TEMPLATE_1_PATH = "./templates/ode_dae_solver_gui.jl.template"
     TEMPLATE_2_PATH = "./templates/ode_dae_solver_cmdl.jl.template"
-
-    model_name = sys.argv[1]
-
-    with open(TEMPLATE_1_PATH, 'r') as f:
-        gui_template = f.read()
-        generate_julia_code(model_name, gui_template, gui_version=True)
-
-    with open(TEMPLATE_2_PATH, 'r') as f:
-        standalone_template = f.read()
-        generate_julia_code(model_name, standalone_template, gui_version=False)
+    TEMPLATE_3_PATH = "./templates/ode_numpy_solver.py.template"
+
+    model_name = args.model_name
+    # The TOML is read and its equations parsed and sorted once for all
+    # backends, and only if one of them is out of date
+    context = cache(lambda: load_model_context(model_name))
+    here = Path(__file__).resolve().parent
+    sources = [here / "generate_julia_odesolver.py", here / "expressions.py"]
+    toml_path = Path("models") / f"{model_name}.toml"
+
+    builds = [
+        (TEMPLATE_1_PATH, "_gui.jl",
+         lambda template: generate_julia_code(model_name, template, gui_version=True, context=context())),
+        (TEMPLATE_2_PATH, "_cmdl.jl",
+         lambda template: generate_julia_code(model_name, template, gui_version=False, context=context())),
+        (TEMPLATE_3_PATH, "_numpy.py",
+         lambda template: generate_numpy_code(model_name, template, context=context())),
+    ]
+    build_cache = BuildCache()
+    for template_path, suffix, generate in builds:
+        outpath = Path("models") / f"{model_name}{suffix}"
+        build_cache.build(outpath, [toml_path, template_path, *sources], [outpath],
+                          lambda: generate(Path(template_path).read_text()), force=args.force)
 
     print(f"Generated GUI and standalone Julia DAE solvers for model: {model_name}")
     print(f"Run standalone with: julia models/{model_name}_cmdl.jl")
+    print(f"or without Julia:    python numpy_solver.py {model_name}")
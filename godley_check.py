@@ -19,6 +19,8 @@ import subprocess
 from pathlib import Path
 import re
 
+from build_cache import BuildCache, write_if_changed
+
 DOCS_DIR = Path('./docs')
 DOCS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -58,8 +60,7 @@ def make_godley_df(accounts, transactions):
 
 
 def write_markdown(df, out_path):
-    with open(out_path, "w") as f:
-        f.write(df.to_markdown(index=False))
+    write_if_changed(out_path, df.to_markdown(index=False))
 
 
 def latex_symbol_subs(expr: str, cdots=False ) -> str:
@@ -140,8 +141,7 @@ def write_tex(df, model_name):
 """
 
     tex_path = DOCS_DIR / f"{model_name}_godley.tex"
-    with open(tex_path, 'w') as f:
-        f.write(tex.strip())
+    write_if_changed(tex_path, tex.strip())
     print(f"Wrote LaTeX source to: {tex_path}")
     return tex_path
 
@@ -160,11 +160,14 @@ def compile_pdf(tex_path):
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: godley_check.py <model_basename>")
-        sys.exit(1)
-
-    basename = sys.argv[1]
+    import argparse
+    parser = argparse.ArgumentParser(description="Tabulate a model's Godley table as markdown, LaTeX and PDF.")
+    parser.add_argument("model_basename", help="Model in ./models, e.g. mmm_0_3")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild even if the build cache has the outputs up to date")
+    args = parser.parse_args()
+
+    basename = args.model_basename
     model_path = Path(f"./models/{basename}.toml")
     md_path = Path(f"{DOCS_DIR}/{basename}_godley.md")
     tex_path = Path(f"{DOCS_DIR}/{basename}_godley.tex")
@@ -174,15 +177,21 @@ def main():
         print(f"Error: File not found: {model_path}")
         sys.exit(1)
 
-    accounts, transactions = parse_godley_table(model_path)
-    df = make_godley_df(accounts, transactions)
+    def write_tables():
+        accounts, transactions = parse_godley_table(model_path)
+        df = make_godley_df(accounts, transactions)
+
+        print(f"Parsed {len(transactions)} Godley entries with {len(accounts)} accounts")
+        print(df)
 
-    print(f"Parsed {len(transactions)} Godley entries with {len(accounts)} accounts")
-    print(df)
+        write_markdown(df, md_path)
+        write_tex(df, basename)
 
-    write_markdown(df, md_path)
-    write_tex(df, basename)
-    compile_pdf(tex_path)
+    # pdflatex only reruns when the LaTeX source changes
+    build_cache = BuildCache()
+    build_cache.build(md_path, [model_path, Path(__file__).resolve()], [md_path, tex_path],
+                      write_tables, force=args.force)
+    build_cache.build(pdf_path, [tex_path], [pdf_path], lambda: compile_pdf(tex_path), force=args.force)
 
     print(f"\nMarkdown written to: {md_path}")
     print(f"PDF written to: {pdf_path}")
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+'''
+live_data
+=========
+
+Incremental data path for the pukahaPai viewer.  The Julia solver appends
+rows to `models/<model>.csv` while it runs; the classes here keep a byte
+offset into that file and only parse what was appended since the last poll,
+so a redraw costs O(new rows) rather than O(total rows).
+
+`MinMaxDecimator` then reduces each series to a point budget of about twice
+the plot's pixel width before it is handed to DearPyGui, and
+`RunningExtrema`/`WindowExtrema` keep axis limits current in O(new samples).
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import os
+from collections import deque
+import numpy as np
+
+
+class ColumnBuffer:
+    """Preallocated per-variable float64 columns with amortised O(1) append.
+
+    Storage is `(n_cols, capacity)` so each column is contiguous and can be
+    handed to the plotting layer as a view without copying.
+    """
+    def __init__(self, names, capacity=4096):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self._data = np.empty((len(self.names), max(int(capacity), 1)))
+        self.n_rows = 0
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    def _grow(self, needed):
+        new_cap = self.capacity
+        while new_cap < needed:
+            new_cap *= 2
+        data = np.empty((len(self.names), new_cap))
+        data[:, :self.n_rows] = self._data[:, :self.n_rows]
+        self._data = data
+
+    def append_rows(self, rows):
+        """Append a `(k, n_cols)` block of rows."""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        k = rows.shape[0]
+        if k == 0:
+            return 0
+        if rows.shape[1] != len(self.names):
+            raise ValueError(f"Expected {len(self.names)} columns, got {rows.shape[1]}")
+        end = self.n_rows + k
+        if end > self.capacity:
+            self._grow(end)
+        self._data[:, self.n_rows:end] = rows.T
+        self.n_rows = end
+        return k
+
+    def column(self, key):
+        """View of one column (by name or index) over the filled rows."""
+        i = self.index[key] if isinstance(key, str) else key
+        return self._data[i, :self.n_rows]
+
+    def clear(self):
+        self.n_rows = 0
+
+
+class CsvTailReader:
+    """Follow a CSV file that another process is appending to.
+
+    Each `poll()` reads from the remembered byte offset to EOF, parses only
+    the complete lines (a partial trailing line is kept for the next poll)
+    and appends them to a `ColumnBuffer`.  A file that shrinks, or is
+    replaced, is treated as a new run and the buffer is reset; `runs`
+    counts those, for consumers that keep state per run.
+    """
+    def __init__(self, path, capacity=4096):
+        self.path = path
+        self.capacity = capacity
+        self.runs = 0
+        self.header = None
+        self.buffer = None
+        self.offset = 0
+        self._partial = b""
+        self._inode = None
+
+    def reset(self):
+        """Forget the rows read so far; what follows counts as a new run."""
+        self.header = None
+        self.buffer = None
+        self.offset = 0
+        self._partial = b""
+        self._inode = None
+        self.runs += 1
+
+    def changed(self):
+        """Cheap check (one stat) for data the next `poll()` would read."""
+        try:
+            return os.stat(self.path).st_size != self.offset
+        except FileNotFoundError:
+            return False
+
+    def poll(self):
+        """Parse newly appended rows. Returns the number of rows added."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        if st.st_size < self.offset or (self._inode is not None and st.st_ino != self._inode):
+            # Truncated or re-created by a new solver run
+            self.reset()
+        self._inode = st.st_ino
+        if st.st_size == self.offset:
+            return 0
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+
+        data = self._partial + chunk
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            self._partial = data
+            return 0
+        self._partial = data[cut + 1:]
+        lines = data[:cut].decode().splitlines()
+
+        if self.header is None:
+            while lines and not lines[0].strip():
+                lines.pop(0)
+            if not lines:
+                return 0
+            self.header = [name.strip() for name in lines.pop(0).split(",")]
+            self.buffer = ColumnBuffer(self.header, self.capacity)
+
+        rows = self._parse(lines)
+        return self.buffer.append_rows(rows)
+
+    def _parse(self, lines):
+        n_cols = len(self.header)
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return np.empty((0, n_cols))
+        try:
+            return np.loadtxt(lines, delimiter=",", ndmin=2)
+        except ValueError:
+            # Fall back to per-line parsing, dropping malformed rows
+            rows = []
+            for line in lines:
+                parts = line.split(",")
+                if len(parts) != n_cols:
+                    continue
+                try:
+                    rows.append([float(v) for v in parts])
+                except ValueError:
+                    continue
+            return np.array(rows, dtype=np.float64).reshape(-1, n_cols)
+
+    def column(self, key):
+        if self.buffer is None:
+            return np.empty(0)
+        return self.buffer.column(key)
+
+    def __len__(self):
+        return 0 if self.buffer is None else len(self.buffer)
+
+
+class MinMaxDecimator:
+    """Peak-preserving display decimation for a set of series sharing one
+    time axis.
+
+    Samples are grouped into index buckets of equal width; each bucket keeps
+    the positions of its minimum and maximum so spikes survive.  The bucket
+    width doubles whenever the bucket count would exceed `budget / 2`, so a
+    series never sends more than about `budget` points to the renderer.
+    Between width changes only the buckets touched by new samples are
+    recomputed.  A change of `run` (the reader's run counter) starts over,
+    even if the new run already has as many rows as the last.
+    """
+    def __init__(self, budget=2000):
+        self.budget = max(int(budget), 4)
+        self.run = None
+        self.reset()
+
+    def reset(self):
+        self.width = 1
+        self.n_rows = 0
+        self._min_idx = []
+        self._max_idx = []
+
+    def set_budget(self, budget):
+        self.budget = max(int(budget), 4)
+        self.reset()
+
+    @property
+    def max_buckets(self):
+        return self.budget // 2
+
+    def _buckets(self, y, start, stop):
+        """(argmin, argmax) absolute indices for buckets covering y[start:stop];
+        `start` must be on a bucket boundary."""
+        w = self.width
+        seg = y[start:stop]
+        n_full = len(seg) // w
+        full = seg[:n_full * w].reshape(n_full, w)
+        offsets = start + w * np.arange(n_full)
+        mn = offsets + np.argmin(full, axis=1)
+        mx = offsets + np.argmax(full, axis=1)
+        if n_full * w < len(seg):
+            tail = seg[n_full * w:]
+            base = start + n_full * w
+            mn = np.append(mn, base + np.argmin(tail))
+            mx = np.append(mx, base + np.argmax(tail))
+        return mn, mx
+
+    def update(self, columns, run=None):
+        """Fold in new samples; `columns` are the full-length y arrays."""
+        if not columns:
+            return
+        n = len(columns[0])
+        if n < self.n_rows or run != self.run or len(columns) != len(self._min_idx):
+            self.reset()
+            self.run = run
+            self._min_idx = [np.empty(0, dtype=np.intp) for _ in columns]
+            self._max_idx = [np.empty(0, dtype=np.intp) for _ in columns]
+        if n == self.n_rows:
+            return
+        rebuild = False
+        while -(-n // self.width) > self.max_buckets:
+            self.width *= 2
+            rebuild = True
+        # First bucket containing new samples; earlier ones are final
+        first = 0 if rebuild else self.n_rows // self.width
+        for i, y in enumerate(columns):
+            mn, mx = self._buckets(y, first * self.width, n)
+            self._min_idx[i] = np.concatenate([self._min_idx[i][:first], mn])
+            self._max_idx[i] = np.concatenate([self._max_idx[i][:first], mx])
+        self.n_rows = n
+
+    def indices(self, i):
+        """Sorted sample indices to draw for series `i`."""
+        if self.width == 1:
+            return np.arange(self.n_rows)
+        pairs = np.sort(np.column_stack([self._min_idx[i], self._max_idx[i]]), axis=1)
+        return pairs.ravel()
+
+
+class RunningExtrema:
+    """Per-series min/max over every sample seen so far, folded in
+    incrementally. NaNs (e.g. from a diverging run) are ignored.  A change
+    of `run` (the reader's run counter) starts over."""
+    def __init__(self, n_series):
+        self.n_series = n_series
+        self.run = None
+        self.reset()
+
+    def reset(self):
+        self.n_rows = 0
+        self.lo = np.full(self.n_series, np.inf)
+        self.hi = np.full(self.n_series, -np.inf)
+
+    def update(self, columns, run=None):
+        n = len(columns[0]) if columns else 0
+        if n < self.n_rows or run != self.run:
+            self.reset()
+            self.run = run
+        if n == self.n_rows:
+            return
+        for i, y in enumerate(columns):
+            new = y[self.n_rows:n]
+            self.lo[i] = np.fmin.reduce(new, initial=self.lo[i])
+            self.hi[i] = np.fmax.reduce(new, initial=self.hi[i])
+        self.n_rows = n
+
+    def limits(self, i):
+        return float(self.lo[i]), float(self.hi[i])
+
+
+class WindowExtrema:
+    """Per-series min/max over the trailing `span` of time.
+
+    Each series keeps a monotonic deque of `(t, y)` candidates, so every
+    sample is pushed and popped at most once: O(new samples) per update.
+    A change of `run` (the reader's run counter) starts over.
+    """
+    def __init__(self, n_series, span):
+        self.n_series = n_series
+        self.span = span
+        self.run = None
+        self.reset()
+
+    def reset(self):
+        self.n_rows = 0
+        self._min = [deque() for _ in range(self.n_series)]
+        self._max = [deque() for _ in range(self.n_series)]
+
+    def update(self, t, columns, run=None):
+        n = len(t)
+        if n < self.n_rows or run != self.run:
+            self.reset()
+            self.run = run
+        if n == self.n_rows:
+            return
+        t_new = t[self.n_rows:n].tolist()
+        for i, y in enumerate(columns):
+            lo, hi = self._min[i], self._max[i]
+            for tk, v in zip(t_new, y[self.n_rows:n].tolist()):
+                if v != v:  # NaN
+                    continue
+                while lo and lo[-1][1] >= v:
+                    lo.pop()
+                lo.append((tk, v))
+                while hi and hi[-1][1] <= v:
+                    hi.pop()
+                hi.append((tk, v))
+        cutoff = t[n - 1] - self.span
+        for dq in self._min + self._max:
+            while dq and dq[0][0] < cutoff:
+                dq.popleft()
+        self.n_rows = n
+
+    def limits(self, i):
+        lo, hi = self._min[i], self._max[i]
+        if not lo:
+            return np.inf, -np.inf
+        return lo[0][1], hi[0][1]
@@ -1,8 +1,36 @@
 # -*- coding: utf-8 -*-
-# lorenz_attractor_cmdl.jl - DAE Command-line version
+# lorenz_attractor_cmdl.jl - ODE Command-line version
 
 using DifferentialEquations
-using Sundials  # For IDA solver
+
+using SparseArrays
+
+
+
+# Binary result file, see result_io.py: 48 byte header + variable names,
+# padded to a multiple of 64 bytes, then row-major records. The row count
+# is advanced only after the records it covers are written.
+function open_result_file(path, names; eltype=Float64)
+    io = open(path, "w")
+    blob = Vector{UInt8}(join(names, "\n"))
+    header_bytes = 64 * cld(48 + sizeof(blob), 64)
+    write(io, b"PUKARES1")
+    # Base.length: models may define a parameter called `length`
+    write(io, Int64(header_bytes), Int64(Base.length(names)), Int64(0),
+          Int64(eltype === ComplexF64 ? 2 : 1), Int64(sizeof(blob)))
+    write(io, blob)
+    write(io, zeros(UInt8, header_bytes - 48 - sizeof(blob)))
+    return io
+end
+
+function set_result_rows!(io, n_rows)
+    flush(io)
+    pos = position(io)
+    seek(io, 24)
+    write(io, Int64(n_rows))
+    seek(io, pos)
+end
+
 
 
 
@@ -15,12 +43,31 @@ const rho = 28.0
 const beta = 2.6
 
 
+# Output times t0 + h, t0 + 2h, ..., t1, as numpy_solver.output_times, with
+# h widened if needed to keep to max_rows (0 = no limit). The solver steps
+# adaptively; results are interpolated onto these times.
+function output_times(t0, t1, h, max_rows)
+    n = ceil(Int, (t1 - t0) / h - 1e-9)
+    if max_rows > 0 && n > max_rows
+        n = max_rows
+        h = (t1 - t0) / n
+    end
+    t_out = [t0 + h * k for k in 1:n]
+    t_out[end] = t1
+    return t_out
+end
+
 # Time parameters
 const t0 = 0.0
 const t1 = 40.0
 const dt = 0.01
+const output_dt = 0.01
+const max_rows = 0
+const abstol = 1e-08
+const reltol = 1e-06
+
 
-function dae!(out, du, u, p, t)
+function ode!(du, u, p, t)
     # Extract state variables
     
     x = u[1]
@@ -30,19 +77,39 @@ function dae!(out, du, u, p, t)
     z = u[3]
     
 
-    # Extract derivatives
+    # Auxiliary equations and f_<var> expressions, in dependency order;
+    # a derivative reference dX is f_X
     
-    dx_dt = du[1]
+    f_x = sigma * (y - x)
     
-    dy_dt = du[2]
+    f_y = x * (rho - z) - y
     
-    dz_dt = du[3]
+    f_z = x * y - beta * z
     
 
-    # Auxiliary equations
+    
+    du[1] = f_x
+    
+    du[2] = f_y
+    
+    du[3] = f_z
+    
+end
+
+
+# Analytic Jacobian df/du from the generator's symbolic derivatives, and its
+# sparsity pattern from the equation dependency graph
+function jac!(J, u, p, t)
+    # Extract state variables
+    
+    x = u[1]
+    
+    y = u[2]
+    
+    z = u[3]
     
 
-    # Compute f_<var> expressions
+    # Model equations, as in ode!
     
     f_x = sigma * (y - x)
     
@@ -51,15 +118,35 @@ function dae!(out, du, u, p, t)
     f_z = x * y - beta * z
     
 
+    # Partial derivatives, by the chain rule through the auxiliary equations
+    
+    J_f_y__x = rho - z
+    
+
+    
+    J[1, 1] = -sigma
+    
+    J[1, 2] = sigma
+    
+    J[2, 1] = J_f_y__x
     
-    out[1] = dx_dt - f_x
+    J[2, 2] = -1.0
     
-    out[2] = dy_dt - f_y
+    J[2, 3] = -x
     
-    out[3] = dz_dt - f_z
+    J[3, 1] = y
     
+    J[3, 2] = x
+    
+    J[3, 3] = -beta
+    
+    return nothing
 end
 
+const jac_prototype = sparse(Int[1, 1, 2, 2, 2, 3, 3, 3], Int[1, 2, 1, 2, 3, 1, 2, 3], zeros(8), 3, 3)
+
+
+
 # Initial conditions for state variables
 u0 = [
     
@@ -71,46 +158,57 @@ u0 = [
     
 ]
 
-# Initial guess for derivatives (can be zeros)
-du0 = zeros(3)
-
 # Problem setup
 tspan = (t0, t1)
-# The IDA solver requires the `differential_vars` argument to specify which
-# variables are differential (true) and which are algebraic (false).
-# This assumes all variables are differential.
-prob = DAEProblem(dae!, du0, u0, tspan, differential_vars = [true, true, true])
+
+
+prob = ODEProblem(ODEFunction(ode!; jac=jac!, jac_prototype=jac_prototype), u0, tspan)
+
+
 
 # Output file
-outfile = open("models/lorenz_attractor.csv", "w")
 
+outfile = open_result_file("models/lorenz_attractor.pkr", ["t", "x", "y", "z"])
+const n_rows = Ref(0)
 
-write(outfile, "t,x,y,z\n")
 
-# Callback for writing results
-step_callback = function (integrator)
-    t = integrator.t
-    y = integrator.u
-    write(outfile, string(t))
-    
-    write(outfile, "," * string(y[1]))
-    
-    write(outfile, "," * string(y[2]))
-    
-    write(outfile, "," * string(y[3]))
+
+const t_out = output_times(t0, t1, output_dt, max_rows)
+const next_out = Ref(1)
+
+# Callback for writing results: fires only on steps that pass output times,
+# and writes the solution interpolated at each of them
+output_due(u, t, integrator) = next_out[] <= Base.length(t_out) && t >= t_out[next_out[]]
+
+output_callback = function (integrator)
+    while next_out[] <= Base.length(t_out) && t_out[next_out[]] <= integrator.t
+        t = t_out[next_out[]]
+        y = integrator(t)
+        
+        write(outfile, Float64(t), y)
+        n_rows[] += 1
+        n_rows[] % 1024 == 0 && set_result_rows!(outfile, n_rows[])
+        
+        next_out[] += 1
+    end
     
-    write(outfile, "\n")
-    flush(outfile)
     return false
 end
 
 
-cb = DiscreteCallback((f,t,integrator)->true, step_callback)
+cb = DiscreteCallback(output_due, output_callback, save_positions=(false, false))
+
+# Results are streamed by the callback, so the solution object keeps nothing
+
+# Solve the ODE; dt is the initial step
+sol = solve(prob, Tsit5(), dt=dt, adaptive=true, callback=cb,
+            abstol=abstol, reltol=reltol, save_everystep=false)
 
-# Solve the DAE
-sol = solve(prob, IDA(), dt=dt, adaptive=false, callback=cb, abstol=1e-8, reltol=1e-6)
 
 # Cleanup
+
+set_result_rows!(outfile, n_rows[])
+
 close(outfile)
 
 println("Simulation completed successfully")
\ No newline at end of file
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# lorenz_attractor_numpy.py - NumPy reference backend, generated from
+# models/lorenz_attractor.toml by generate_julia_odesolver.py. Do not edit.
+# Run with: python numpy_solver.py lorenz_attractor
+import numpy as np
+
+MODEL_NAME = "lorenz_attractor"
+VARIABLE_NAMES = ['x', 'y', 'z']
+PARAMETERS = {
+    "sigma": 10.0,
+    "rho": 28.0,
+    "beta": 2.6,
+}
+INITIAL_CONDITIONS = [1.0, 0.0, 0.0]
+T0 = 0.0
+T1 = 40.0
+DT = 0.01
+METHOD = "Tsit5"
+OUTPUT_DT = 0.01
+MAX_ROWS = 0
+ABSTOL = 1e-08
+RELTOL = 1e-06
+OUTPUT_FORMAT = "binary"
+
+
+def rhs(t, u, p):
+    """du/dt for a state `u[..., n_vars]`; parameters are read as attributes
+    of `p` and may be scalars or arrays that broadcast against `u[..., 0]`."""
+    # Extract state variables
+    x = u[..., 0]
+    y = u[..., 1]
+    z = u[..., 2]
+
+    # Parameters
+    sigma = p.sigma
+    rho = p.rho
+    beta = p.beta
+
+    # Auxiliary equations and f_<var> expressions, in dependency order
+    f_x = sigma * (y - x)
+    f_y = x * (rho - z) - y
+    f_z = x * y - beta * z
+
+    return np.stack(np.broadcast_arrays(f_x, f_y, f_z), axis=-1)
+
+
+def jac(t, u, p):
+    """Jacobian d rhs / du at a state `u[..., n_vars]`, of shape
+    `u.shape + (n_vars,)`, from the generator's symbolic derivatives."""
+    # Extract state variables
+    x = u[..., 0]
+    y = u[..., 1]
+    z = u[..., 2]
+
+    # Parameters
+    sigma = p.sigma
+    rho = p.rho
+    beta = p.beta
+
+    # Model equations, as in rhs
+    f_x = sigma * (y - x)
+    f_y = x * (rho - z) - y
+    f_z = x * y - beta * z
+
+    # Partial derivatives, by the chain rule through the auxiliary equations
+    J_f_y__x = rho - z
+
+    J = np.zeros(np.shape(u) + (len(VARIABLE_NAMES),), dtype=np.result_type(u, 1.0))
+    J[..., 0, 0] = -sigma
+    J[..., 0, 1] = sigma
+    J[..., 1, 0] = J_f_y__x
+    J[..., 1, 1] = -1.0
+    J[..., 1, 2] = -x
+    J[..., 2, 0] = y
+    J[..., 2, 1] = x
+    J[..., 2, 2] = -beta
+    return J
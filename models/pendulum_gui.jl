@@ -1,18 +1,69 @@
 # -*- coding: utf-8 -*-
-# pendulum_gui.jl - DAE GUI version
+# pendulum_gui.jl - ODE GUI version
 
 using DifferentialEquations
-using Sundials
+
+using SparseArrays
+
 using Mmap
 using Sockets
 using SharedArrays
 
+
+# Binary result file, see result_io.py: 48 byte header + variable names,
+# padded to a multiple of 64 bytes, then row-major records. The row count
+# is advanced only after the records it covers are written.
+function open_result_file(path, names; eltype=Float64)
+    io = open(path, "w")
+    blob = Vector{UInt8}(join(names, "\n"))
+    header_bytes = 64 * cld(48 + sizeof(blob), 64)
+    write(io, b"PUKARES1")
+    # Base.length: models may define a parameter called `length`
+    write(io, Int64(header_bytes), Int64(Base.length(names)), Int64(0),
+          Int64(eltype === ComplexF64 ? 2 : 1), Int64(sizeof(blob)))
+    write(io, blob)
+    write(io, zeros(UInt8, header_bytes - 48 - sizeof(blob)))
+    return io
+end
+
+function set_result_rows!(io, n_rows)
+    flush(io)
+    pos = position(io)
+    seek(io, 24)
+    write(io, Int64(n_rows))
+    seek(io, pos)
+end
+
+
 # Functions for getting eigenvalues (optional)
 
 
-# Auto-generated struct for shared memory interop
+# Shared memory session, passed by the GUI on the command line (or env).
+# Run by hand without one, print usage and exit.
+function session_name()
+    Base.length(ARGS) >= 1 && return ARGS[1]
+    session = get(ENV, "PUKAHA_SESSION", "")
+    isempty(session) || return session
+    println(stderr, """
+        Usage: julia models/pendulum_gui.jl <session>
+        The session names the viewer's shared memory segment (also read from
+        PUKAHA_SESSION). Start this solver from pukahaPai.py, which passes it,
+        or run models/pendulum_cmdl.jl for a standalone run.""")
+    exit(2)
+end
+
+const SESSION = session_name()
+const SHM_PATH = "/dev/shm/" * SESSION
+const RING_PATH = SHM_PATH * "_ring"
+
+# Auto-generated struct for shared memory interop.
+# `generation` is a seqlock counter: odd while the GUI is mid-update.
+# `run_id`/`done_id` carry the worker run protocol, see shared_mem.py.
 struct pendulum_Shared
     state::UInt8
+    generation::UInt64
+    run_id::UInt64
+    done_id::UInt64
     t0::Float64
     t1::Float64
 
@@ -26,59 +77,137 @@ struct pendulum_Shared
 
 end
 
+const GEN_OFFSET = fieldoffset(pendulum_Shared, 2)
+const RUN_OFFSET = fieldoffset(pendulum_Shared, 3)
+const DONE_OFFSET = fieldoffset(pendulum_Shared, 4)
+
 function open_shared_pendulum()
-    shmpath = "/dev/shm/pukaha_shared"
+    shmpath = SHM_PATH
     sz = sizeof(pendulum_Shared)
     if !isfile(shmpath)
         error("Shared memory file not found - is the GUI controller running?")
     elseif filesize(shmpath) != sz
         error("Shared memory size mismatch - please restart the GUI")
     end
-    fd = nothing
+    fd = open(shmpath, "r+")
     try
-        fd = open(shmpath, "r+")
-        arr = Mmap.mmap(fd, Vector{UInt8}, sz)
-        return arr, Ptr{ pendulum_Shared }(pointer(arr))
-    catch e
-        fd !== nothing && close(fd)
-        rethrow(e)
+        return Mmap.mmap(fd, Vector{UInt8}, sz)
+    finally
+        close(fd)
     end
 end
 
-function read_shared_params()
-    arr, ptr = open_shared_pendulum()
-    try
-        return unsafe_load(ptr)
-    finally
-        finalize(arr)
+# The block is mapped once at startup and accessed through typed pointers,
+# so polling the state and parameters every step is a plain load. Its
+# layout is fixed for the session: a regenerated solver is a new worker.
+const SHARED_MAP = Ref{Vector{UInt8}}(UInt8[])
+const SHARED_PTR = Ref{Ptr{ pendulum_Shared }}(C_NULL)
+const STATE_PTR = Ref{Ptr{UInt8}}(C_NULL)
+const GEN_PTR = Ref{Ptr{UInt64}}(C_NULL)
+
+function map_shared!()
+    arr = open_shared_pendulum()
+    SHARED_MAP[] = arr                  # keeps the mapping alive
+    SHARED_PTR[] = Ptr{ pendulum_Shared }(pointer(arr))
+    STATE_PTR[] = Ptr{UInt8}(pointer(arr))
+    GEN_PTR[] = Ptr{UInt64}(pointer(arr) + GEN_OFFSET)
+    return nothing
+end
+
+# Consistent snapshot of the parameter block. Returns (generation, params),
+# with params === nothing if the generation still equals `last_gen`.
+# The fences order each generation load against the parameter copy (and
+# keep the retry loop from reusing a stale load).
+function read_shared_params(last_gen::UInt64=typemax(UInt64))
+    ptr, gen_ptr = SHARED_PTR[], GEN_PTR[]
+    while true
+        g1 = unsafe_load(gen_ptr)
+        Threads.atomic_fence()
+        isodd(g1) && continue           # writer mid-update
+        g1 == last_gen && return g1, nothing
+        params = unsafe_load(ptr)
+        Threads.atomic_fence()
+        unsafe_load(gen_ptr) == g1 && return g1, params   # else torn, retry
     end
 end
 
-function write_shared_state(new_state::Char)
-    arr, ptr = open_shared_pendulum()
+write_shared_state(new_state::Char) = unsafe_store!(STATE_PTR[], UInt8(new_state))
+
+read_run_id() = unsafe_load(Ptr{UInt64}(SHARED_PTR[] + RUN_OFFSET))
+
+read_done_id() = unsafe_load(Ptr{UInt64}(SHARED_PTR[] + DONE_OFFSET))
+
+write_done_id(run_id::UInt64) = unsafe_store!(Ptr{UInt64}(SHARED_PTR[] + DONE_OFFSET), run_id)
+
+check_gui_state() = Char(unsafe_load(STATE_PTR[]))
+
+# Result ring shared with the GUI: Int64 header + (n_cols x capacity) Float64
+# records, see shared_mem.py for the layout
+const RING_HEADER_WORDS = 8
+const RING_MAGIC = Int64(0x50554B52494E4701)
+const H_MAGIC, H_CAPACITY, H_NCOLS, H_WRITE, H_SEQ, H_RUN = 1, 2, 3, 4, 5, 6
+
+function open_result_ring()
+    shmpath = RING_PATH
+    if !isfile(shmpath)
+        error("Result ring not found - is the GUI controller running?")
+    end
+    fd = open(shmpath, "r+")
     try
-        unsafe_store!(Ptr{UInt8}(pointer(arr)), UInt8(new_state))
+        header = Mmap.mmap(fd, Vector{Int64}, RING_HEADER_WORDS)
+        if header[H_MAGIC] != RING_MAGIC || header[H_NCOLS] != 3
+            error("Result ring layout mismatch - please restart the GUI")
+        end
+        records = Mmap.mmap(fd, Matrix{Float64}, (header[H_NCOLS], header[H_CAPACITY]), 8 * RING_HEADER_WORDS)
+        return header, records
     finally
-        finalize(arr)
+        close(fd)
     end
 end
 
-function check_gui_state()
-    arr, ptr = open_shared_pendulum()
-    try
-        state_byte = unsafe_load(Ptr{UInt8}(pointer(arr)))
-        return Char(state_byte)
-    finally
-        finalize(arr)
+function ring_reset!(header)
+    header[H_WRITE] = 0
+    header[H_RUN] += 1
+    header[H_SEQ] += 1
+end
+
+function ring_push!(header, records, t, u)
+    w = header[H_WRITE]
+    slot = w % header[H_CAPACITY] + 1
+    records[1, slot] = t
+    @inbounds for i in 1:length(u)
+        records[i + 1, slot] = u[i]
     end
+    Threads.atomic_fence()  # records must land before the index publishes them
+    header[H_WRITE] = w + 1
+    header[H_SEQ] += 1
+end
+
+# Output times t0 + h, t0 + 2h, ..., t1, as numpy_solver.output_times, with
+# h widened if needed to keep to max_rows (0 = no limit). The solver steps
+# adaptively; results are interpolated onto these times.
+function output_times(t0, t1, h, max_rows)
+    n = ceil(Int, (t1 - t0) / h - 1e-9)
+    if max_rows > 0 && n > max_rows
+        n = max_rows
+        h = (t1 - t0) / n
+    end
+    t_out = [t0 + h * k for k in 1:n]
+    t_out[end] = t1
+    return t_out
 end
 
 # Time parameters
 const t0 = 0.0
 const t1 = 100.0
 const dt = 0.01
+const output_dt = 0.01
+const max_rows = 0
+const abstol = 1e-08
+const reltol = 1e-06
+
 
-function dae!(out, du, u, p, t)
+function ode!(du, u, p, t)
     # Extract state variables
     
     theta = u[1]
@@ -86,31 +215,81 @@ function dae!(out, du, u, p, t)
     omega = u[2]
     
 
-    # Extract derivatives
+    # Parameters from the shared block
+    
+    mass = p.mass
+    
+    length = p.length
+    
+    damping = p.damping
+    
+    g = p.g
+    
+
+    # Auxiliary equations and f_<var> expressions, in dependency order;
+    # a derivative reference dX is f_X
+    
+    f_theta = omega
+    
+    f_omega = -damping * omega - (g / length) * sin(theta)
+    
+
     
-    dtheta_dt = du[1]
+    du[1] = f_theta
     
-    domega_dt = du[2]
+    du[2] = f_omega
     
+end
+
 
-    # Auxiliary equations
+# Analytic Jacobian df/du from the generator's symbolic derivatives, and its
+# sparsity pattern from the equation dependency graph
+function jac!(J, u, p, t)
+    # Extract state variables
+    
+    theta = u[1]
+    
+    omega = u[2]
     
 
-    # Compute f_<var> expressions
+    # Parameters from the shared block
+    
+    mass = p.mass
+    
+    length = p.length
+    
+    damping = p.damping
+    
+    g = p.g
+    
+
+    # Model equations, as in ode!
     
     f_theta = omega
     
     f_omega = -damping * omega - (g / length) * sin(theta)
     
 
+    # Partial derivatives, by the chain rule through the auxiliary equations
+    
+    J_f_omega__theta = -((g / length) * cos(theta))
+    
+
+    
+    J[1, 2] = 1.0
     
-    out[1] = dtheta_dt - f_theta
+    J[2, 1] = J_f_omega__theta
     
-    out[2] = domega_dt - f_omega
+    J[2, 2] = -damping
     
+    return nothing
 end
 
-function main()
+const jac_prototype = sparse(Int[1, 2, 2], Int[2, 1, 2], zeros(3), 2, 2)
+
+
+
+function solve_once(ring_header, ring_records)
     # Initial conditions for state variables
     u0 = [
         
@@ -120,40 +299,123 @@ function main()
         
     ]
 
-    # Initial guess for derivatives (can be zeros)
-    du0 = zeros(2)
+    # Parameters and time span come from the GUI's shared block
+    param_gen, params = read_shared_params()
 
     # Problem setup
-    tspan = (t0, t1)
-    prob = DAEProblem(dae!, du0, u0, tspan, differential_vars = [true, true])
+    tspan = (params.t0, params.t1)
+    
+    
+    prob = ODEProblem(ODEFunction(ode!; jac=jac!, jac_prototype=jac_prototype), u0, tspan, params)
+    
+    
 
-    # Callback for writing results to a file for GUI visualization
-    # In a production GUI, this would write to shared memory.
-    outfile = open("models/pendulum.csv", "w")
+    # Results go to the GUI through the shared memory ring; the result file
+    # is an optional archival copy ([output] archive = false to disable).
+    ring_reset!(ring_header)
+    
+    
+    outfile = open_result_file("models/pendulum.pkr", ["t", "theta", "omega"])
+    n_rows = Ref(0)
+    
+    
     
-    write(outfile, "t,theta,omega\n")
 
-    step_callback = function (integrator)
-        t = integrator.t
-        y = integrator.u
-        write(outfile, string(t))
-        
-        write(outfile, "," * string(y[1]))
-        
-        write(outfile, "," * string(y[2]))
-        
-        write(outfile, "\n")
-        flush(outfile)
+    # Results on the output grid: the callback fires only on steps that
+    # pass output times, and sends the interpolated solution at each
+    t_out = output_times(params.t0, params.t1, output_dt, max_rows)
+    next_out = Ref(1)
+    output_due(u, t, integrator) = next_out[] <= Base.length(t_out) && t >= t_out[next_out[]]
+
+    output_callback = function (integrator)
+        while next_out[] <= Base.length(t_out) && t_out[next_out[]] <= integrator.t
+            t = t_out[next_out[]]
+            y = integrator(t)
+            ring_push!(ring_header, ring_records, t, y)
+            
+            
+            write(outfile, Float64(t), y)
+            n_rows[] += 1
+            n_rows[] % 1024 == 0 && set_result_rows!(outfile, n_rows[])
+            
+            
+            next_out[] += 1
+        end
         return false
     end
+
+    control_callback = function (integrator)
+        # GUI control: hold while paused, end the run on stop/quit
+        state = check_gui_state()
+        while state == 'p'
+            sleep(0.01)
+            state = check_gui_state()
+        end
+        if state == 's' || state == 'q'
+            terminate!(integrator)
+            return false
+        end
+        # Pick up parameter edits; cheap when the generation has not moved
+        gen, new_params = read_shared_params(param_gen)
+        if new_params !== nothing
+            param_gen = gen
+            integrator.p = new_params
+            u_modified!(integrator, true)
+        end
+        return false
+    end
+    # Output comes first, so a stop request still writes the last step's rows
+    cb = CallbackSet(
+        DiscreteCallback(output_due, output_callback, save_positions=(false, false)),
+        DiscreteCallback((f,t,integrator)->true, control_callback, save_positions=(false, false))
+    )
+    # Results are streamed by the callbacks, so the solution object keeps nothing
     
-    cb = DiscreteCallback((f,t,integrator)->true, step_callback)
+    # Solve the ODE; dt is the initial step
+    sol = solve(prob, Tsit5(), dt=dt, adaptive=true, callback=cb,
+                abstol=abstol, reltol=reltol, save_everystep=false)
     
-    sol = solve(prob, IDA(), dt=dt, adaptive=false, callback=cb, abstol=1e-8, reltol=1e-6)
 
+    
+    
+    set_result_rows!(outfile, n_rows[])
+    
     close(outfile)
     
-    println("GUI simulation completed successfully")
+    
+end
+
+# Persistent worker: stays loaded (and compiled) between runs. The GUI asks
+# for a run by bumping `run_id`; each run reads the parameters and tspan
+# afresh and is acknowledged through `done_id`. Only 'q' ends the process.
+function main()
+    map_shared!()
+    ring_header, ring_records = open_result_ring()
+    # A request made while the worker was starting is still pending
+    last_run = read_done_id()
+    println("Solver worker ready")
+    while check_gui_state() != 'q'
+        run_id = read_run_id()
+        if run_id == last_run
+            sleep(0.005)
+            continue
+        end
+        last_run = run_id
+        try
+            solve_once(ring_header, ring_records)
+            println("Run $run_id completed")
+        catch e
+            # A failed run (e.g. bad parameters) leaves the worker usable
+            println("Run $run_id failed: $e")
+            write_shared_state('e')
+        end
+        write_done_id(run_id)
+        # Leave 'r' only if no newer run was requested meanwhile
+        if read_run_id() == run_id && check_gui_state() == 'r'
+            write_shared_state('s')
+        end
+    end
+    println("Solver worker exiting")
 end
 
 # Execute main function
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# pendulum_numpy.py - NumPy reference backend, generated from
+# models/pendulum.toml by generate_julia_odesolver.py. Do not edit.
+# Run with: python numpy_solver.py pendulum
+import numpy as np
+
+MODEL_NAME = "pendulum"
+VARIABLE_NAMES = ['theta', 'omega']
+PARAMETERS = {
+    "mass": 1.0,
+    "length": 1.0,
+    "damping": 0.1,
+    "g": 9.81,
+}
+INITIAL_CONDITIONS = [0.785398, 0.0]
+T0 = 0.0
+T1 = 100.0
+DT = 0.01
+METHOD = "Tsit5"
+OUTPUT_DT = 0.01
+MAX_ROWS = 0
+ABSTOL = 1e-08
+RELTOL = 1e-06
+OUTPUT_FORMAT = "binary"
+
+
+def rhs(t, u, p):
+    """du/dt for a state `u[..., n_vars]`; parameters are read as attributes
+    of `p` and may be scalars or arrays that broadcast against `u[..., 0]`."""
+    # Extract state variables
+    theta = u[..., 0]
+    omega = u[..., 1]
+
+    # Parameters
+    mass = p.mass
+    length = p.length
+    damping = p.damping
+    g = p.g
+
+    # Auxiliary equations and f_<var> expressions, in dependency order
+    f_theta = omega
+    f_omega = -damping * omega - (g / length) * np.sin(theta)
+
+    return np.stack(np.broadcast_arrays(f_theta, f_omega), axis=-1)
+
+
+def jac(t, u, p):
+    """Jacobian d rhs / du at a state `u[..., n_vars]`, of shape
+    `u.shape + (n_vars,)`, from the generator's symbolic derivatives."""
+    # Extract state variables
+    theta = u[..., 0]
+    omega = u[..., 1]
+
+    # Parameters
+    mass = p.mass
+    length = p.length
+    damping = p.damping
+    g = p.g
+
+    # Model equations, as in rhs
+    f_theta = omega
+    f_omega = -damping * omega - (g / length) * np.sin(theta)
+
+    # Partial derivatives, by the chain rule through the auxiliary equations
+    J_f_omega__theta = -((g / length) * np.cos(theta))
+
+    J = np.zeros(np.shape(u) + (len(VARIABLE_NAMES),), dtype=np.result_type(u, 1.0))
+    J[..., 0, 1] = 1.0
+    J[..., 1, 0] = J_f_omega__theta
+    J[..., 1, 1] = -damping
+    return J
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+numpy_solver
+============
+
+Pure NumPy reference solver: a Julia-free path for quick iterations on small
+models and for CI.  `generate_julia_odesolver.py` emits the model as
+`models/<model>_numpy.py`, a vectorised `rhs(t, u, p)` built once from
+`[equations.ode]`, `[equations.auxiliary]` and the Godley flows.  This
+module drives it with either
+
+* fixed-step classical RK4 (`[solver] method = "RK4"`), or
+* adaptive Dormand-Prince 5(4), the Tsit5-class default for any other method,
+
+and writes the same output contract as the Julia cmdl solver:
+`models/<model>.csv` with a `t,<variables>` header and one row per output
+time after `t0`.  Output times follow `[solver] output_dt` and `max_rows`
+as in the Julia solvers (`output_times`); the steppers interpolate their
+dense output onto them, so both backends write the same row times.
+
+`solve_ensemble` runs many parameter sets in one integration loop: the
+state is `(n_members, n_vars)`, parameters are per-member arrays, members
+that diverge are dropped as they go, and results come back as
+`(n_members, n_steps, n_vars)`, optionally in a `.npy` memmap.
+
+Example:
+```bash
+./generate_julia_odesolver.py pendulum
+python numpy_solver.py pendulum
+```
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+import time
+import numpy as np
+
+from result_io import RESULT_SUFFIX, write_result
+
+MODELS_DIR = Path("models")
+
+# Dormand-Prince 5(4) tableau; the last stage is FSAL (first same as last)
+DP_C = np.array([0.0, 1/5, 3/10, 4/5, 8/9, 1.0, 1.0])
+DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+DP_B = np.array([35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84, 0.0])
+DP_E = DP_B - np.array([5179/57600, 0.0, 7571/16695, 393/640,
+                        -92097/339200, 187/2100, 1/40])
+# Dense output: y(t + s h) = y + h * sum_i k_i * (DP_P[i] @ [s, s^2, s^3, s^4])
+DP_P = np.array([
+    [1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0, 40617522/29380423, -110615467/29380423, 69997945/29380423],
+])
+
+
+def method_kind(method):
+    """Map a TOML `[solver] method` (Julia naming) onto a NumPy integrator."""
+    return "rk4" if str(method).lower() == "rk4" else "dopri5"
+
+
+def rk4_step(rhs, t, y, h, p):
+    k1 = rhs(t, y, p)
+    k2 = rhs(t + h / 2, y + h / 2 * k1, p)
+    k3 = rhs(t + h / 2, y + h / 2 * k2, p)
+    k4 = rhs(t + h, y + h * k3, p)
+    return y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+def hermite(t_prev, y_prev, f_prev, t, y, f, t_at):
+    """Cubic Hermite interpolant of one step, evaluated at `t_at`."""
+    h = t - t_prev
+    s = (t_at - t_prev) / h
+    return ((1 - s) * y_prev + s * y
+            + s * (s - 1) * ((1 - 2 * s) * (y - y_prev) + (s - 1) * h * f_prev + s * h * f))
+
+
+def rk4(rhs, y0, t0, t1, dt, p, t_out=None):
+    """Fixed-step RK4. Yields `(t, y)` after every step; the last step is
+    shortened to land on `t1`.  With output times `t_out` it yields the
+    solution at those instead, by cubic Hermite interpolation within a step."""
+    y = np.asarray(y0, dtype=np.float64)
+    n_steps = int(np.ceil((t1 - t0) / dt - 1e-9))
+    j = 0
+    for i in range(1, n_steps + 1):
+        t_prev, y_prev = t0 + (i - 1) * dt, y
+        t = t1 if i == n_steps else t0 + i * dt
+        y = rk4_step(rhs, t_prev, y, t - t_prev, p)
+        if t_out is None:
+            yield t, y
+            continue
+        f_prev = f = None
+        while j < len(t_out) and t_out[j] <= t:
+            if t_out[j] == t:
+                yield t, y
+            else:
+                if f is None:
+                    f_prev, f = rhs(t_prev, y_prev, p), rhs(t, y, p)
+                yield t_out[j], hermite(t_prev, y_prev, f_prev, t, y, f, t_out[j])
+            j += 1
+
+
+def error_norm(err, y, y_new, rtol, atol):
+    """RMS scaled error over the last axis: a scalar for one state, one value
+    per member for an `(n_members, n_vars)` ensemble."""
+    scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+    return np.sqrt(np.mean((err / scale) ** 2, axis=-1))
+
+
+def step_factor(err):
+    return 10.0 if err == 0 else min(10.0, max(0.2, 0.9 * err ** -0.2))
+
+
+def dopri5_stages(rhs, t, y, h, p, k0):
+    """One Dormand-Prince 5(4) trial step from `k0 = rhs(t, y, p)`.
+    Returns `(y_new, error_estimate, k)` with all seven stages `k`."""
+    k = [k0]
+    for s in range(1, 7):
+        dy = sum(a * k[j] for j, a in enumerate(DP_A[s]) if a)
+        k.append(rhs(t + DP_C[s] * h, y + h * dy, p))
+    y_new = y + h * sum(b * k[j] for j, b in enumerate(DP_B) if b)
+    err = h * sum(e * k[j] for j, e in enumerate(DP_E))
+    return y_new, err, k
+
+
+def dopri5_step(rhs, t, y, h, p, k0):
+    """As `dopri5_stages`, returning `(y_new, error_estimate, k_last)`;
+    `k_last` is FSAL."""
+    y_new, err, k = dopri5_stages(rhs, t, y, h, p, k0)
+    return y_new, err, k[6]
+
+
+def dopri5_dense(y, h, k, s):
+    """Fourth order continuous extension of a step from `y`, at `t + s h`."""
+    powers = s ** np.arange(1, 5)
+    return y + h * sum(ki * (DP_P[i] @ powers) for i, ki in enumerate(k) if DP_P[i].any())
+
+
+def dopri5(rhs, y0, t0, t1, p, dt=None, rtol=1e-6, atol=1e-8, max_step=np.inf, t_out=None):
+    """Adaptive Dormand-Prince 5(4) with FSAL. Yields `(t, y)` after every
+    accepted step. `dt` is the first trial step.  With output times `t_out`
+    it yields the dense output at those instead; steps are not shortened
+    to land on them."""
+    t = t0
+    y = np.asarray(y0, dtype=np.float64)
+    k0 = rhs(t, y, p)
+    h = min(dt if dt else 1e-3 * (t1 - t0), max_step)
+    j = 0
+    while t < t1:
+        h = min(h, t1 - t)
+        y_new, err_vec, k = dopri5_stages(rhs, t, y, h, p, k0)
+        err = error_norm(err_vec, y, y_new, rtol, atol)
+        if not np.isfinite(err):
+            err = np.inf
+        if err <= 1.0:
+            t_prev, y_prev = t, y
+            t = t1 if t + h >= t1 else t + h
+            y = y_new
+            k0 = k[6]
+            if t_out is None:
+                yield t, y
+            while t_out is not None and j < len(t_out) and t_out[j] <= t:
+                s = (t_out[j] - t_prev) / (t - t_prev)
+                yield t_out[j], (y if t_out[j] == t else dopri5_dense(y_prev, t - t_prev, k, s))
+                j += 1
+        h = min(h * step_factor(err), max_step)
+        if t < t1 and h < 1e-14 * max(abs(t), 1.0):
+            raise RuntimeError(f"Step size underflow at t={t}: the model is stiff or diverging")
+
+
+# -------- Ensembles --------
+def diverged(t, y, limit=1e12):
+    """Default ensemble termination test: non-finite or runaway members."""
+    return ~np.all(np.isfinite(y), axis=-1) | np.any(np.abs(y) > limit, axis=-1)
+
+
+def member_params(p, idx):
+    """Parameter set restricted to members `idx`; scalars are shared."""
+    return SimpleNamespace(**{name: (value[idx] if np.ndim(value) else value)
+                              for name, value in vars(p).items()})
+
+
+def integrate_ensemble(rhs, y0, t0, t_out, p, method="rk4", dt=None, terminate=diverged,
+                       out=None, rtol=1e-6, atol=1e-8):
+    """Advance all members of an ensemble together.
+
+    `y0` is `(n_members, n_vars)`; parameters in `p` are scalars (shared) or
+    `(n_members,)` arrays.  Results are stored at the output times `t_out`
+    (all after `t0`) into `out`, `(n_members, len(t_out), n_vars)`, which
+    may be a memmap.  After each output time `terminate(t, y)` selects
+    members to drop; the rest of their rows stay NaN and they cost nothing
+    from then on.  RK4 takes fixed steps of `dt`; Dormand-Prince shares one
+    adaptive step across the live members, clipped to land on `t_out`.
+
+    Returns `(out, n_valid)`, the number of stored rows per member.
+    """
+    y = np.array(y0, dtype=np.float64)
+    n_members, n_vars = y.shape
+    if out is None:
+        out = np.empty((n_members, len(t_out), n_vars))
+    out[...] = np.nan
+    n_valid = np.zeros(n_members, dtype=np.intp)
+    adaptive = method_kind(method) != "rk4"
+    idx = np.arange(n_members)
+    pa = p
+    t = t0
+    h = dt if dt else t_out[0] - t0
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        k0 = rhs(t, y, pa) if adaptive else None
+        for j, t_next in enumerate(t_out):
+            while t < t_next:
+                step = min(h, t_next - t)
+                if adaptive:
+                    y_new, err_vec, k_last = dopri5_step(rhs, t, y, step, pa, k0)
+                    err = error_norm(err_vec, y, y_new, rtol, atol)
+                    # Diverging members are dropped at the next output
+                    # time; they must not drive the shared step to zero
+                    live = np.isfinite(err) & np.all(np.isfinite(y_new), axis=-1)
+                    err = np.max(err[live], initial=0.0)
+                    if err <= 1.0:
+                        t = t_next if step == t_next - t else t + step
+                        y, k0 = y_new, k_last
+                    h = step * step_factor(err)
+                    if t < t_next and h < 1e-14 * max(abs(t), 1.0):
+                        raise RuntimeError(f"Step size underflow at t={t}: the model is stiff")
+                else:
+                    y = rk4_step(rhs, t, y, step, pa)
+                    t = t_next if step == t_next - t else t + step
+            out[idx, j] = y
+            n_valid[idx] = j + 1
+            stop = terminate(t, y)
+            if np.any(stop):
+                keep = ~stop
+                idx, y = idx[keep], y[keep]
+                if k0 is not None:
+                    k0 = k0[keep]
+                if len(idx) == 0:
+                    break
+                pa = member_params(p, idx)
+    return out, n_valid
+
+
+def load_backend(model_name, models_dir=MODELS_DIR):
+    """Import the generated `models/<model>_numpy.py`."""
+    path = Path(models_dir) / f"{model_name}_numpy.py"
+    if not path.exists():
+        raise FileNotFoundError(f"NumPy backend {path} not found. Use the code generator to make it.")
+    spec = importlib.util.spec_from_file_location(f"{model_name}_numpy", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def model_params(backend, overrides=None):
+    """Attribute-style parameter set (what the generated `rhs` expects)."""
+    return SimpleNamespace(**{**backend.PARAMETERS, **(overrides or {})})
+
+
+def solver_settings(backend):
+    """`(output_dt, max_rows, rtol, atol)` from a backend's `[solver]` table,
+    with the generator's defaults for backends generated before these."""
+    return (getattr(backend, "OUTPUT_DT", backend.DT), getattr(backend, "MAX_ROWS", 0),
+            getattr(backend, "RELTOL", 1e-6), getattr(backend, "ABSTOL", 1e-8))
+
+
+def solve_model(backend, method=None, params=None, rtol=None, atol=None):
+    """Integrate a loaded backend over its TOML tspan.
+
+    Returns `(t, y)` with `y` of shape `(n_rows, n_vars)` on the output grid
+    (`output_times`), excluding `t0`.  Tolerances default to the TOML ones.
+    """
+    p = model_params(backend, params)
+    kind = method_kind(method or backend.METHOD)
+    output_dt, max_rows, default_rtol, default_atol = solver_settings(backend)
+    t_out = output_times(backend.T0, backend.T1, output_dt, max_rows)
+    if kind == "rk4":
+        steps = rk4(backend.rhs, backend.INITIAL_CONDITIONS, backend.T0, backend.T1, backend.DT, p,
+                    t_out=t_out)
+    else:
+        steps = dopri5(backend.rhs, backend.INITIAL_CONDITIONS, backend.T0, backend.T1, p,
+                       dt=backend.DT, rtol=rtol or default_rtol, atol=atol or default_atol,
+                       t_out=t_out)
+    t, y = [], []
+    for tk, yk in steps:
+        t.append(tk)
+        y.append(yk)
+    n_vars = len(backend.VARIABLE_NAMES)
+    return np.array(t), np.array(y).reshape(-1, n_vars)
+
+
+def output_times(t0, t1, dt, max_rows=0):
+    """The output grid `t0 + dt, t0 + 2 dt, ..., t1`, with `dt` widened if
+    needed to keep to `max_rows` rows (0 = no limit), as in the Julia solvers."""
+    n_steps = int(np.ceil((t1 - t0) / dt - 1e-9))
+    if max_rows > 0 and n_steps > max_rows:
+        n_steps = max_rows
+        dt = (t1 - t0) / n_steps
+    t = t0 + dt * np.arange(1, n_steps + 1)
+    t[-1] = t1
+    return t
+
+
+def solve_ensemble(backend, members, method=None, y0=None, terminate=diverged,
+                   out_path=None, rtol=None, atol=None):
+    """Integrate many parameter sets of one model at once.
+
+    `members` maps parameter names to one value per member (a list of
+    per-member override dicts is accepted too); parameters not given keep
+    their TOML values.  `out_path` stores the results in a `.npy` memmap
+    instead of memory.
+
+    Returns `(t, y, n_valid)` with `y` of shape `(n_members, n_steps, n_vars)`.
+    """
+    if not isinstance(members, dict):
+        names = sorted({name for member in members for name in member})
+        members = {name: [member.get(name, backend.PARAMETERS[name]) for member in members]
+                   for name in names}
+    sizes = {len(values) for values in members.values()}
+    if len(sizes) != 1:
+        raise ValueError("Every ensemble parameter needs one value per member")
+    n_members = sizes.pop()
+    p = model_params(backend, {name: np.asarray(values, dtype=np.float64)
+                               for name, values in members.items()})
+    n_vars = len(backend.VARIABLE_NAMES)
+    if y0 is None:
+        y0 = backend.INITIAL_CONDITIONS
+    y0 = np.broadcast_to(np.asarray(y0, dtype=np.float64), (n_members, n_vars))
+    output_dt, max_rows, default_rtol, default_atol = solver_settings(backend)
+    t = output_times(backend.T0, backend.T1, output_dt, max_rows)
+    out = None
+    if out_path is not None:
+        out = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float64,
+                                        shape=(n_members, len(t), n_vars))
+    y, n_valid = integrate_ensemble(backend.rhs, y0, backend.T0, t, p,
+                                    method or backend.METHOD, backend.DT, terminate,
+                                    out, rtol or default_rtol, atol or default_atol)
+    if out_path is not None:
+        y.flush()
+    return t, y, n_valid
+
+
+def write_csv(path, names, t, y):
+    """Solver output contract: `t,<names>` header, one row per output time."""
+    np.savetxt(path, np.column_stack([t, y]), delimiter=",", fmt="%.17g",
+               header="t," + ",".join(names), comments="")
+
+
+def write_output(path, names, t, y):
+    """Same contract as `write_csv`, as a binary result file (result_io)."""
+    write_result(path, ["t"] + list(names), np.column_stack([t, y]))
+
+
+def output_path(backend, models_dir=MODELS_DIR):
+    """`models/<model>.pkr`, or `.csv` for models with [output] format = "csv"."""
+    fmt = getattr(backend, "OUTPUT_FORMAT", "binary")
+    return Path(models_dir) / f"{backend.MODEL_NAME}{'.csv' if fmt == 'csv' else RESULT_SUFFIX}"
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a model with the NumPy reference backend.")
+    parser.add_argument("model_name", help="Model in ./models, e.g. pendulum")
+    parser.add_argument("--method", choices=["rk4", "dopri5"], default=None,
+                        help="Integrator (default: from the TOML [solver] method)")
+    args = parser.parse_args()
+
+    backend = load_backend(args.model_name)
+    start = time.perf_counter()
+    t, y = solve_model(backend, args.method)
+    elapsed = time.perf_counter() - start
+    out_path = output_path(backend)
+    write = write_csv if out_path.suffix == ".csv" else write_output
+    write(out_path, backend.VARIABLE_NAMES, t, y)
+    print(f"Wrote {len(t)} rows to {out_path} in {elapsed:.3f}s")
+    print("Simulation completed successfully")
@@ -167,7 +167,9 @@ import os
 import argparse
 import toml
 import subprocess
-import re
+
+from build_cache import BuildCache, write_if_changed
+from expressions import latex_derivative, latex_symbol, parse
 
 SUBS_DICT = {
     'varphi': r'\varphi',
@@ -195,49 +197,21 @@ def tex_escape(s):
     return s.replace('_', r'\_')
 
 
-def substitute_symbols(expr, dotted=False):
-    # First handle f_variable references in RHS expressions
-    def repl_f_var(match):
-        var = match.group(1)
-        symbol = SUBS_DICT.get(var, var)
-        return f"\\dot{{{symbol}}}" if dotted else f"\\frac{{d{symbol}}}{{dt}}"
-    
-    # Replace f_variable patterns in the expression
-    expr = re.sub(r'f_(\w+)', repl_f_var, expr)
-    
-    # Now replace other symbols first
-    for key, val in sorted(SUBS_DICT.items(), key=lambda x: -len(x[0])):
-        # Use word boundaries to avoid partial matches
-        pattern = r'\b' + re.escape(key) + r'\b'
-        # Escape backslashes in replacement string for regex
-        escaped_val = val.replace('\\', '\\\\')
-        expr = re.sub(pattern, escaped_val, expr)
-    
-    # Replace all multiplication patterns after symbol substitution
-    expr = re.sub(r'\*\s*\(', r' \\cdot (', expr)  # * ( -> \cdot (
-    expr = re.sub(r'\)\s*\*\s*([A-Za-z\\\\])', r') \\cdot \1', expr)  # ) * letter/fraction -> ) \cdot letter/fraction
-    expr = re.sub(r'([A-Za-z])\s*\*\s*([A-Za-z\\\\])', r'\1 \\cdot \2', expr)  # letter * letter/fraction -> letter \cdot letter/fraction
-    expr = re.sub(r'([A-Za-z])\s*\*\s*\\\\frac', r'\1 \\cdot \\\\frac', expr)  # letter * \frac -> letter \cdot \frac
-    expr = re.sub(r'\)\s*\*\s*\\\\frac', r') \\cdot \\\\frac', expr)  # ) * \frac -> ) \cdot \frac
-    
-    # Remove any remaining standalone * operators
-    expr = re.sub(r'\s*\*\s*', r' ', expr)
-    
-    # Sanity check: fix double backslashes that aren't newline commands
-    # This handles cases where our regex escaping created \\lambda instead of \lambda
-    expr = re.sub(r'\\\\(?!\\)', r'\\', expr)  # Replace \\ with \ but not \\\
-    
-    return expr
+def substitute_symbols(expr, dotted=False, variables=()):
+    """LaTeX for a model expression, via the shared expression parser.
+
+    Names in SUBS_DICT get their symbol, `f_X` (and `dX` for X in
+    `variables`) become time derivatives.
+    """
+    return parse(expr).to_latex(SUBS_DICT, dotted, variables)
 
 
 def ode_lhs_tex(var, dotted=False):
     if var.startswith("f_"):
         var_name = var[2:]  # Remove 'f_' prefix
-        symbol = SUBS_DICT.get(var_name, var_name)
-        return f"\\dot{{{symbol}}}" if dotted else f"\\frac{{d{symbol}}}{{dt}}"
-    # For non-ODE variables, apply symbol substitution but don't escape underscores
-    symbol = SUBS_DICT.get(var, var)
-    return symbol
+        return latex_derivative(latex_symbol(var_name, SUBS_DICT), dotted)
+    # For non-ODE variables, apply symbol substitution
+    return latex_symbol(var, SUBS_DICT)
 
 
 def generate_table(title, data):
@@ -251,7 +225,7 @@ def generate_table(title, data):
     data_list = list(data.items())
     for i, (k, v) in enumerate(data_list):
         name = tex_escape(k)
-        symbol = SUBS_DICT.get(k, k)
+        symbol = latex_symbol(k, SUBS_DICT)
         # Add \\ only if not the last row
         ending = r' \\' if i < len(data_list) - 1 else ''
         lines.append(f"{name} & ${symbol}$ & {v}{ending}")
@@ -260,12 +234,12 @@ def generate_table(title, data):
     return "\n".join(lines)
 
 
-def generate_equations_section(title, equations, dotted=False):
+def generate_equations_section(title, equations, dotted=False, variables=()):
     lines = [f"\\section*{{{title}}}", r"\begin{align*}"]
     eq_list = list(equations.items())
     for i, (k, v) in enumerate(eq_list):
         lhs = ode_lhs_tex(k, dotted)
-        rhs = substitute_symbols(v, dotted)
+        rhs = substitute_symbols(v, dotted, variables)
         # Add \\ only if not the last equation
         ending = r' \\' if i < len(eq_list) - 1 else ''
         lines.append(f"{lhs} &= {rhs}{ending}")
@@ -290,10 +264,11 @@ def generate_latex(data, name, dotted=False):
 
     if 'equations' in data:
         eqs = data['equations']
+        variables = data.get('variables', {}).get('names', [])
         if 'auxiliary' in eqs:
-            lines.append(generate_equations_section("Auxiliary Equations", eqs['auxiliary'], dotted))
+            lines.append(generate_equations_section("Auxiliary Equations", eqs['auxiliary'], dotted, variables))
         if 'ode' in eqs:
-            lines.append(generate_equations_section("ODE Equations", eqs['ode'], dotted))
+            lines.append(generate_equations_section("ODE Equations", eqs['ode'], dotted, variables))
 
     lines.append(r"\end{document}")
     return "\n".join(lines)
@@ -304,28 +279,40 @@ def main():
     parser.add_argument("input", help="Input TOML file")
     parser.add_argument("--pdf", action="store_true", help="Compile to PDF")
     parser.add_argument("--dotted", action="store_true", help="Use dot notation for time derivatives")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild even if the build cache has the outputs up to date")
     args = parser.parse_args()
 
-    with open(args.input, "r") as f:
-        data = toml.load(f)
-
-    name = data['model_name'].replace('_', ' ')
-    
-    latex_code = generate_latex(data, name, dotted=args.dotted)
-
     basename = os.path.splitext(os.path.basename(args.input))[0]
     tex_file = os.path.join("docs", basename + ".tex")
+    pdf_file = os.path.join("docs", basename + ".pdf")
+
+    def write_tex():
+        with open(args.input, "r") as f:
+            data = toml.load(f)
+
+        name = data['model_name'].replace('_', ' ')
+
+        latex_code = generate_latex(data, name, dotted=args.dotted)
+
+        os.makedirs("docs", exist_ok=True)
+        write_if_changed(tex_file, latex_code)
+
+        print(f"LaTeX file written to: {tex_file}")
 
-    os.makedirs("docs", exist_ok=True)
-    with open(tex_file, "w") as f:
-        f.write(latex_code)
+    def compile_pdf():
+        subprocess.run(["pdflatex", basename + ".tex"], check=True, cwd="docs")
+        print("PDF compiled successfully.")
 
-    print(f"LaTeX file written to: {tex_file}")
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = [os.path.join(here, "odemodel2tex.py"), os.path.join(here, "expressions.py")]
+    build_cache = BuildCache()
+    build_cache.build(tex_file, [args.input, *sources], [tex_file], write_tex,
+                      params={"dotted": args.dotted}, force=args.force)
 
     if args.pdf:
         try:
-            subprocess.run(["pdflatex", basename + ".tex"], check=True, cwd="docs")
-            print("PDF compiled successfully.")
+            build_cache.build(pdf_file, [tex_file], [pdf_file], compile_pdf, force=args.force)
         except subprocess.CalledProcessError:
             print("Error running pdflatex. Please ensure it is installed.")
 
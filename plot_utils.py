@@ -9,11 +9,15 @@ PukahaPai ODE model plotting tools. For use in ./plots4models.py
 | License: GNU General Public License v3.0 <https://www.gnu.org/licenses/gpl-
 '''
 
+import hashlib
+import json
 import os
 import toml
 import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
-import re
+
+from expressions import NUMPY_CONSTANTS, ExpressionError, parse, python_name, topological_order
 
 
 def load_config(model_name):
@@ -23,6 +27,11 @@ def load_config(model_name):
     return toml.load(config_path)
 
 
+def parameter_literal(value):
+    text = repr(value)
+    return f"({text})" if text.startswith("-") else text
+
+
 def convert_julia_to_python(expression, parameters):
     """
     Convert Julia mathematical expressions to Python/NumPy equivalents.
@@ -32,37 +41,62 @@ def convert_julia_to_python(expression, parameters):
         parameters: Dictionary of parameter values for substitution
     
     Returns:
-        Python expression string ready for evaluation
+        Python expression string ready for evaluation; data names that are
+        Python keywords are renamed by `expressions.python_name`
     """
-    # Start with the original expression
-    py_expr = expression
-    
-    # Replace Julia exponentiation with Python
-    py_expr = re.sub(r'\^', '**', py_expr)
-    
-    # Replace Julia exp function with numpy exp
-    py_expr = re.sub(r'\bexp\(', 'np.exp(', py_expr)
-    
-    # Replace other common Julia math functions with numpy equivalents
-    julia_to_numpy = {
-        r'\bsin\(': 'np.sin(',
-        r'\bcos\(': 'np.cos(',
-        r'\btan\(': 'np.tan(',
-        r'\blog\(': 'np.log(',
-        r'\bsqrt\(': 'np.sqrt(',
-        r'\babs\(': 'np.abs(',
-    }
-    
-    for julia_func, numpy_func in julia_to_numpy.items():
-        py_expr = re.sub(julia_func, numpy_func, py_expr)
-    
-    # Substitute parameter values
-    for param_name, param_value in parameters.items():
-        # Use word boundaries to avoid partial matches
-        pattern = r'\b' + re.escape(param_name) + r'\b'
-        py_expr = re.sub(pattern, str(param_value), py_expr)
-    
-    return py_expr
+    expr = parse(expression)
+    names = {name: parameter_literal(value)
+             for name, value in parameters.items() if name in expr.symbols}
+    return expr.to_numpy(names)
+
+
+_derived_cache = {}
+
+
+def config_hash(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def compile_derived_variables(config, columns):
+    """Compile the auxiliary equations for evaluation over the data columns.
+
+    The equations are converted and dependency-sorted once, and each is
+    compiled to its own code object, so one that fails (to parse or to
+    evaluate) only loses itself and the equations that use it.  Compiled
+    evaluators are cached by a hash of the TOML config and the available
+    columns.  Returns `[(name, code, dependencies), ...]` in evaluation
+    order.
+    """
+    key = (config_hash(config), tuple(columns))
+    if key in _derived_cache:
+        return _derived_cache[key]
+
+    parameters = config.get("parameters", {})
+    auxiliary_eqs = config.get("equations", {}).get("auxiliary", {})
+    py_exprs, dependencies = {}, {}
+    for var_name, expression in auxiliary_eqs.items():
+        try:
+            dependencies[var_name] = set(parse(expression).symbols - parameters.keys() - NUMPY_CONSTANTS.keys())
+            py_exprs[var_name] = convert_julia_to_python(expression, parameters)
+        except ExpressionError as e:
+            print(f"Warning: Could not compute {var_name} = {expression}: {e}")
+
+    available = set(columns)
+    order, blocked = topological_order({name: deps & dependencies.keys()
+                                        for name, deps in dependencies.items()})
+    if blocked:
+        print(f"Warning: circular auxiliary equations, not computed: {blocked}")
+    compiled = []
+    for var_name in order:
+        missing = dependencies[var_name] - available
+        if missing:
+            print(f"Warning: Could not compute {var_name} = {py_exprs[var_name]}: missing {sorted(missing)}")
+            continue
+        code = compile(py_exprs[var_name], f"<auxiliary {var_name}>", "eval")
+        compiled.append((var_name, code, dependencies[var_name]))
+        available.add(var_name)
+    _derived_cache[key] = compiled
+    return compiled
 
 
 def compute_derived_variables(df, config):
@@ -76,132 +110,29 @@ def compute_derived_variables(df, config):
     Returns:
         DataFrame with added derived variables
     """
-    # Get parameters for substitution
-    parameters = config.get("parameters", {})
-    
-    # Get auxiliary equations
-    auxiliary_eqs = config.get("equations", {}).get("auxiliary", {})
-    
-    if not auxiliary_eqs:
+    if not config.get("equations", {}).get("auxiliary", {}):
         return df
-    
-    # Create a copy of the dataframe to avoid modifying the original
-    df_extended = df.copy()
-    
-    # Create a namespace for evaluation that includes numpy and existing columns
-    # Handle 'lambda' as a special case since it's a Python keyword
-    eval_namespace = {
-        'np': np,
-        't': df_extended['t'].values,
-    }
-    
-    # Add all existing columns to namespace, handling 'lambda' specially
-    for col in df_extended.columns:
-        if col == 'lambda':
-            eval_namespace['lambda_var'] = df_extended[col].values
-        else:
-            eval_namespace[col] = df_extended[col].values
-    
-    # Sort auxiliary equations by dependency (simple topological sort)
-    # This ensures variables are computed in the right order
-    computed_vars = set(df_extended.columns)
-    remaining_eqs = auxiliary_eqs.copy()
-    
-    max_iterations = len(remaining_eqs) * 2  # Prevent infinite loops
-    iteration = 0
-    
-    while remaining_eqs and iteration < max_iterations:
-        iteration += 1
-        progress_made = False
-        
-        for var_name, expression in list(remaining_eqs.items()):
-            # Convert Julia expression to Python
-            py_expr = convert_julia_to_python(expression, parameters)
-            
-            # Handle 'lambda' keyword issue by replacing with 'lambda_var'
-            py_expr = re.sub(r'\blambda\b', 'lambda_var', py_expr)
-            
-            # Extract variable names from the expression
-            var_pattern = r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'
-            expr_vars = set(re.findall(var_pattern, py_expr))
-            
-            # Remove numpy functions and constants, but keep variable names
-            numpy_items = {'np', 'exp', 'sin', 'cos', 'tan', 'log', 'sqrt', 'abs', 'e'}
-            # Don't remove 'pi' since it might be a user variable, not np.pi
-            expr_vars = expr_vars - numpy_items
-            
-            # Convert 'lambda' references back for dependency checking
-            expr_vars_original = set()
-            for var in expr_vars:
-                if var == 'lambda_var':
-                    expr_vars_original.add('lambda')
-                else:
-                    expr_vars_original.add(var)
-            
-            # Check if all required variables are available
-            if expr_vars_original.issubset(computed_vars):
-                try:
-                    # Evaluate the expression
-                    result = eval(py_expr, {"__builtins__": {}}, eval_namespace)
-                    
-                    # Add to dataframe and evaluation namespace
-                    df_extended[var_name] = result
-                    
-                    # Handle special case for lambda in namespace
-                    if var_name == 'lambda':
-                        eval_namespace['lambda_var'] = result
-                    else:
-                        eval_namespace[var_name] = result
-                    
-                    computed_vars.add(var_name)
-                    
-                    # Remove from remaining equations
-                    del remaining_eqs[var_name]
-                    progress_made = True
-                    
-                    print(f"Computed derived variable: {var_name}")
-                    
-                except Exception as e:
-                    print(f"Warning: Could not compute {var_name} = {py_expr}: {e}")
-                    # Don't remove immediately, might work in next iteration
-            else:
-                missing_vars = expr_vars_original - computed_vars
-                if iteration == 1:  # Only print on first iteration to avoid spam
-                    print(f"Waiting for dependencies for {var_name}: {missing_vars}")
-        
-        if not progress_made:
-            # Try one more time with more detailed error reporting
-            print("No progress made, checking remaining equations...")
-            for var_name, expression in remaining_eqs.items():
-                py_expr = convert_julia_to_python(expression, parameters)
-                py_expr = re.sub(r'\blambda\b', 'lambda_var', py_expr)
-                
-                var_pattern = r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'
-                expr_vars = set(re.findall(var_pattern, py_expr))
-                numpy_items = {'np', 'exp', 'sin', 'cos', 'tan', 'log', 'sqrt', 'abs', 'e'}
-                expr_vars = expr_vars - numpy_items
-                
-                expr_vars_original = set()
-                for var in expr_vars:
-                    if var == 'lambda_var':
-                        expr_vars_original.add('lambda')
-                    else:
-                        expr_vars_original.add(var)
-                
-                missing_vars = expr_vars_original - computed_vars
-                available_in_namespace = [var for var in expr_vars if var in eval_namespace]
-                
-                print(f"  {var_name}: expression = {py_expr}")
-                print(f"    required vars: {expr_vars_original}")
-                print(f"    missing vars: {missing_vars}")
-                print(f"    available in namespace: {available_in_namespace}")
-            break
-    
-    # Warn about any remaining uncomputed variables
-    if remaining_eqs:
-        print(f"Warning: Could not compute the following derived variables: {list(remaining_eqs.keys())}")
-    
-    return df_extended
+
+    columns = {col: df[col].to_numpy() for col in df.columns}
+    namespace = {python_name(col): values for col, values in columns.items()}
+    global_namespace = {"np": np, "__builtins__": {}}
+    values, failed = {}, set()
+    for name, code, dependencies in compile_derived_variables(config, list(df.columns)):
+        lost = failed & dependencies
+        if lost:
+            print(f"Warning: Could not compute {name}: needs {sorted(lost)}")
+            failed.add(name)
+            continue
+        try:
+            # Constant equations broadcast to a column
+            result = np.broadcast_to(eval(code, global_namespace, namespace), len(df)).copy()
+        except Exception as e:
+            print(f"Warning: Could not compute {name}: {e}")
+            failed.add(name)
+            continue
+        values[name] = namespace[python_name(name)] = result
+        print(f"Computed derived variable: {name}")
+    return pd.DataFrame({**columns, **values}, index=df.index)
 
 
 def plot_phase_2d(df, xvar, yvar, aspect=(1.0, 1.0)):
@@ -377,17 +308,16 @@ def plot_dual_axis_time_series(df, time_var, value_vars):
             # zerolinewidth=1
         ),
         yaxis=dict(
-            title=var1,
+            title=dict(text=var1, font=dict(color=color1)),
             color=color1,
             gridcolor='rgba(100,100,100,0.3)',
             zeroline=True,
             zerolinecolor=faint1,
             zerolinewidth=1,
-            titlefont=dict(color=color1),
             tickfont=dict(color=color1)
         ),
         yaxis2=dict(
-            title=var2,
+            title=dict(text=var2, font=dict(color=color2)),
             color=color2,
             overlaying='y',
             side='right',
@@ -395,7 +325,6 @@ def plot_dual_axis_time_series(df, time_var, value_vars):
             zeroline=True,
             zerolinecolor=faint2,
             zerolinewidth=1,
-            titlefont=dict(color=color2),
             tickfont=dict(color=color2)
         )
     )
@@ -3,21 +3,43 @@
 model_plots.py
 ==============
 This script generates an interactive plot of a model's simulation results
-using Plotly. It reads a CSV file generated by the ODE solver, creates a
-Plotly figure, and serves it via a simple HTTP server. The plot is opened
-in the default web browser.
+using Plotly. It reads the result file (binary `.pkr` or CSV) written by
+the ODE solver, creates Plotly figures, and writes them to a tabbed HTML
+report, `models/<model>.html`.
+
+To keep the report small each trace is cut down to a point budget with
+peak-preserving min/max decimation (`--points`, or `[plots] max_points` in
+the model TOML; 0 keeps every sample).  Trace data is embedded as base64
+typed arrays, and traces plotted against time share a single time axis
+that is written once.
+
+Figures are built and serialized in a process pool (`--jobs`); each job
+maps the result file and copies out only the columns it plots.  The
+report comes out the same whatever the number of jobs.
 
 Example:
 ```bash
 ./model_plots.py pendulum
+./model_plots.py pendulum --points 0   # full resolution
+./model_plots.py pendulum --jobs 4
 ```
 Copyright: (c) 2025 Bijou M. Smith
 License: GNU General Public License v3.0 <https://www.gnu.org/licenses/gpl-
 '''
 
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import json
 import os
+from pathlib import Path
+import tempfile
+import time
+import numpy as np
 import pandas as pd
-import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+from build_cache import BuildCache
+from live_data import MinMaxDecimator
+from result_io import RESULT_SUFFIX, load_result, open_result, result_path, write_result
 from stability import load_eigenvalues, generate_stability_figures, generate_stability_report_html
 from plot_utils import (
     load_config, compute_derived_variables, plot_time_series,
@@ -25,18 +47,173 @@ from plot_utils import (
 )
 
 
-def main(model_name):
-    model_dir = os.path.join("models", model_name)
-    csv_path = os.path.join("models", f"{model_name}.csv")
-    df = pd.read_csv(csv_path)
+DEFAULT_MAX_POINTS = 4000
+# The code a report depends on, for the build cache
+REPORT_SOURCES = [Path(__file__).resolve().parent / name for name in (
+    "plots4model.py", "plot_utils.py", "stability.py", "result_io.py", "live_data.py", "expressions.py")]
+
+
+def b64_array(a, dtype):
+    return base64.b64encode(np.ascontiguousarray(a, dtype=dtype).tobytes()).decode("ascii")
+
+
+class SharedTimeAxis:
+    """The report's time axis, written once.
+
+    Traces plotted against `t` carry only uint32 positions into it.  Only
+    the samples some trace actually uses are kept, so the axis shrinks with
+    the decimation too.
+    """
+    def __init__(self, t):
+        self.t = np.asarray(t, dtype=np.float64)
+        self._used = []
+        self.idx = None
+
+    def matches(self, x):
+        return x is not None and len(x) == len(self.t) and \
+            np.array_equal(np.asarray(x, dtype=np.float64), self.t)
+
+    def use(self, idx):
+        self._used.append(idx)
+        self.idx = None
+
+    def finish(self):
+        self.idx = np.unique(np.concatenate(self._used)) if self._used else np.empty(0, dtype=np.intp)
+
+    def positions(self, idx):
+        return np.searchsorted(self.idx, idx)
+
+    def to_js(self):
+        return b64_array(self.t[self.idx], np.float64)
+
+
+def peak_indices(columns, max_points):
+    """Sample indices keeping each bucket's min and max of every column,
+    about `max_points` in total; None if the trace is already small enough."""
+    n = len(columns[0])
+    if not max_points or n <= max_points:
+        return None
+    decimator = MinMaxDecimator(max(max_points // len(columns), 4))
+    decimator.update(columns)
+    return np.unique(np.concatenate([decimator.indices(i) for i in range(len(columns))]))
+
+
+def compact_figure(fig, max_points, axis):
+    """Decimate a figure's traces in place.
+
+    Returns `[(trace_number, indices), ...]` for traces whose x values are
+    to come from the shared time axis; their `x` is dropped from the figure.
+    """
+    shared = []
+    for j, trace in enumerate(fig.data):
+        coords = [k for k in ("x", "y", "z") if getattr(trace, k, None) is not None]
+        arrays = {k: np.asarray(getattr(trace, k), dtype=np.float64) for k in coords}
+        on_time_axis = "z" not in arrays and axis.matches(trace.x)
+        # Against time only the y values have peaks worth keeping
+        keys = ["y"] if on_time_axis else coords
+        idx = peak_indices([arrays[k] for k in keys], max_points)
+        if idx is None:
+            idx = np.arange(len(arrays[coords[0]]))
+        if on_time_axis:
+            trace.update(x=None, y=arrays["y"][idx])
+            axis.use(idx)
+            shared.append((j, idx))
+        else:
+            trace.update({k: arrays[k][idx] for k in coords})
+    return shared
+
+
+def count_points(fig):
+    return sum(len(trace.y) for trace in fig.data if getattr(trace, "y", None) is not None)
+
+
+def figure_html(div_id, fig_json, shared, axis):
+    # null: the trace uses every sample of the shared axis
+    refs = [[j, None if len(idx) == len(axis.idx) else b64_array(axis.positions(idx), np.uint32)]
+            for j, idx in shared]
+    return (f'<div class="plot-container"><div id="{div_id}" class="plotly-graph-div"></div></div>\n'
+            f'<script>renderFigure("{div_id}", {fig_json}, {json.dumps(refs)});</script>\n')
+
+
+# -------- Figure jobs (run in a process pool) --------
+_result = None
+_axis = None
+_time_var = None
+_max_points = None
+
+
+def _init_worker(result_file, time_var, max_points):
+    """Map the result once per worker; jobs copy out only their columns."""
+    global _result, _axis, _time_var, _max_points
+    _result = open_result(result_file)
+    _axis = SharedTimeAxis(_result.column(time_var))
+    _time_var = time_var
+    _max_points = max_points
+
+
+def _build_figures(job):
+    """Build, decimate and serialize one figure job.
+
+    Returns `[(figure JSON, shared axis indices, n_points), ...]`.
+    """
+    kind, args = job
+    if kind == "stability":
+        figs = generate_stability_figures(*load_eigenvalues(args))
+    else:
+        names = [_time_var] + [v for v in args[0] if v != _time_var]
+        df = pd.DataFrame(_result.columns(names), columns=names)
+        if kind == "time_series":
+            figs = plot_time_series(df, _time_var, args[0])
+        elif kind == "phase_2d":
+            figs = [plot_phase_2d(df, *args[0], args[1])]
+        else:
+            figs = [plot_phase_3d(df, *args[0], args[1])]
+    built = []
+    for fig in figs:
+        shared = compact_figure(fig, _max_points, _axis)
+        built.append((fig.to_json(), shared, count_points(fig)))
+    return built
+
+
+def build_figures(fig_jobs, result_file, time_var, max_points, jobs=None):
+    """Run figure jobs, over a process pool unless `jobs` is 1. Results
+    come back in job order whatever order the workers finish in."""
+    initargs = (str(result_file), time_var, max_points)
+    if jobs == 1 or len(fig_jobs) <= 1:
+        _init_worker(*initargs)
+        return [_build_figures(job) for job in fig_jobs]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=initargs) as pool:
+        return list(pool.map(_build_figures, fig_jobs))
+
+
+def main(model_name, max_points=None, jobs=None, force=False):
+    """Build `models/<model>.html`, unless the build cache has it up to date
+    with the model TOML, the result and eigenvalue files and this code."""
+    source = result_path(model_name)
+    if source is None:
+        raise FileNotFoundError(f"No result file for model '{model_name}' in models")
+    eigen = result_path(model_name, suffix="_eigen")
+    html_path = Path("models") / f"{model_name}.html"
+    inputs = [Path("models") / f"{model_name}.toml", source, *([eigen] if eigen else []), *REPORT_SOURCES]
+    BuildCache().build(html_path, inputs, [html_path], lambda: write_report(model_name, max_points, jobs),
+                       params={"max_points": max_points}, force=force)
+
+
+def write_report(model_name, max_points=None, jobs=None):
+    start = time.perf_counter()
+    source = result_path(model_name)
+    result = load_result(model_name)
+    df = result.to_dataframe()
 
     config = load_config(model_name)
+    if max_points is None:
+        max_points = config.get("plots", {}).get("max_points", DEFAULT_MAX_POINTS)
     df = compute_derived_variables(df, config)
 
     time_var = "t"
     value_vars = [col for col in df.columns if col != time_var]
-    ts_figs = []
-    stability_figs = []
+    sim_jobs = []
+    stability_jobs = []
     markdown_report = ""
 
     # --- Time series plots ---
@@ -48,9 +225,9 @@ def main(model_name):
     if len(ts_vars) > max_vars_per_plot:
         for i in range(0, len(ts_vars), max_vars_per_plot):
             subset = ts_vars[i:i + max_vars_per_plot]
-            ts_figs.extend(plot_time_series(df, time_var, subset))
+            sim_jobs.append(("time_series", (subset,)))
     else:
-        ts_figs.extend(plot_time_series(df, time_var, ts_vars))
+        sim_jobs.append(("time_series", (ts_vars,)))
 
     # --- Phase plots ---
     phase_cfgs = config.get("plots", {}).get("phase", [])
@@ -65,25 +242,43 @@ def main(model_name):
         if not all(v in df.columns for v in vars_):
             continue
         if len(vars_) == 2:
-            ts_figs.append(plot_phase_2d(df, vars_[0], vars_[1], aspect))
+            sim_jobs.append(("phase_2d", (vars_, aspect)))
         elif len(vars_) == 3:
-            ts_figs.append(plot_phase_3d(df, vars_[0], vars_[1], vars_[2], aspect))
+            sim_jobs.append(("phase_3d", (vars_, aspect)))
 
     # --- Stability Analysis ---
-    stability_enabled = config.get("eigenvalues", {}).get("all", False)
-    eig_df = load_eigenvalues(model_name)
-    if stability_enabled and eig_df is not None:
-        stability_figs = generate_stability_figures(eig_df)
-        report_path = generate_stability_report_html(model_name, eig_df)
+    # Any eigen result file counts: from the solver ([eigenvalues] all) or
+    # computed afterwards by eigen_analysis.py
+    eig = load_eigenvalues(model_name)
+    if eig is not None:
+        stability_jobs.append(("stability", model_name))
+        report_path = generate_stability_report_html(model_name, *eig)
         with open(report_path) as f:
             markdown_report = f.read()
     else:
         markdown_report = (
             "No stability analysis is available for this model.\n\n"
-            "To generate a stability analysis use this in your toml file:\n"
-            "<pre>\n[eigenvalues]\nall = true\n</pre>"
+            "To generate one from the stored trajectory, run:\n"
+            f"<pre>\npython eigen_analysis.py {model_name}\n</pre>"
         )
 
+    # --- Build the figures in parallel, then share the time axis ---
+    with tempfile.TemporaryDirectory() as scratch:
+        result_file = source
+        if source.suffix != RESULT_SUFFIX or len(df.columns) > len(result.names):
+            # Workers map the result file, so derived variables need one too
+            result_file = Path(scratch) / f"{model_name}{RESULT_SUFFIX}"
+            write_result(result_file, list(df.columns), df.to_numpy(dtype=np.float64))
+        built = build_figures(sim_jobs + stability_jobs, result_file, time_var, max_points, jobs)
+    ts_figs = [fig for figs in built[:len(sim_jobs)] for fig in figs]
+    stability_figs = [fig for figs in built[len(sim_jobs):] for fig in figs]
+    axis = SharedTimeAxis(df[time_var])
+    for _, shared, _ in ts_figs + stability_figs:
+        for _, idx in shared:
+            axis.use(idx)
+    axis.finish()
+    n_points = sum(n for _, _, n in ts_figs + stability_figs)
+
     # --- Write HTML with Tabs ---
     '''
     Colours: 
@@ -112,7 +307,21 @@ def main(model_name):
 <head>
   <meta charset="utf-8">
   <title>Model: {model_name}</title>
-  <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+  <script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>
+  <script>
+    function decodeArray(b64, Type) {{
+      const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+      return new Type(bytes.buffer);
+    }}
+    const T = decodeArray("{axis.to_js()}", Float64Array);
+    function renderFigure(id, fig, shared) {{
+      for (const [j, positions] of shared) {{
+        fig.data[j].x = positions === null ? T :
+          Float64Array.from(decodeArray(positions, Uint32Array), i => T[i]);
+      }}
+      Plotly.newPlot(id, fig.data, fig.layout, {{responsive: true}});
+    }}
+  </script>
   <style>
     body {{
         background-color: black;
@@ -166,20 +375,14 @@ def main(model_name):
   <div id="sim" class="tab-content active">
 """)
         # Add simulation figures
-        for fig in ts_figs:
-            #f.write(pio.to_html(fig, include_plotlyjs=False, full_html=False))
-            f.write('<div class="plot-container">\n')
-            f.write(pio.to_html(fig, include_plotlyjs=False, full_html=False, config={"responsive": True}))
-            f.write('</div>\n')
+        for i, (fig_json, shared, _) in enumerate(ts_figs):
+            f.write(figure_html(f"sim-{i}", fig_json, shared, axis))
 
         f.write("</div><div id=\"stability\" class=\"tab-content\">\n")
 
         # Add stability figures and markdown
-        for fig in stability_figs:
-            #f.write(pio.to_html(fig, include_plotlyjs=False, full_html=False))
-            f.write('<div class="plot-container">\n')
-            f.write(pio.to_html(fig, include_plotlyjs=False, full_html=False, config={"responsive": True}))
-            f.write('</div>\n')
+        for i, (fig_json, shared, _) in enumerate(stability_figs):
+            f.write(figure_html(f"stability-{i}", fig_json, shared, axis))
 
         # Markdown report
         f.write(f"<div class=\"markdown-report\">{markdown_report}</div>")
@@ -197,11 +400,21 @@ def main(model_name):
 </body>
 </html>
 """)
+    elapsed = time.perf_counter() - start
+    size_kb = os.path.getsize(html_path) / 1024
     print(f"HTML plot with tabs written to {html_path}")
+    print(f"Report: {size_kb:.0f} KiB, {n_points} points ({len(df)} samples, "
+          f"max {max_points or 'all'} per trace), built in {elapsed:.2f}s")
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Generate interactive Plotly plots for a model with stability tab.")
     parser.add_argument("model_name", help="The name of the model (e.g., 'pendulum').")
+    parser.add_argument("--points", type=int, default=None,
+                        help=f"Max points per trace (default: [plots] max_points or {DEFAULT_MAX_POINTS}; 0 = all)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Worker processes for building figures (default: all CPUs)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild even if the build cache has the report up to date")
     args = parser.parse_args()
-    main(args.model_name)
+    main(args.model_name, args.points, args.jobs, args.force)
@@ -17,6 +17,12 @@ This presumes an ODES model specification `pendulum.toml` exists in
 the `./models` directory.  If successful the generated Julia code will be 
 in `./models/pendulum.jl`.
 
+The model is read from `./init`, or given on the command line so that
+several viewers (one model each) can run at once:
+```bash
+./pukahaPai.py lorenz_attractor
+```
+
 
 | Copyright: (c) 2025 Bijou M. Smith
 | License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
@@ -32,15 +38,24 @@ from multiprocessing import shared_memory
 import subprocess
 import threading
 import time
+from contextlib import contextmanager
 import colorsys
+import hashlib
 import dearpygui.dearpygui as dpg 
+from live_data import CsvTailReader, MinMaxDecimator, RunningExtrema, WindowExtrema
+from result_io import RESULT_SUFFIX, ResultTailReader, result_path
+from shared_mem import (
+    ResultRing, RingReader, attach_segment, create_ctypes_struct,
+    seqlock_begin, seqlock_end, seqlock_read, request_run,
+    new_session_name, ring_name, list_sessions, reclaim_stale_segments
+)
 
 # -------- Configuration --------
 INIT_PATH = "./init"
 MODELS_DIR = "./models"
-SHM_NAME = "pukaha_shared"
 BUFF = 25
 USE_LEGEND = False
+POINT_BUDGET = 2000   # per series, about 2x a plot's pixel width
 
 
 def load_model_spec(model_path):
@@ -69,11 +84,15 @@ def load_model_spec(model_path):
 
 # -------- Load Init File and TOML Model --------
 def get_model_path():
-    if not os.path.exists(INIT_PATH):
-        print("Error: Missing './init'. Please create a file with one line: model name.")
-        sys.exit(1)
-    with open(INIT_PATH, "r") as f:
-        model_name = f.read().strip()
+    if len(sys.argv) > 1:
+        # Model on the command line, so several viewers can run side by side
+        model_name = sys.argv[1]
+    else:
+        if not os.path.exists(INIT_PATH):
+            print("Error: Missing './init'. Please create a file with one line: model name.")
+            sys.exit(1)
+        with open(INIT_PATH, "r") as f:
+            model_name = f.read().strip()
     model_path = os.path.join(MODELS_DIR, f"{model_name}.toml")
     if not os.path.exists(model_path):
         print(f"Error: Model file '{model_path}' not found.")
@@ -143,53 +162,59 @@ def add_single_variable_plot(parent, y_name, tspan, color):
 def update_plots(model_name, y_names, plot_data, plot_ctrl):
     """Enhanced plot updating with throttling and better axis scaling.
     No explicit `tspan` here, we use whatever is in the CSV file 
-    from the julia solver."""
+    from the julia solver.  Only rows appended since the last call are
+    parsed (see `live_data.CsvTailReader`)."""
     # Check throttle
     current_time = time.time()
     if current_time - plot_ctrl.last_plot_update < plot_ctrl.throttle_delay:
         return
-    csv_path = f"models/{model_name}.csv"
-    if not os.path.exists(csv_path):
-        return
+    reader = plot_ctrl.get_reader(model_name)
         
     try:
-        with open(csv_path, 'r') as f:
-            lines = [line.strip() for line in f.readlines()[1:] if line.strip()]
-            if not lines:
-                return
-            # Also skip plot update if no new lines
-            if len(lines) == plot_ctrl.last_csvlines_len:
-                return  # nothing new → skip redraw
-            plot_ctrl.last_csvlines_len = len(lines)
-            # Use last 1000 points but respect throttling
-            data = [line.split(',') for line in lines]
-            t = [float(row[0]) for row in data]
-            if not t:
-                return
-                
-            for i, y_name in enumerate(y_names, start=1):
-                series_tag, x_axis_tag, y_axis_tag = plot_data[y_name]
-                y_values = [float(row[i]) for row in data]
-                
-                # Update data series
-                dpg.set_value(series_tag, [t, y_values])
+        # Skip plot update if no new lines
+        if reader.poll() == 0 and not plot_ctrl.redraw:
+            return  # nothing new → skip redraw
+        plot_ctrl.redraw = False
+        t = reader.column(0)
+        if len(t) == 0:
+            return
+        columns = [reader.column(i) for i in range(1, len(y_names) + 1)]
+        # Reduce each series to the point budget, keeping peaks; the state
+        # is per run, so a new run starts over whatever its length
+        decimator = plot_ctrl.decimator
+        decimator.update(columns, reader.runs)
+        # Axis extrema are folded in from the new samples only
+        extrema = plot_ctrl.get_extrema(len(y_names))
+        if plot_ctrl.window_span:
+            extrema.update(t, columns, reader.runs)
+            x_min = max(t[0], t[-1] - plot_ctrl.window_span)
+        else:
+            extrema.update(columns, reader.runs)
+            x_min = 0.0
+        # Enhanced X axis scaling
+        # margin = 0.01 * (t[-1] - t[0]) if len(t) > 1 else 1.0
+        # dpg.set_axis_limits(x_axis_tag, t[0], t[-1] + margin)
+        margin = 0.01 * (t[-1] - x_min)
                 
-                # Enhanced X axis scaling
-                if len(t) > 1:
-                    # margin = 0.01 * (t[-1] - t[0]) if len(t) > 1 else 1.0
-                    # dpg.set_axis_limits(x_axis_tag, t[0], t[-1] + margin)
-                    margin = 0.01 * (t[-1] - t[0]) 
-                    dpg.set_axis_limits(x_axis_tag, 0.0, t[-1] + margin)
+        for i, y_name in enumerate(y_names, start=1):
+            series_tag, x_axis_tag, y_axis_tag = plot_data[y_name]
+            y_values = columns[i - 1]
+            
+            # Update data series
+            idx = decimator.indices(i - 1)
+            dpg.set_value(series_tag, [t[idx], y_values[idx]])
+            
+            if len(t) > 1:
+                plot_ctrl.set_axis_limits(x_axis_tag, x_min, t[-1] + margin)
     
-                # Auto-scale Y axis with better padding
-                if y_values:
-                    y_min = min(y_values)
-                    y_max = max(y_values)
-                    if y_max != y_min:
-                        padding = 0.1 * (y_max - y_min)
-                    else:
-                        padding = 0.1
-                    dpg.set_axis_limits(y_axis_tag, y_min - padding, y_max + padding)
+            # Auto-scale Y axis with better padding
+            y_min, y_max = extrema.limits(i - 1)
+            if y_min <= y_max:
+                if y_max != y_min:
+                    padding = 0.1 * (y_max - y_min)
+                else:
+                    padding = 0.1
+                plot_ctrl.set_axis_limits(y_axis_tag, y_min - padding, y_max + padding)
         
         plot_ctrl.last_plot_update = current_time
                     
@@ -199,45 +224,94 @@ def update_plots(model_name, y_names, plot_data, plot_ctrl):
 
 class PlotController:
     '''Optional, but useful for inspecting transients perhaps.'''
-    def __init__(self, param_dict):
-        self.last_csvlines_len = 0
+    def __init__(self, param_dict, ring=None, names=None):
+        self.reader = None
+        self.ring = ring
+        self.names = names
         self.tspan = [param_dict['t0'][1], param_dict['t1'][1]]
         self.throttle_delay = 0.0  # No throttle by default
         self.last_plot_update = 0.0
+        # Points sent to the renderer per series, ~2x the plot pixel width
+        self.point_budget = POINT_BUDGET
+        self.decimator = MinMaxDecimator(self.point_budget)
+        self.redraw = False
+        # Y autoscaling: whole history, or a trailing time window
+        self.window_span = 0.0
+        self.extrema = None
+        self._axis_limits = {}
         
     def set_throttle(self, delay_ms):
         """Set plot update throttle in milliseconds"""
         self.throttle_delay = delay_ms / 1000.0
 
+    def set_point_budget(self, n_points):
+        """Set the target number of points drawn per series"""
+        self.point_budget = max(int(n_points), 4)
+        self.decimator.set_budget(self.point_budget)
+        self.redraw = True  # re-bucket what we already have
+
+    def set_window(self, span):
+        """Follow only the trailing `span` time units (0 = whole run)"""
+        self.window_span = max(float(span), 0.0)
+        self.extrema = None
+        self.redraw = True
+
+    def get_extrema(self, n_series):
+        """Running (or sliding window) extrema used for Y autoscaling"""
+        if self.extrema is None:
+            if self.window_span:
+                self.extrema = WindowExtrema(n_series, self.window_span)
+            else:
+                self.extrema = RunningExtrema(n_series)
+        return self.extrema
+
+    def set_axis_limits(self, axis_tag, lo, hi):
+        """Only touch DearPyGui when the limits actually change"""
+        if self._axis_limits.get(axis_tag) == (lo, hi):
+            return
+        self._axis_limits[axis_tag] = (lo, hi)
+        dpg.set_axis_limits(axis_tag, lo, hi)
+
+    def get_reader(self, model_name):
+        """Persistent reader for the solver's live results: the shared
+        memory ring if there is one, else a tail reader on the result file"""
+        if self.reader is None:
+            if self.ring is not None:
+                self.reader = RingReader(self.ring, self.names)
+            else:
+                path = result_path(model_name) or f"models/{model_name}{RESULT_SUFFIX}"
+                if str(path).endswith(RESULT_SUFFIX):
+                    self.reader = ResultTailReader(path)
+                else:
+                    self.reader = CsvTailReader(path)
+        return self.reader
 
+    def reset(self):
+        """Forget previously read data, e.g. when a new run starts"""
+        if self.reader is not None:
+            self.reader.reset()
+        self.decimator.reset()
+        if self.extrema is not None:
+            self.extrema.reset()
 
-# -------------------- Shared memory handling section -------------------
-def create_ctypes_struct(param_dict):
-    """Enhanced struct creation - order matters for Julia compatibility"""
-    fields = [("state", ctypes.c_char)]
-    # Add t0, t1 first (to match Julia struct order)
-    if "t0" in param_dict:
-        fields.append(("t0", ctypes.c_double))
-    if "t1" in param_dict:
-        fields.append(("t1", ctypes.c_double))
-    
-    # Add other parameters
-    for name, (typ, _) in param_dict.items():
-        if name not in ["t0", "t1"]:  # Skip these, already added
-            fields.append((name, getattr(ctypes, typ)))
-    return type("ParamStruct", (ctypes.Structure,), {"_fields_": fields})
 
 
+# -------------------- Shared memory handling section -------------------
 class SharedSimState:
-    def __init__(self, param_dict, model_name):
+    def __init__(self, param_dict, model_name, n_cols=None, session=None):
+        # Session scoped segment names: one model run per session
+        self.session = session or new_session_name(model_name)
         self.ParamStruct = create_ctypes_struct(param_dict)
         self.struct_size = ctypes.sizeof(self.ParamStruct)
         self.param_dict = param_dict
         self.julia_script = f"./models/{model_name}_gui.jl"
         self._struct = None
         self.shm = None
+        self.ring = None
         self.is_owner = False
         self.julia_process = None
+        self._script_digest = None  # of the solver code the worker loaded
+        self._batch_depth = 0
         self._monitoring = False
         self._monitor_thread = None
         self._shutdown_event = threading.Event()
@@ -245,7 +319,7 @@ class SharedSimState:
         try:
             # Create or attach to shared memory
             self.shm = shared_memory.SharedMemory(
-                name=SHM_NAME,
+                name=self.session,
                 create=True,
                 size=self.struct_size
             )
@@ -254,18 +328,30 @@ class SharedSimState:
             self._struct.state = b'i'  # Initial state
             
             # Initialize parameters
-            for name, (_, val) in param_dict.items():
-                setattr(self._struct, name, val)
+            with self.param_update():
+                for name, (_, val) in param_dict.items():
+                    setattr(self._struct, name, val)
                 
         except FileExistsError:
             # Attach to existing shared memory
-            self.shm = shared_memory.SharedMemory(name=SHM_NAME)
+            self.shm = attach_segment(self.session)
             self._struct = self.ParamStruct.from_buffer(self.shm.buf)
             
         except Exception as e:
             self.cleanup_resources()
             raise RuntimeError(f"Shared memory init failed: {str(e)}")
 
+        # Result ring: (t, y1..yn) records published by the solver
+        if n_cols is not None:
+            try:
+                self.ring = ResultRing(ring_name(self.session), n_cols=n_cols, create=True)
+            except FileExistsError:
+                self.ring = ResultRing(ring_name(self.session))
+                if self.ring.n_cols != n_cols:
+                    self.ring.close()
+                    self.cleanup_resources()
+                    raise RuntimeError("Result ring layout mismatch - stale segment from another model?")
+
     def struct(self):
         if self._struct is None:
             raise RuntimeError("Shared memory struct not initialized")
@@ -290,6 +376,20 @@ class SharedSimState:
         except:
             return 'i'  # Default to idle on error
 
+    @contextmanager
+    def param_update(self):
+        """Group parameter writes into one seqlock generation, so readers
+        never see a half-updated parameter set. Nests."""
+        self._batch_depth += 1
+        if self._batch_depth == 1:
+            seqlock_begin(self._struct)
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                seqlock_end(self._struct)
+
     def set_param(self, name, value):
         """Validated parameter setter"""
         if name not in self.param_dict:
@@ -300,15 +400,59 @@ class SharedSimState:
                 value = float(value)
             elif param_type == "c_int":
                 value = int(value)
-            setattr(self._struct, name, value)
+            with self.param_update():
+                setattr(self._struct, name, value)
         except (TypeError, ValueError) as e:
             raise ValueError(f"Invalid value for {name}: {str(e)}")
 
+    def set_params(self, values):
+        """Set several parameters as one consistent update"""
+        with self.param_update():
+            for name, value in values.items():
+                self.set_param(name, value)
+
     def get_param(self, name):
         return getattr(self._struct, name)
 
+    def generation(self):
+        """Parameter block generation; even when no write is in progress"""
+        return self._struct.generation
+
+    def snapshot(self, last_generation=None):
+        """Consistent copy of the parameter block.
+
+        Returns `(generation, params)`; `params` is None if the generation
+        has not moved since `last_generation`.
+        """
+        generation, copy = seqlock_read(self._struct, last_generation)
+        if copy is None:
+            return generation, None
+        return generation, {name: getattr(copy, name) for name in self.param_dict}
+
+    def script_digest(self):
+        with open(self.julia_script, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def start_run(self, model_name):
+        """Ask the solver worker for a run with the current parameters and
+        tspan.  The worker stays loaded between runs; it is only (re)started
+        if it is not running or the generated model code has changed."""
+        if not os.path.exists(self.julia_script):
+            print(f"Error: Julia solver '{self.julia_script}' not found.")
+            return False
+        if not self.is_julia_running() or self.script_digest() != self._script_digest:
+            if not self.start_julia_solver(model_name):
+                return False
+        run_id = request_run(self._struct)
+        print(f"Requested run {run_id}")
+        return True
+
+    def stop_run(self):
+        """End the current run; the worker stays up for the next Start"""
+        self.set_state('s')
+
     def start_julia_solver(self, model_name):
-        """Start Julia solver with improved error handling"""
+        """Start the persistent Julia solver worker"""
         # Stop existing process if running
         self.stop_julia_solver()
         
@@ -319,13 +463,16 @@ class SharedSimState:
         try:
             # Clear shutdown event
             self._shutdown_event.clear()
+            self.set_state('i')
             
             # Start Julia process with better environment
             env = os.environ.copy()
             env['JULIA_NUM_THREADS'] = '1'  # Avoid threading issues
+            env['PUKAHA_SESSION'] = self.session
             
+            self._script_digest = self.script_digest()
             self.julia_process = subprocess.Popen(
-                ["julia", "--startup-file=no", self.julia_script],
+                ["julia", "--startup-file=no", self.julia_script, self.session],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
@@ -333,22 +480,14 @@ class SharedSimState:
                 preexec_fn=os.setsid  # Create new process group
             )
             
-            # Give Julia time to start up
-            time.sleep(0.5)
-            
-            # Check if process started successfully
-            if self.julia_process.poll() is not None:
-                stderr_output = self.julia_process.stderr.read()
-                print(f"Julia failed to start: {stderr_output}")
-                return False
-            
-            # Start monitoring thread
+            # No start-up wait: the worker picks up any run requested while
+            # it is still loading, and the monitor reports an early exit.
             self._monitoring = True
             self._monitor_thread = threading.Thread(target=self._monitor_julia_process)
             self._monitor_thread.daemon = True
             self._monitor_thread.start()
             
-            print("Julia solver started successfully")
+            print("Julia solver worker started")
             return True
             
         except Exception as e:
@@ -366,14 +505,18 @@ class SharedSimState:
                 if self._shutdown_event.is_set():
                     break
                     
-                # Read stdout with timeout using select (Unix-like systems)
+                # Read stdout and stderr with timeout using select (Unix-like
+                # systems). Both are drained: warnings left in a full stderr
+                # pipe would block the worker mid-run.
                 import select
-                ready, _, _ = select.select([self.julia_process.stdout], [], [], 0.1)
+                streams = [self.julia_process.stdout, self.julia_process.stderr]
+                ready, _, _ = select.select(streams, [], [], 0.1)
                 
-                if ready:
-                    line = self.julia_process.stdout.readline()
+                for stream in ready:
+                    line = stream.readline()
                     if line:
-                        print(f"Julia: {line.strip()}")
+                        prefix = "Julia" if stream is self.julia_process.stdout else "Julia stderr"
+                        print(f"{prefix}: {line.strip()}")
                         
             except Exception as e:
                 print(f"Monitor error: {e}")
@@ -457,6 +600,7 @@ class SharedSimState:
             
             # Reset process reference
             self.julia_process = None
+            self._script_digest = None
             
             # Set stopped state
             try:
@@ -481,6 +625,10 @@ class SharedSimState:
             if hasattr(self, '_struct') and self._struct is not None:
                 del self._struct
                 self._struct = None
+
+            if hasattr(self, 'ring') and self.ring is not None:
+                self.ring.close()
+                self.ring = None
                 
             if hasattr(self, 'shm') and self.shm is not None:
                 self.shm.close()
@@ -504,7 +652,7 @@ class SharedSimState:
 # --------------------- Enhanced DearPyGui GUI ------------------------
 def build_gui(model_name, param_dict, shared: SharedSimState):
     dpg.create_context()
-    dpg.create_viewport(title=f"pukahaPai | {model_name}", width=1200, height=600)
+    dpg.create_viewport(title=f"pukahaPai | {model_name} | {shared.session}", width=1200, height=600)
 
     # Get variable names and generate colors
     y_names, _ = extract_variable_names(model_path)
@@ -512,12 +660,13 @@ def build_gui(model_name, param_dict, shared: SharedSimState):
     plot_data = {}
 
     # Initialize plot controller
-    plot_ctrl = PlotController(param_dict)
+    plot_ctrl = PlotController(param_dict, ring=shared.ring, names=["t"] + y_names)
     plot_window = dpg.add_window(label="ODE Solution Plots", width=1000, height=600, pos=(210,0), tag="plot_window")
     
     for i, y_name in enumerate(y_names):
         plot_data[y_name] = add_single_variable_plot(plot_window, y_name, 
                                                      plot_ctrl.tspan, colors[i])
+    plot_ctrl.set_point_budget(2 * (dpg.get_item_width(plot_window) - BUFF))
 
     # Control panel window
     with dpg.window(label=f"pukahaPai | {model_name}", width=200, height=600, tag="main_window"):
@@ -539,8 +688,8 @@ def build_gui(model_name, param_dict, shared: SharedSimState):
             dpg.set_value(state_id, f"State: {state_messages.get(current_state, 'Unknown')}")
             # Update button states
             dpg.configure_item("start_button", 
-                enabled=current_state in ['i', 'p', 's'],
-                label="Start" if current_state in ['i', 's'] else "Resume")
+                enabled=current_state in ['i', 'p', 's', 'e'],
+                label="Resume" if current_state == 'p' else "Start")
             dpg.configure_item("pause_button",
                 enabled=current_state == 'r')
             dpg.configure_item("stop_button",
@@ -565,6 +714,37 @@ def build_gui(model_name, param_dict, shared: SharedSimState):
         )
         dpg.add_text("0 = No throttle (fastest)", wrap=180)
 
+        def budget_callback(sender, value):
+            plot_ctrl.set_point_budget(value)
+            print(f"Plot point budget set to {plot_ctrl.point_budget}")
+
+        dpg.add_input_int(
+            label="(pts)",
+            default_value=plot_ctrl.point_budget,
+            min_value=4,
+            min_clamped=True,
+            step=500,
+            width=150,
+            callback=budget_callback,
+            on_enter=True,
+            tag="budget_input"
+        )
+
+        def window_callback(sender, value):
+            plot_ctrl.set_window(value)
+            print(f"Plot window set to {plot_ctrl.window_span} (0 = all)")
+
+        dpg.add_input_float(
+            label="(window)",
+            default_value=0.0,
+            min_value=0.0,
+            min_clamped=True,
+            width=150,
+            callback=window_callback,
+            on_enter=True,
+            tag="window_input"
+        )
+
         def make_param_callback(name):
             def callback(sender, app_data):
                 shared.set_param(name, app_data)
@@ -599,9 +779,9 @@ def build_gui(model_name, param_dict, shared: SharedSimState):
             if current_state == 'p':  # Resume from pause
                 shared.set_state('r')
             else:  # Start new simulation
-                if shared.start_julia_solver(model_name):
-                    shared.set_state('r')
-                    print("Julia solver started, simulation running")
+                plot_ctrl.reset()
+                if shared.start_run(model_name):
+                    print("Simulation running")
                 else:
                     print("Failed to start Julia solver")
             refresh_state()
@@ -620,8 +800,8 @@ def build_gui(model_name, param_dict, shared: SharedSimState):
                 current_state = shared.get_state()
                 print(f"Current state before stop: {current_state}")
                 
-                # Always attempt to stop Julia solver
-                shared.stop_julia_solver()
+                # End the run; the warm worker is kept for the next Start
+                shared.stop_run()
                 
                 # Verify final state
                 final_state = shared.get_state()
@@ -651,19 +831,20 @@ def build_gui(model_name, param_dict, shared: SharedSimState):
         dpg.add_separator()
         dpg.add_button(label="Save html", tag="save_button", callback=save_model, width=90)
 
-    # Time tracking for main GUI update loop
-    last_update_time = 0
-    update_interval = 0.1  # 100ms = 10 FPS for GUI state updates
+    # Event driven main loop: the state byte and the ring's sequence counter
+    # are single loads, so they are checked every frame and the widgets and
+    # plots are only touched when one of them actually moved.
+    last_state = None
+    reader = plot_ctrl.get_reader(model_name)
 
     def render_callback():
-        nonlocal last_update_time
-        current_time = time.time()
-        refresh_state()  # Always update GUI state
-        # Plot updates are now throttled independently
-        if current_time - last_update_time >= update_interval:
-            if shared.get_state() == 'r' and shared._monitor_thread.is_alive():
-                update_plots(model_name, y_names, plot_data, plot_ctrl)
-            last_update_time = current_time
+        nonlocal last_state
+        current_state = shared.get_state()
+        if current_state != last_state:
+            refresh_state()
+            last_state = current_state
+        if reader.changed() or plot_ctrl.redraw:
+            update_plots(model_name, y_names, plot_data, plot_ctrl)
 
     # Main loop
     dpg.setup_dearpygui()
@@ -683,7 +864,13 @@ model_name, model_path = get_model_path()
 param_dict = load_model_spec(model_path)
 # print(f"{param_dict = }")
 # quit()
-shared = SharedSimState(param_dict, model_name)
+y_names, _ = extract_variable_names(model_path)
+# Clear segments left by crashed viewers, then list who else is running
+for name in reclaim_stale_segments():
+    print(f"Reclaimed stale shared memory segment: {name}")
+for session, entry in list_sessions().items():
+    print(f"Live session: {session} (model {entry['model']}, pid {entry['pid']})")
+shared = SharedSimState(param_dict, model_name, n_cols=1 + len(y_names))
 try:
     build_gui(model_name, param_dict, shared)
 finally:
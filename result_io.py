@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+result_io
+=========
+
+Binary result files for solver output, `models/<model>.pkr` (and
+`models/<model>_eigen.pkr` for eigenvalues), read back with `numpy.memmap`
+and no parsing.
+
+Layout (little-endian):
+
+    0   8 bytes  magic b"PUKARES1"
+    8   int64    header size in bytes (data offset, a multiple of 64)
+    16  int64    n_cols
+    24  int64    n_rows (records complete on disk)
+    32  int64    dtype code, 1 = float64, 2 = complex128
+    40  int64    length of the names block in bytes
+    48  names    utf-8, newline separated; zero padding to the header size
+    data         n_rows x n_cols records, row-major
+
+Writers append whole records and only then advance `n_rows`, so a reader
+(or a crash) never sees a half-written row.  The Julia templates write the
+same layout.
+
+`[output] format = "csv"` in the model TOML keeps the old CSV output, and
+`export_csv` / `import_csv` convert between the two:
+```bash
+python result_io.py models/pendulum.pkr              # -> models/pendulum.csv
+python result_io.py models/pendulum.csv --to-binary  # -> models/pendulum.pkr
+```
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import os
+import struct
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from live_data import ColumnBuffer
+
+RESULT_MAGIC = b"PUKARES1"
+RESULT_SUFFIX = ".pkr"
+HEADER_FIXED = 48
+ROWS_OFFSET = 24
+DTYPE_CODES = {1: np.dtype(np.float64), 2: np.dtype(np.complex128)}
+
+
+def _dtype_code(dtype):
+    for code, dt in DTYPE_CODES.items():
+        if np.dtype(dtype) == dt:
+            return code
+    raise ValueError(f"Unsupported result dtype: {dtype}")
+
+
+def read_result_header(path):
+    """Header of a result file as a dict (names, n_cols, n_rows, dtype,
+    header_bytes)."""
+    with open(path, "rb") as f:
+        fixed = f.read(HEADER_FIXED)
+        if len(fixed) < HEADER_FIXED or fixed[:8] != RESULT_MAGIC:
+            raise ValueError(f"{path} is not a result file")
+        header_bytes, n_cols, n_rows, code, names_len = struct.unpack("<5q", fixed[8:])
+        names = f.read(names_len).decode().split("\n")
+    if code not in DTYPE_CODES:
+        raise ValueError(f"{path}: unknown dtype code {code}")
+    return {"names": names, "n_cols": n_cols, "n_rows": n_rows,
+            "dtype": DTYPE_CODES[code], "header_bytes": header_bytes}
+
+
+class ResultWriter:
+    """Append records to a new result file.
+
+    `n_rows` on disk is advanced every `sync_every` records and on close,
+    so readers following the file see complete records only.
+    """
+    def __init__(self, path, names, dtype=np.float64, sync_every=1024):
+        self.path = path
+        self.names = list(names)
+        self.dtype = np.dtype(dtype)
+        self.sync_every = sync_every
+        self.n_rows = 0
+        self._synced = 0
+        blob = "\n".join(self.names).encode()
+        self.header_bytes = 64 * -(-(HEADER_FIXED + len(blob)) // 64)
+        self._f = open(path, "wb")
+        self._f.write(RESULT_MAGIC)
+        self._f.write(struct.pack("<5q", self.header_bytes, len(self.names), 0,
+                                  _dtype_code(self.dtype), len(blob)))
+        self._f.write(blob)
+        self._f.write(b"\0" * (self.header_bytes - HEADER_FIXED - len(blob)))
+        self._f.flush()  # an empty but valid file for readers
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=self.dtype).reshape(-1, len(self.names))
+        self._f.write(np.ascontiguousarray(rows).tobytes())
+        self.n_rows += len(rows)
+        if self.n_rows - self._synced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """Publish the records written so far."""
+        self._f.flush()
+        os.pwrite(self._f.fileno(), struct.pack("<q", self.n_rows), ROWS_OFFSET)
+        self._synced = self.n_rows
+
+    def close(self):
+        if self._f is not None:
+            self.sync()
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_result(path, names, data, dtype=np.float64):
+    """Write a whole `(n_rows, n_cols)` array as a result file."""
+    with ResultWriter(path, names, dtype) as writer:
+        writer.append(data)
+
+
+class ResultFile:
+    """A result file mapped read-only: `data` is an `(n_rows, n_cols)`
+    memmap and `column()` returns views into it."""
+    def __init__(self, names, data):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def column(self, key):
+        i = self.index[key] if isinstance(key, str) else key
+        return self.data[:, i]
+
+    def columns(self, keys):
+        """Only the requested columns, as a contiguous `(n_rows, k)` copy."""
+        return np.ascontiguousarray(self.data[:, [self.index[k] for k in keys]])
+
+    def to_dataframe(self):
+        return pd.DataFrame({name: self.data[:, i] for i, name in enumerate(self.names)})
+
+
+def _map_rows(path, header, start, stop):
+    n_cols = header["n_cols"]
+    if stop <= start:
+        return np.empty((0, n_cols), dtype=header["dtype"])
+    itemsize = header["dtype"].itemsize
+    return np.memmap(path, dtype=header["dtype"], mode="r", shape=(stop - start, n_cols),
+                     offset=header["header_bytes"] + start * n_cols * itemsize)
+
+
+def open_result(path):
+    """Map a binary result file (no parsing)."""
+    header = read_result_header(path)
+    return ResultFile(header["names"], _map_rows(path, header, 0, header["n_rows"]))
+
+
+def read_csv_result(csv_path):
+    """A solver CSV as a `ResultFile` (in memory)."""
+    df = pd.read_csv(csv_path, float_precision="round_trip")
+    return ResultFile(list(df.columns), df.to_numpy(dtype=np.float64))
+
+
+def result_path(model_name, models_dir="models", suffix=""):
+    """The newest of `<model><suffix>.pkr` / `.csv`, or None if neither exists."""
+    candidates = [Path(models_dir) / f"{model_name}{suffix}{ext}" for ext in (RESULT_SUFFIX, ".csv")]
+    existing = [p for p in candidates if p.exists()]
+    if not existing:
+        return None
+    return max(existing, key=lambda p: p.stat().st_mtime_ns)
+
+
+def load_result(model_name, models_dir="models"):
+    """Solver output for a model, binary or CSV, whichever was written last."""
+    path = result_path(model_name, models_dir)
+    if path is None:
+        raise FileNotFoundError(f"No result file for model '{model_name}' in {models_dir}")
+    return open_result(path) if path.suffix == RESULT_SUFFIX else read_csv_result(path)
+
+
+def _format_value(z):
+    if isinstance(z, complex):
+        return f"{z.real!r}{z.imag:+.17g}im"   # Julia's complex notation
+    return repr(z)
+
+
+def export_csv(path, csv_path=None):
+    """Convert a result file to the solver CSV layout. Returns the CSV path."""
+    csv_path = csv_path or Path(path).with_suffix(".csv")
+    result = open_result(path)
+    with open(csv_path, "w") as f:
+        f.write(",".join(result.names) + "\n")
+        if np.iscomplexobj(result.data):
+            for row in result.data.tolist():
+                f.write(",".join(_format_value(z) for z in row) + "\n")
+        else:
+            np.savetxt(f, result.data, delimiter=",", fmt="%.17g")
+    return csv_path
+
+
+def import_csv(csv_path, path=None):
+    """Convert a (real valued) solver CSV to a result file. Returns its path."""
+    path = path or Path(csv_path).with_suffix(RESULT_SUFFIX)
+    result = read_csv_result(csv_path)
+    write_result(path, result.names, result.data)
+    return path
+
+
+class ResultTailReader:
+    """Follow a result file that a solver is appending to.
+
+    Same `poll()/changed()/column()/reset()` interface and `runs` counter
+    as `live_data.CsvTailReader`; each poll maps only the records published
+    since the last one.
+    """
+    def __init__(self, path, capacity=4096):
+        self.path = path
+        self.capacity = capacity
+        self.runs = 0
+        self.header = None
+        self.buffer = None
+        self.consumed = 0
+        self._inode = None
+
+    def reset(self):
+        """Forget the rows read so far; what follows counts as a new run."""
+        self.header = None
+        self.buffer = None
+        self.consumed = 0
+        self._inode = None
+        self.runs += 1
+
+    def _n_rows(self):
+        with open(self.path, "rb") as f:
+            f.seek(ROWS_OFFSET)
+            return struct.unpack("<q", f.read(8))[0]
+
+    def changed(self):
+        try:
+            return self._n_rows() != self.consumed
+        except (FileNotFoundError, struct.error):
+            return False
+
+    def poll(self):
+        """Copy newly published records. Returns the number of rows added."""
+        try:
+            st = os.stat(self.path)
+            if self._inode is not None and st.st_ino != self._inode:
+                self.reset()  # re-created by a new solver run
+            if self.header is None:
+                self.header = read_result_header(self.path)
+                self.buffer = ColumnBuffer(self.header["names"], self.capacity)
+            self._inode = st.st_ino
+            n_rows = self._n_rows()
+        except (FileNotFoundError, ValueError, struct.error):
+            return 0
+        if n_rows < self.consumed:
+            self.reset()
+            return self.poll()
+        rows = _map_rows(self.path, self.header, self.consumed, n_rows)
+        self.consumed = n_rows
+        return self.buffer.append_rows(rows)
+
+    def column(self, key):
+        if self.buffer is None:
+            return np.empty(0)
+        return self.buffer.column(key)
+
+    def __len__(self):
+        return 0 if self.buffer is None else len(self.buffer)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert between binary result files and CSV.")
+    parser.add_argument("path", help="A .pkr result file (or a .csv with --to-binary)")
+    parser.add_argument("--to-binary", action="store_true", help="Convert a CSV into a result file")
+    parser.add_argument("-o", "--output", default=None, help="Output path (default: same name, new suffix)")
+    args = parser.parse_args()
+    if args.to_binary:
+        print(f"Wrote {import_csv(args.path, args.output)}")
+    else:
+        print(f"Wrote {export_csv(args.path, args.output)}")
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+'''
+shared_mem
+==========
+
+Shared memory data path between the solver and the pukahaPai viewer.
+
+The solver publishes `(t, y1..yn)` records into a fixed-capacity float64
+ring held in a POSIX shared memory segment.  The viewer maps the same
+segment as a NumPy view and copies out only the records written since its
+last poll, with no text formatting, parsing or file I/O.
+
+Segment layout (little-endian, as seen from Julia and NumPy):
+
+    header  : RING_HEADER_WORDS x int64
+              [0] magic   [1] capacity   [2] n_cols
+              [3] write index (records written this run)
+              [4] sequence counter (bumped on every publish and reset)
+              [5] run counter (bumped on reset)
+    records : capacity x n_cols float64, row-major
+
+Consumers detect new data by comparing the sequence counter with the value
+they last saw: one 8 byte load, so the viewer can check it every frame and
+skip the data path entirely while the solver is idle.
+
+The control/parameter block created from `create_ctypes_struct` is guarded by
+a seqlock: its `generation` counter is odd while a writer is mid-update, and
+readers retry if it moved while they copied the block.
+
+The same block carries the run protocol for a persistent solver worker,
+which stays loaded between runs instead of being relaunched on every Start:
+
+    state    : 'r' run / 'p' pause / 's' stop the current run / 'q' quit
+    run_id   : bumped by the viewer to request a run with the block's
+               current parameters and `t0, t1`
+    done_id  : set to `run_id` by the worker when that run has finished
+
+The worker waits for `run_id` to move past `done_id`, integrates,
+publishes into the ring (resetting it first), then stores `done_id`.  's'
+ends a run early but keeps the worker alive; only 'q' makes it exit.
+
+Workers map the block once and poll it with plain loads.  Its layout is
+fixed for the life of a session; the viewer restarts the worker when the
+generated solver changes, and the new worker maps the block afresh.
+
+Segments are session scoped, `pukaha_<model>_<pid>_<n>` for the control
+block and `<session>_ring` for the results, so several models can run side
+by side.  The viewer passes the session name to the solver on its command
+line (and as `PUKAHA_SESSION`).  The owning pid in the name lets
+`reclaim_stale_segments()` unlink what a crashed viewer left behind.
+
+Example, replaying a CSV through a ring without Julia:
+```bash
+python shared_mem.py models/pendulum.csv pukaha_pendulum_1234_0_ring
+```
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import ctypes
+import itertools
+import os
+from multiprocessing import resource_tracker, shared_memory
+import time
+import numpy as np
+
+from live_data import ColumnBuffer
+
+RING_MAGIC = 0x50554B52494E4701   # "PUKRING" + layout version 1
+RING_HEADER_WORDS = 8
+RING_CAPACITY = 1 << 16   # records; only needs to cover one plot refresh
+H_MAGIC, H_CAPACITY, H_NCOLS, H_WRITE, H_SEQ, H_RUN = range(6)
+
+
+SHM_PREFIX = "pukaha"
+SHM_DIR = "/dev/shm"
+RING_SUFFIX = "_ring"
+_session_counter = itertools.count()
+
+
+# -------- Sessions --------
+def new_session_name(model_name):
+    """Unique segment name for one model run owned by this process."""
+    return f"{SHM_PREFIX}_{model_name}_{os.getpid()}_{next(_session_counter)}"
+
+
+def ring_name(session):
+    return f"{session}{RING_SUFFIX}"
+
+
+def parse_session_name(name):
+    """Split a segment name into `(session, model, pid)`, or None if it is
+    not a session-scoped pukaha segment."""
+    if name.endswith(RING_SUFFIX):
+        name = name[:-len(RING_SUFFIX)]
+    prefix = f"{SHM_PREFIX}_"
+    if not name.startswith(prefix):
+        return None
+    parts = name[len(prefix):].rsplit("_", 2)
+    if len(parts) != 3 or not parts[1].isdigit() or not parts[2].isdigit():
+        return None
+    return name, parts[0], int(parts[1])
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
+
+
+def list_sessions():
+    """Registry of pukaha sessions found in shared memory.
+
+    Returns `{session: {"model", "pid", "alive", "segments"}}`.
+    """
+    try:
+        names = os.listdir(SHM_DIR)
+    except FileNotFoundError:
+        return {}
+    sessions = {}
+    for name in sorted(names):
+        parsed = parse_session_name(name)
+        if parsed is None:
+            continue
+        session, model, pid = parsed
+        entry = sessions.setdefault(session, {
+            "model": model, "pid": pid, "alive": _pid_alive(pid), "segments": []})
+        entry["segments"].append(name)
+    return sessions
+
+
+def reclaim_stale_segments():
+    """Unlink segments whose owning process no longer exists."""
+    reclaimed = []
+    for session, entry in list_sessions().items():
+        if entry["alive"]:
+            continue
+        for name in entry["segments"]:
+            try:
+                os.unlink(os.path.join(SHM_DIR, name))
+                reclaimed.append(name)
+            except FileNotFoundError:
+                pass
+    return reclaimed
+
+
+def attach_segment(name):
+    """Attach to an existing segment without letting this process' resource
+    tracker unlink it at exit (the creating process owns its lifetime)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# -------- Control/parameter block --------
+def create_ctypes_struct(param_dict):
+    """Enhanced struct creation - order matters for Julia compatibility"""
+    fields = [("state", ctypes.c_char)]
+    # Seqlock generation: odd while a writer is updating the block
+    fields.append(("generation", ctypes.c_uint64))
+    # Worker run protocol, see module docstring
+    fields.append(("run_id", ctypes.c_uint64))
+    fields.append(("done_id", ctypes.c_uint64))
+    # Add t0, t1 first (to match Julia struct order)
+    if "t0" in param_dict:
+        fields.append(("t0", ctypes.c_double))
+    if "t1" in param_dict:
+        fields.append(("t1", ctypes.c_double))
+    
+    # Add other parameters
+    for name, (typ, _) in param_dict.items():
+        if name not in ["t0", "t1"]:  # Skip these, already added
+            fields.append((name, getattr(ctypes, typ)))
+    return type("ParamStruct", (ctypes.Structure,), {"_fields_": fields})
+
+
+def seqlock_begin(struct):
+    struct.generation += 1   # odd: update in progress
+
+
+def seqlock_end(struct):
+    struct.generation += 1   # even: block consistent again
+
+
+def seqlock_read(struct, last_generation=None, timeout=1.0):
+    """Consistent copy of a seqlocked ctypes struct.
+
+    Returns `(generation, copy)`, with `copy` None when the generation still
+    equals `last_generation` (nothing to re-read).  Retries on a torn read,
+    yielding the CPU if a writer holds the lock for long.
+    """
+    cls = type(struct)
+    size = ctypes.sizeof(cls)
+    addr = ctypes.addressof(struct)
+    deadline = None
+    spins = 0
+    while True:
+        g1 = struct.generation
+        if not g1 & 1:
+            if g1 == last_generation:
+                return g1, None
+            copy = cls.from_buffer_copy(ctypes.string_at(addr, size))
+            if struct.generation == g1:
+                return g1, copy
+        spins += 1
+        if spins % 64 == 0:
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise RuntimeError("Parameter block stayed locked - writer died mid-update?")
+            time.sleep(0)
+
+
+def request_run(struct):
+    """Ask the worker for a new run with the block's current contents.
+    Returns the run id to wait for.  The new id is in place before the
+    state says 'r', and both land in one seqlock generation."""
+    seqlock_begin(struct)
+    struct.run_id += 1
+    struct.state = b'r'
+    seqlock_end(struct)
+    return struct.run_id
+
+
+def wait_for_run(struct, run_id, timeout=None, poll=0.005):
+    """Block until the worker reports `run_id` done. Returns False on timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while struct.done_id < run_id:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(poll)
+    return True
+
+
+# -------- Result ring --------
+def ring_size(n_cols, capacity):
+    return 8 * RING_HEADER_WORDS + 8 * n_cols * capacity
+
+
+class ResultRing:
+    """Fixed-capacity float64 record ring in a shared memory segment."""
+    def __init__(self, name, n_cols=None, capacity=RING_CAPACITY, create=False):
+        self.name = name
+        self.is_owner = create
+        if create:
+            self.shm = shared_memory.SharedMemory(
+                name=name, create=True, size=ring_size(n_cols, capacity))
+            self.header = np.ndarray((RING_HEADER_WORDS,), dtype=np.int64, buffer=self.shm.buf)
+            self.header[:] = 0
+            self.header[H_CAPACITY] = capacity
+            self.header[H_NCOLS] = n_cols
+            self.header[H_MAGIC] = RING_MAGIC
+        else:
+            self.shm = attach_segment(name)
+            self.header = np.ndarray((RING_HEADER_WORDS,), dtype=np.int64, buffer=self.shm.buf)
+            if self.header[H_MAGIC] != RING_MAGIC:
+                self.header = None
+                self.shm.close()
+                raise RuntimeError(f"Shared memory '{name}' is not a result ring")
+        self.capacity = int(self.header[H_CAPACITY])
+        self.n_cols = int(self.header[H_NCOLS])
+        self.records = np.ndarray((self.capacity, self.n_cols), dtype=np.float64,
+                                  buffer=self.shm.buf, offset=8 * RING_HEADER_WORDS)
+
+    @property
+    def write_index(self):
+        return int(self.header[H_WRITE])
+
+    @property
+    def seq(self):
+        return int(self.header[H_SEQ])
+
+    @property
+    def run(self):
+        return int(self.header[H_RUN])
+
+    # -------- Producer side --------
+    def reset(self):
+        """Start a new run: readers see the write index go back to zero."""
+        self.header[H_WRITE] = 0
+        self.header[H_RUN] += 1
+        self.header[H_SEQ] += 1
+
+    def append(self, rows):
+        """Publish a `(k, n_cols)` block (or a single record)."""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.n_cols)
+        w = self.write_index
+        k = len(rows)
+        if k > self.capacity:  # only the newest records can survive anyway
+            w += k - self.capacity
+            rows = rows[-self.capacity:]
+            k = self.capacity
+        slots = np.arange(w, w + k) % self.capacity
+        self.records[slots] = rows
+        # Records must be in place before the index makes them visible
+        self.header[H_WRITE] = w + k
+        self.header[H_SEQ] += 1
+
+    # -------- Consumer side --------
+    def wait_for_seq(self, last_seq, timeout=None):
+        """Block until the sequence counter moves past `last_seq`.
+
+        Spins briefly, then backs off to short sleeps, so a waiting consumer
+        wakes within about a millisecond without burning a core.  Returns the
+        new counter, or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pause = 0.0
+        while True:
+            seq = self.seq
+            if seq != last_seq:
+                return seq
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            if pause:
+                time.sleep(pause)
+            pause = min(max(2 * pause, 1e-5), 1e-3)
+
+    def read_since(self, start):
+        """Copy out records `[start, write_index)`.
+
+        Returns `(rows, first, end)` where `first` is the index of the first
+        returned record; it is greater than `start` if the reader fell more
+        than `capacity` records behind and older ones were overwritten.
+        """
+        end = self.write_index
+        first = max(start, end - self.capacity)
+        if end <= first:
+            return np.empty((0, self.n_cols)), first, end
+        rows = self.records[np.arange(first, end) % self.capacity]
+        # Drop anything the producer overwrote while we were copying
+        lost = self.write_index - self.capacity - first
+        if lost > 0:
+            rows = rows[lost:]
+            first += lost
+        return rows, first, end
+
+    def close(self):
+        self.header = None
+        self.records = None
+        if self.shm is not None:
+            self.shm.close()
+            if self.is_owner:
+                try:
+                    self.shm.unlink()
+                except FileNotFoundError:
+                    pass
+            self.shm = None
+
+
+class RingReader:
+    """Viewer-side consumer of a `ResultRing`.
+
+    Has the same `poll()/column()/reset()` interface as
+    `live_data.CsvTailReader`, so `update_plots` works with either.
+    """
+    def __init__(self, ring, names=None, capacity=4096):
+        self.ring = ring
+        self.header = list(names) if names else [f"c{i}" for i in range(ring.n_cols)]
+        self.buffer = ColumnBuffer(self.header, capacity)
+        self.consumed = 0
+        self.last_seq = -1
+        self.last_run = ring.run
+        self.runs = 0   # new runs seen, as live_data.CsvTailReader.runs
+        self.dropped = 0
+
+    def reset(self):
+        """Forget the rows read so far; what follows counts as a new run."""
+        self.buffer.clear()
+        self.consumed = 0
+        self.last_seq = -1
+        self.last_run = self.ring.run
+        self.runs += 1
+
+    def changed(self):
+        """True if the producer has published since the last `poll()`."""
+        return self.ring.seq != self.last_seq
+
+    def wait(self, timeout=None):
+        """Block until new records arrive, then poll them."""
+        if self.ring.wait_for_seq(self.last_seq, timeout) is None:
+            return 0
+        return self.poll()
+
+    def poll(self):
+        """Copy newly published records. Returns the number of rows added."""
+        seq = self.ring.seq
+        if seq == self.last_seq:
+            return 0
+        if self.ring.run != self.last_run or self.ring.write_index < self.consumed:
+            # Producer started a new run
+            self.reset()
+        self.last_seq = seq
+        rows, first, end = self.ring.read_since(self.consumed)
+        self.dropped += first - self.consumed
+        self.consumed = end
+        return self.buffer.append_rows(rows)
+
+    def column(self, key):
+        return self.buffer.column(key)
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+def replay_csv(csv_path, ring_name, chunk=64, delay=0.0):
+    """Python stand-in for the Julia producer: publish a solver CSV into a
+    ring `chunk` rows at a time, so the viewer path can run without Julia."""
+    data = np.loadtxt(csv_path, delimiter=",", skiprows=1, ndmin=2)
+    ring = ResultRing(ring_name)
+    try:
+        ring.reset()
+        for i in range(0, len(data), chunk):
+            ring.append(data[i:i + chunk])
+            if delay:
+                time.sleep(delay)
+    finally:
+        ring.close()
+    return len(data)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay a solver CSV into a shared memory result ring.")
+    parser.add_argument("csv_path", help="Solver output, e.g. models/pendulum.csv")
+    parser.add_argument("ring_name", help="Name of an existing ring segment")
+    parser.add_argument("--chunk", type=int, default=64, help="Records per publish")
+    parser.add_argument("--delay", type=float, default=0.01, help="Seconds between publishes")
+    args = parser.parse_args()
+    n = replay_csv(args.csv_path, args.ring_name, args.chunk, args.delay)
+    print(f"Replayed {n} records into '{args.ring_name}'")
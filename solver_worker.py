@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+'''
+solver_worker
+=============
+
+Python stand-in for the persistent Julia solver worker.  It speaks the same
+run protocol over the session's control block (see `shared_mem`): wait for
+`run_id` to move, integrate from the block's `t0, t1` and parameters into
+the result ring, honour pause/stop/quit and parameter edits between steps,
+then publish `done_id`.
+
+The right-hand side is a Python callable `rhs(t, y, p)`, where `p` is a
+consistent copy of the parameter block, so the viewer side of the protocol
+can be exercised without Julia.  A fixed-step classical RK4 is used.  From
+the command line it serves a model's generated NumPy backend:
+```bash
+python solver_worker.py pendulum pukaha_pendulum_1234_0
+```
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import time
+import numpy as np
+
+from numpy_solver import load_backend, rk4_step
+from shared_mem import (
+    ResultRing, attach_segment, create_ctypes_struct, ring_name, seqlock_read
+)
+
+
+class StandinWorker:
+    """Long-lived worker attached to an existing viewer session."""
+    def __init__(self, session, param_dict, rhs, y0, dt, poll=0.002):
+        self.session = session
+        self.rhs = rhs
+        self.y0 = np.asarray(y0, dtype=np.float64)
+        self.dt = dt
+        self.poll = poll
+        self.shm = attach_segment(session)
+        self.struct = create_ctypes_struct(param_dict).from_buffer(self.shm.buf)
+        self.ring = ResultRing(ring_name(session))
+        self.runs = 0
+
+    def serve(self):
+        """Run requests until the viewer sends 'q'."""
+        # A request made while the worker was starting is still pending
+        last_run = self.struct.done_id
+        while self.struct.state != b'q':
+            run_id = self.struct.run_id
+            if run_id == last_run:
+                time.sleep(self.poll)
+                continue
+            last_run = run_id
+            self.solve_once()
+            self.struct.done_id = run_id
+            # Leave 'r' only if no newer run was requested meanwhile
+            if self.struct.run_id == run_id and self.struct.state == b'r':
+                self.struct.state = b's'
+
+    def solve_once(self):
+        gen, params = seqlock_read(self.struct)
+        t, t1, dt = params.t0, params.t1, self.dt
+        y = self.y0.copy()
+        self.ring.reset()
+        self.ring.append(np.concatenate(([t], y)))
+        while t < t1 - 1e-12 * max(abs(t1), 1.0):
+            state = self.struct.state
+            while state == b'p':
+                time.sleep(self.poll)
+                state = self.struct.state
+            if state in (b's', b'q'):
+                break
+            # Pick up parameter edits; cheap when the generation has not moved
+            new_gen, new_params = seqlock_read(self.struct, gen)
+            if new_params is not None:
+                gen, params = new_gen, new_params
+            h = min(dt, t1 - t)
+            y = rk4_step(self.rhs, t, y, h, params)
+            t += h
+            self.ring.append(np.concatenate(([t], y)))
+        self.runs += 1
+
+    def close(self):
+        self.struct = None
+        self.shm.close()
+        self.ring.close()
+
+
+def run_worker(session, param_dict, rhs, y0, dt, poll=0.002):
+    """Process entry point: serve one session until told to quit."""
+    worker = StandinWorker(session, param_dict, rhs, y0, dt, poll)
+    try:
+        worker.serve()
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a viewer session with a model's NumPy backend.")
+    parser.add_argument("model_name", help="Model in ./models, e.g. pendulum")
+    parser.add_argument("session", help="Shared memory session name of a running viewer")
+    args = parser.parse_args()
+    backend = load_backend(args.model_name)
+    param_dict = {"t0": ("c_double", backend.T0), "t1": ("c_double", backend.T1)}
+    for name, value in backend.PARAMETERS.items():
+        param_dict[name] = ("c_double" if isinstance(value, float) else "c_int", value)
+    run_worker(args.session, param_dict, backend.rhs, backend.INITIAL_CONDITIONS, backend.DT)
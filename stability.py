@@ -3,23 +3,77 @@
 stability
 ==========
 A stability analysis utility that can be imported into plots4models.py
-This includes loading the eigenvalue CSV, generating stability plots, 
+This includes loading the eigenvalues (binary result or CSV) into a complex
+`(T, n)` array, generating stability plots, 
 and creating a report.
 
 Copyright: (c) 2025 Bijou M. Smith
 License: GNU General Public License v3.0 <https://www.gnu.org/licenses/gpl-
 '''
+import io
 import os
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from result_io import RESULT_SUFFIX, open_result, result_path
 
-def load_eigenvalues(model_name):
-    eig_csv = os.path.join("models", f"{model_name}_eigen.csv")
-    if not os.path.exists(eig_csv):
+
+_eigen_cache = {}
+
+
+def load_eigenvalues(model_name, models_dir="models"):
+    """Eigenvalues over time as `(t, eigs)`: a float64 time vector of length
+    T and a `(T, n)` complex128 array, or None if the model has none.
+
+    A binary `<model>_eigen.pkr` is mapped without parsing, an older
+    `_eigen.csv` is parsed a column at a time.  Either is loaded once and
+    cached until the file changes.
+    """
+    path = result_path(model_name, models_dir, suffix="_eigen")
+    if path is None:
         return None
-    return pd.read_csv(eig_csv, header=None)
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _eigen_cache.get(str(path))
+    if cached is None or cached[0] != stamp:
+        if path.suffix == RESULT_SUFFIX:
+            data = open_result(path).data
+            eig = (np.ascontiguousarray(data[:, 0].real), np.ascontiguousarray(data[:, 1:]))
+        else:
+            eig = parse_eigen_csv(path)
+        cached = _eigen_cache[str(path)] = (stamp, eig)
+    return cached[1] if len(cached[1][0]) else None
+
+
+def parse_eigen_csv(path):
+    """`(t, eigs)` from a solver's eigenvalue CSV (Julia complex notation).
+
+    The Julia-to-Python rewrite of `safe_complex` is done once over the
+    whole text, which numpy then parses in one pass.
+    """
+    with open(path) as f:
+        text = f.read()
+    # The Julia solvers write a (loose) header line first
+    first = text.split("\n", 1)[0].split(",")[0]
+    if np.isnan(safe_float(first)):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+    if not text.strip():
+        return np.empty(0), np.empty((0, 0), dtype=np.complex128)
+    text = (text.replace("−", "-").replace(" ", "")
+            .replace("*im", "j").replace("im", "j"))
+    try:
+        data = np.loadtxt(io.StringIO(text), delimiter=",", dtype=np.complex128, ndmin=2)
+    except ValueError:
+        # Malformed cells: fall back to the forgiving scalar parser
+        df = pd.read_csv(io.StringIO(text), header=None, dtype=str, keep_default_na=False)
+        data = np.vectorize(safe_complex, otypes=[np.complex128])(df.to_numpy())
+    return np.ascontiguousarray(data[:, 0].real), np.ascontiguousarray(data[:, 1:])
+
+
+def max_real_part(eigs):
+    """max Re(λ) per time step, ignoring NaN eigenvalues."""
+    return np.fmax.reduce(eigs.real, axis=1)
 
 
 def safe_complex(x):
@@ -49,13 +103,8 @@ def safe_float(x):
             return float('nan')
 
 
-def generate_stability_figures(eig_df):
-    #t = eig_df.iloc[:, 0].round(1)  # str type I think
-    t = pd.to_numeric(eig_df.iloc[:, 0], errors='coerce')
-
-    eigvals = eig_df.iloc[:, 1:]
-
-    max_real = eigvals.apply(lambda row: max(row.apply(lambda x: safe_complex(x).real)), axis=1)
+def generate_stability_figures(t, eigs):
+    max_real = max_real_part(eigs)
 
     # 1. Max Re(λ)
     fig_max_real = go.Figure()
@@ -91,9 +140,8 @@ def generate_stability_figures(eig_df):
 
     # 2. All Re(λᵢ)
     fig_reals = go.Figure()
-    for col in eigvals.columns:
-        eig_real = eigvals[col].apply(lambda x: safe_complex(x).real)
-        fig_reals.add_trace(go.Scatter(x=t, y=eig_real, mode='lines', name=f"Re(λ{col})"))
+    for i in range(eigs.shape[1]):
+        fig_reals.add_trace(go.Scatter(x=t, y=eigs[:, i].real, mode='lines', name=f"Re(λ{i + 1})"))
 
     fig_reals.update_layout(
         title="Eigenvalue Real Parts Over Time",
@@ -126,65 +174,129 @@ def generate_stability_figures(eig_df):
 
 
 
-def generate_stability_report_md(model_name, eig_df):
-    t_raw = eig_df.iloc[:, 0]
-    eigvals = eig_df.iloc[:, 1:]
-    
-    # Convert time values to floats safely
-    t = t_raw.apply(safe_float)
-    
-    # Compute max real part of eigenvalues at each timestep
-    max_real = eigvals.apply(lambda row: max(row.apply(lambda x: safe_complex(x).real)), axis=1)
-    
+class StabilitySummary:
+    """Stability of a run, worked out once from max Re(λ) per time step and
+    shared by the Markdown and HTML reports.
+
+    Everything is array operations, so it holds up for millions of eigen
+    samples: unstable intervals come from `np.diff` of the instability mask,
+    and zero crossings of max Re(λ) are interpolated between the samples
+    either side.  Time steps with non-finite eigenvalues (e.g. a failed
+    Jacobian) are undetermined rather than stable, unless a finite
+    eigenvalue already shows them unstable.
+    """
+    max_listed = 50   # intervals listed in the reports
+
+    def __init__(self, t, eigs):
+        self.t = np.asarray(t, dtype=np.float64)
+        self.max_real = max_real_part(eigs)
+        self.n_steps = len(self.t)
+        self.n_eigs = eigs.shape[1]
+        self.t0, self.t1 = self.t[0], self.t[-1]
+
+        self.unstable = self.max_real > 0
+        self.n_unstable = int(np.count_nonzero(self.unstable))
+        self.undetermined = ~np.all(np.isfinite(eigs), axis=1) & ~self.unstable
+        self.n_undetermined = int(np.count_nonzero(self.undetermined))
+        self.stable = self.n_unstable == 0 and self.n_undetermined == 0
+
+        # +1 where an unstable run starts, -1 one past where it ends
+        edges = np.diff(self.unstable.astype(np.int8), prepend=0, append=0)
+        self.start_index = np.flatnonzero(edges == 1)
+        self.end_index = np.flatnonzero(edges == -1) - 1
+        self.starts = self.t[self.start_index]
+        self.ends = self.t[self.end_index]
+        self.durations = self.ends - self.starts
+        self.time_unstable = float(self.durations.sum())
+
+        # Zero crossings of max Re(λ) into and out of each period; NaN
+        # where the run starts or ends unstable
+        self.onset_times = self._crossings(self.start_index)
+        self.recovery_times = self._crossings(self.end_index + 1)
+        self.crossing_times = np.sort(np.concatenate([self.onset_times, self.recovery_times]))
+        self.crossing_times = self.crossing_times[np.isfinite(self.crossing_times)]
+
+        if self.n_unstable == 0:
+            self.worst_index = None
+            self.worst_time = self.worst_value = np.nan
+        else:
+            self.worst_index = int(np.argmax(np.where(self.unstable, self.max_real, -np.inf)))
+            self.worst_time = self.t[self.worst_index]
+            self.worst_value = self.max_real[self.worst_index]
+
+    def _crossings(self, k):
+        """Interpolated time max Re(λ) = 0 between samples k-1 and k."""
+        times = np.full(len(k), np.nan)
+        ok = (k > 0) & (k < self.n_steps)
+        k = k[ok]
+        a, b = self.max_real[k - 1], self.max_real[k]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frac = np.clip(np.nan_to_num(-a / (b - a), nan=1.0), 0.0, 1.0)
+        times[ok] = self.t[k - 1] + frac * (self.t[k] - self.t[k - 1])
+        return times
+
+    def intervals(self):
+        """`(start, end, duration, onset crossing)` of the periods to list."""
+        n = self.max_listed
+        return zip(self.starts[:n], self.ends[:n], self.durations[:n], self.onset_times[:n])
+
+    @property
+    def n_intervals(self):
+        return len(self.starts)
+
+    def snapshots(self):
+        """`(t, max Re(λ))` at the unstable steps, when there are few."""
+        if self.n_unstable > 10:
+            return []
+        return zip(self.t[self.unstable], self.max_real[self.unstable])
+
+
+def render_stability_md(model_name, summary):
     report_lines = [
         f"# Stability Analysis for Model: `{model_name}`",
         "",
-        f"**Simulation Time Range**: $t_0 = {t.iloc[0]:.3f}$ to $t_1 = {t.iloc[-1]:.3f}$",
-        f"**Number of time steps**: {len(t)}",
-        f"**Number of eigenvalues per timestep**: {eigvals.shape[1]}",
+        f"**Simulation Time Range**: $t_0 = {summary.t0:.3f}$ to $t_1 = {summary.t1:.3f}$",
+        f"**Number of time steps**: {summary.n_steps}",
+        f"**Number of eigenvalues per timestep**: {summary.n_eigs}",
         ""
     ]
     
-    if (max_real <= 0).all():
+    undetermined = (f"At **{summary.n_undetermined}** time steps the eigenvalues were not finite "
+                    "(e.g. a failed Jacobian), so stability there is undetermined.")
+    if summary.stable:
         report_lines += [
             "## ✅ The system remained stable throughout the entire simulation.",
             "All eigenvalues had negative real parts for the full duration."
         ]
+    elif summary.n_unstable == 0:
+        report_lines += [
+            "## ❔ Stability Undetermined",
+            "No instability was found where the eigenvalues are known.",
+            undetermined
+        ]
     else:
-        unstable_mask = max_real > 0
-        unstable_times = t[unstable_mask]
-        max_instability = max_real[unstable_mask]
-        worst_index = max_instability.idxmax()
-        worst_time = t.iloc[worst_index]
-        worst_value = max_real.iloc[worst_index]
-        
-        # Find contiguous unstable regions
-        unstable_intervals = []
-        start = None
-        for i in range(len(unstable_mask)):
-            if unstable_mask.iloc[i]:
-                if start is None:
-                    start = t.iloc[i]
-            elif start is not None:
-                end = t.iloc[i-1]
-                unstable_intervals.append((start, end))
-                start = None
-        if start is not None:
-            unstable_intervals.append((start, t.iloc[-1]))
-        
         report_lines += [
             "## ⚠️ Instability Detected",
-            f"The system became unstable at **{len(unstable_times)}** time steps.",
-            f"The worst instability occurred at $t = {worst_time:.3f}$ with $\\max\\ \\Re(\\lambda) = {worst_value:.3f}$.",
+            f"The system became unstable at **{summary.n_unstable}** time steps.",
+            f"The worst instability occurred at $t = {summary.worst_time:.3f}$ with $\\max\\ \\Re(\\lambda) = {summary.worst_value:.3f}$.",
+            f"Total time unstable: {summary.time_unstable:.3f} over {summary.n_intervals} periods, "
+            f"with {len(summary.crossing_times)} zero crossings of $\\max\\ \\Re(\\lambda)$.",
+        ]
+        if summary.n_undetermined:
+            report_lines.append(undetermined)
+        report_lines += [
             "",
             f"### Unstable Periods",
         ]
-        for i, (start, end) in enumerate(unstable_intervals, 1):
-            duration = end - start
-            report_lines.append(f"- Interval {i}: $t = {start:.3f}$ to $t = {end:.3f}$ (duration: {duration:.3f})")
+        for i, (start, end, duration, onset) in enumerate(summary.intervals(), 1):
+            onset = f", crossing at $t \\approx {onset:.3f}$" if np.isfinite(onset) else ""
+            report_lines.append(f"- Interval {i}: $t = {start:.3f}$ to $t = {end:.3f}$ (duration: {duration:.3f}{onset})")
+        if summary.n_intervals > summary.max_listed:
+            report_lines.append(f"- ... and {summary.n_intervals - summary.max_listed} more")
         
         # Optional small table for a few instability snapshots
-        if len(unstable_times) <= 10:
+        snapshots = list(summary.snapshots())
+        if snapshots:
             report_lines += [
                 "",
                 "### Sample Instability Snapshots",
@@ -192,84 +304,75 @@ def generate_stability_report_md(model_name, eig_df):
                 "| Time $t$ | $\\max \\Re(\\lambda)$ |",
                 "|----------|----------------------|"
             ]
-            for t_val, max_val in zip(unstable_times, max_instability):
+            for t_val, max_val in snapshots:
                 report_lines.append(f"| {t_val:.3f} | {max_val:.3f} |")
-    
-    report_path = os.path.join("models", f"{model_name}_report.md")
-    with open(report_path, "w") as f:
-        f.write("\n".join(report_lines))
-    return report_path
-
+    return "\n".join(report_lines)
 
 
-def generate_stability_report_html(model_name, eig_df):
-    t_raw = eig_df.iloc[:, 0]
-    eigvals = eig_df.iloc[:, 1:]
-    
-    t = t_raw.apply(safe_float)
-    max_real = eigvals.apply(lambda row: max(row.apply(lambda x: safe_complex(x).real)), axis=1)
-    
+def render_stability_html(model_name, summary):
     html_lines = []
     
     html_lines.append(f"<h2>Stability Analysis for Model: <code style='font-size: 150%'>{model_name}</code></h2>")
-    html_lines.append(f"<p><strong>Simulation Time Range:</strong> t₀ = {t.iloc[0]:.3f} to t₁ = {t.iloc[-1]:.3f}</p>")
-    html_lines.append(f"<p><strong>Number of time steps:</strong> {len(t)}</p>")
-    html_lines.append(f"<p><strong>Number of eigenvalues per timestep:</strong> {eigvals.shape[1]}</p>")
+    html_lines.append(f"<p><strong>Simulation Time Range:</strong> t₀ = {summary.t0:.3f} to t₁ = {summary.t1:.3f}</p>")
+    html_lines.append(f"<p><strong>Number of time steps:</strong> {summary.n_steps}</p>")
+    html_lines.append(f"<p><strong>Number of eigenvalues per timestep:</strong> {summary.n_eigs}</p>")
     
-    if (max_real <= 0).all():
+    undetermined = (f"<p>At <strong>{summary.n_undetermined}</strong> time steps the eigenvalues were not finite "
+                    "(e.g. a failed Jacobian), so stability there is undetermined.</p>")
+    if summary.stable:
         html_lines.append("<h3 style='color: green;'>✅ The system remained stable throughout the entire simulation.</h3>")
         html_lines.append("<p>All eigenvalues had negative real parts for the full duration.</p>")
+    elif summary.n_unstable == 0:
+        html_lines.append("<h3 style='color: gray;'>❔ Stability Undetermined</h3>")
+        html_lines.append("<p>No instability was found where the eigenvalues are known.</p>")
+        html_lines.append(undetermined)
     else:
-        unstable_mask = max_real > 0
-        unstable_times = t[unstable_mask]
-        max_instability = max_real[unstable_mask]
-        worst_index = max_instability.idxmax()
-        worst_time = t.iloc[worst_index]
-        worst_value = max_real.iloc[worst_index]
-        
-        # Find contiguous unstable regions
-        unstable_intervals = []
-        start = None
-        for i in range(len(unstable_mask)):
-            if unstable_mask.iloc[i]:
-                if start is None:
-                    start = t.iloc[i]
-            elif start is not None:
-                end = t.iloc[i-1]
-                unstable_intervals.append((start, end))
-                start = None
-        if start is not None:
-            unstable_intervals.append((start, t.iloc[-1]))
-        
         html_lines.append("<h3 style='color: orange;'>⚠️ Instability Detected</h3>")
-        html_lines.append(f"<p>The system became unstable at <strong>{len(unstable_times)}</strong> time steps.</p>")
-        html_lines.append(f"<p>The worst instability occurred at <strong>t = {worst_time:.3f}</strong> with <strong>max Re(λ) = {worst_value:.3f}</strong>.</p>")
+        html_lines.append(f"<p>The system became unstable at <strong>{summary.n_unstable}</strong> time steps.</p>")
+        html_lines.append(f"<p>The worst instability occurred at <strong>t = {summary.worst_time:.3f}</strong> with <strong>max Re(λ) = {summary.worst_value:.3f}</strong>.</p>")
+        html_lines.append(f"<p>Total time unstable: <strong>{summary.time_unstable:.3f}</strong> over {summary.n_intervals} periods, "
+                          f"with {len(summary.crossing_times)} zero crossings of max Re(λ).</p>")
+        if summary.n_undetermined:
+            html_lines.append(undetermined)
         
         html_lines.append("<h3>Unstable Periods</h3>")
         html_lines.append("<ul>")
-        for i, (start, end) in enumerate(unstable_intervals, 1):
-            duration = end - start
-            html_lines.append(f"<li>Interval {i}: t = {start:.3f} to t = {end:.3f} (duration: {duration:.3f})</li>")
+        for i, (start, end, duration, onset) in enumerate(summary.intervals(), 1):
+            onset = f", crossing at t ≈ {onset:.3f}" if np.isfinite(onset) else ""
+            html_lines.append(f"<li>Interval {i}: t = {start:.3f} to t = {end:.3f} (duration: {duration:.3f}{onset})</li>")
+        if summary.n_intervals > summary.max_listed:
+            html_lines.append(f"<li>... and {summary.n_intervals - summary.max_listed} more</li>")
         html_lines.append("</ul>")
         
-        if len(unstable_times) <= 10:
+        snapshots = list(summary.snapshots())
+        if snapshots:
             html_lines.append("<h4>Sample Instability Snapshots</h4>")
             html_lines.append("<table border='1' cellpadding='4' cellspacing='0'>")
             html_lines.append("<thead><tr><th>Time t</th><th>Max Re(λ)</th></tr></thead>")
             html_lines.append("<tbody>")
-            for t_val, max_val in zip(unstable_times, max_instability):
+            for t_val, max_val in snapshots:
                 html_lines.append(f"<tr><td>{t_val:.3f}</td><td>{max_val:.3f}</td></tr>")
             html_lines.append("</tbody></table>")
     
-    report_html = "\n".join(html_lines)
-    
+    return "\n".join(html_lines)
+
+
+def generate_stability_report_md(model_name, t, eigs, summary=None):
+    summary = summary or StabilitySummary(t, eigs)
+    report_path = os.path.join("models", f"{model_name}_report.md")
+    with open(report_path, "w") as f:
+        f.write(render_stability_md(model_name, summary))
+    return report_path
+
+
+def generate_stability_report_html(model_name, t, eigs, summary=None):
+    summary = summary or StabilitySummary(t, eigs)
     report_path = os.path.join("models", f"{model_name}_report.html")
     with open(report_path, "w") as f:
-        f.write(report_html)
-    
+        f.write(render_stability_html(model_name, summary))
     return report_path
 
 
 # Export functions for use in plots4models.py
-__all__ = ["load_eigenvalues", "generate_stability_figures", "generate_stability_report_html", ]
+__all__ = ["load_eigenvalues", "generate_stability_figures", "generate_stability_report_html", "StabilitySummary", ]
 
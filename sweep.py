@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+sweep
+=====
+
+Parallel parameter sweeps over a model's `[parameters]`, using the NumPy
+reference backend (see `numpy_solver.py`).
+
+A sweep spec sits next to the model TOML as `models/<model>_sweep.toml`:
+```toml
+[sweep]
+mode = "grid"        # or "lhs" (Latin hypercube)
+samples = 32         # lhs only
+seed = 0             # lhs only
+method = "RK4"       # optional, default from the model's [solver]
+
+[sweep.parameters]
+damping = [0.0, 0.1, 0.5]              # explicit values (lhs: drawn from these)
+g = { min = 1.0, max = 20.0, n = 4 }   # grid: linspace, lhs: range
+mass = 2.0                             # held fixed
+```
+Runs fan out over a process pool.  Each worker loads the model backend once
+and writes one binary result file (see `result_io.py`) per run under
+`models/<model>_sweep/`, named by a hash of the parameter vector.  `index.csv` there maps parameter vector ->
+result file -> summary metrics (final/min/max per variable, status, wall
+time) and is appended as runs finish, so an interrupted sweep resumes where
+it stopped, retrying runs that failed.  Load it with `load_index()` and query it with pandas.
+
+Example:
+```bash
+./generate_julia_odesolver.py pendulum
+python sweep.py pendulum --jobs 4
+```
+
+| Copyright: (c) 2025 Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import csv
+import hashlib
+import io
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import time
+import tomllib
+import numpy as np
+import pandas as pd
+
+from numpy_solver import MODELS_DIR, load_backend, solve_model, write_output
+from result_io import RESULT_SUFFIX
+
+INDEX_NAME = "index.csv"
+FINISHED = ("ok", "diverged")   # run statuses a resume does not repeat
+
+
+# -------- Sweep specification --------
+def load_sweep_spec(model_name, spec_path=None, models_dir=MODELS_DIR):
+    spec_path = Path(spec_path) if spec_path else Path(models_dir) / f"{model_name}_sweep.toml"
+    if not spec_path.exists():
+        raise FileNotFoundError(f"Sweep spec not found: {spec_path}")
+    with open(spec_path, "rb") as f:
+        spec = tomllib.load(f)
+    if "sweep" not in spec or "parameters" not in spec["sweep"]:
+        raise ValueError(f"{spec_path} needs a [sweep.parameters] table")
+    return spec["sweep"]
+
+
+def grid_values(name, value):
+    if isinstance(value, dict):
+        if "n" not in value:
+            raise ValueError(f"Grid parameter '{name}' needs min, max and n")
+        return list(np.linspace(value["min"], value["max"], int(value["n"])))
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def sweep_samples(spec, base_params):
+    """Expand a sweep spec into a list of full parameter dicts."""
+    mode = spec.get("mode", "grid")
+    swept = spec["parameters"]
+    unknown = set(swept) - set(base_params)
+    if unknown:
+        raise ValueError(f"Sweep parameters not in the model: {sorted(unknown)}")
+    if mode == "grid":
+        names = list(swept)
+        axes = [grid_values(name, swept[name]) for name in names]
+        return [{**base_params, **dict(zip(names, combo))}
+                for combo in itertools.product(*axes)]
+    if mode == "lhs":
+        n = int(spec["samples"])
+        rng = np.random.default_rng(spec.get("seed", 0))
+        samples = [dict(base_params) for _ in range(n)]
+        for name, value in swept.items():
+            if not isinstance(value, (dict, list)):
+                for sample in samples:
+                    sample[name] = value
+                continue
+            # One sample per stratum, strata shuffled independently per axis
+            u = (rng.permutation(n) + rng.random(n)) / n
+            if isinstance(value, list):
+                # Explicit values: each takes an equal share of the strata
+                if not value:
+                    raise ValueError(f"Sweep parameter '{name}' has no values")
+                xs = [value[int(x * len(value))] for x in u]
+            else:
+                xs = [float(x) for x in value["min"] + u * (value["max"] - value["min"])]
+            for sample, x in zip(samples, xs):
+                sample[name] = x
+        return samples
+    raise ValueError(f"Unknown sweep mode '{mode}' (use 'grid' or 'lhs')")
+
+
+def run_key(params):
+    """Stable id of a parameter vector, used for result file names."""
+    text = ",".join(f"{name}={float(params[name])!r}" for name in sorted(params))
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+# -------- Pool workers --------
+_backend = None
+_method = None
+
+
+def _init_worker(model_name, models_dir, method):
+    """One solver instance per worker process: the backend is loaded once."""
+    global _backend, _method
+    _backend = load_backend(model_name, models_dir)
+    _method = method
+
+
+def _run_one(key, params, out_path):
+    start = time.perf_counter()
+    summary = {"run_id": key, "file": os.path.basename(out_path), "pid": os.getpid()}
+    try:
+        t, y = solve_model(_backend, _method, params)
+        write_output(out_path, _backend.VARIABLE_NAMES, t, y)
+        finite = bool(np.all(np.isfinite(y)))
+        summary.update(status="ok" if finite else "diverged", n_rows=len(t))
+        for i, name in enumerate(_backend.VARIABLE_NAMES):
+            summary[f"{name}_final"] = y[-1, i] if len(y) else np.nan
+            summary[f"{name}_min"] = np.nanmin(y[:, i]) if finite else np.nan
+            summary[f"{name}_max"] = np.nanmax(y[:, i]) if finite else np.nan
+    except Exception as e:
+        summary.update(status=f"failed: {e}", n_rows=0)
+    summary["wall_s"] = time.perf_counter() - start
+    return summary
+
+
+# -------- Result index --------
+def load_index(out_dir):
+    """The sweep's result index as a DataFrame (empty if none yet)."""
+    path = Path(out_dir) / INDEX_NAME
+    if not path.exists():
+        return pd.DataFrame()
+    # A run interrupted mid-write can leave a partial last line: only
+    # newline-terminated records count
+    text = path.read_text()
+    text = text[:text.rfind("\n") + 1]
+    if not text:
+        return pd.DataFrame()
+    index = pd.read_csv(io.StringIO(text), on_bad_lines="skip", dtype={"run_id": str, "file": str})
+    # A retried run's latest record supersedes its failed one
+    return index.drop_duplicates("run_id", keep="last", ignore_index=True)
+
+
+def _drop_partial_record(path):
+    """Truncate a partial last record left by an interrupted write."""
+    if not path.exists():
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def _index_writer(path, fieldnames):
+    _drop_partial_record(path)
+    new = not path.exists() or path.stat().st_size == 0
+    f = open(path, "a", newline="")
+    writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+    if new:
+        writer.writeheader()
+        f.flush()
+    return f, writer
+
+
+def run_sweep(model_name, spec_path=None, jobs=None, out_dir=None, models_dir=MODELS_DIR):
+    """Run (or resume) a sweep. Returns the throughput report as a dict."""
+    spec = load_sweep_spec(model_name, spec_path, models_dir)
+    backend = load_backend(model_name, models_dir)
+    param_names = list(backend.PARAMETERS)
+    samples = sweep_samples(spec, dict(backend.PARAMETERS))
+    out_dir = Path(out_dir) if out_dir else Path(models_dir) / f"{model_name}_sweep"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Resume: skip runs already in the index with a result; failed ones
+    # are retried.  A diverged run is a result, and would diverge again
+    _drop_partial_record(out_dir / INDEX_NAME)
+    index = load_index(out_dir)
+    done = set(index["run_id"][index["status"].isin(FINISHED)]) if len(index) else set()
+    todo = {}
+    for params in samples:
+        key = run_key(params)
+        if key not in done:
+            todo[key] = params
+
+    fieldnames = (param_names + ["run_id", "file", "status", "n_rows", "wall_s", "pid"]
+                  + [f"{name}_{m}" for name in backend.VARIABLE_NAMES for m in ("final", "min", "max")])
+    walls = []
+    start = time.perf_counter()
+    f, writer = _index_writer(out_dir / INDEX_NAME, fieldnames)
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(model_name, str(models_dir), spec.get("method"))) as pool:
+            futures = {pool.submit(_run_one, key, params, str(out_dir / f"run_{key}{RESULT_SUFFIX}")): key
+                       for key, params in todo.items()}
+            for future in as_completed(futures):
+                summary = future.result()
+                summary.update(todo[futures[future]])
+                writer.writerow(summary)
+                f.flush()  # each finished run is durable for resuming
+                walls.append(summary["wall_s"])
+    finally:
+        f.close()
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "runs": len(samples),
+        "completed": len(walls),
+        "skipped": len(samples) - len(todo),
+        "elapsed_s": elapsed,
+        "runs_per_s": len(walls) / elapsed if elapsed > 0 and walls else 0.0,
+        "run_wall_mean_s": float(np.mean(walls)) if walls else 0.0,
+        "run_wall_max_s": float(np.max(walls)) if walls else 0.0,
+        "out_dir": str(out_dir),
+    }
+    return report
+
+
+def print_report(report):
+    print(f"Sweep: {report['completed']} runs completed, {report['skipped']} resumed "
+          f"from the index, {report['runs']} total")
+    print(f"Wall clock {report['elapsed_s']:.2f}s, {report['runs_per_s']:.1f} runs/s; "
+          f"per run mean {report['run_wall_mean_s']:.3f}s, max {report['run_wall_max_s']:.3f}s")
+    print(f"Index: {Path(report['out_dir']) / INDEX_NAME}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a parameter sweep with the NumPy backend.")
+    parser.add_argument("model_name", help="Model in ./models, e.g. pendulum")
+    parser.add_argument("--spec", default=None, help="Sweep spec (default: models/<model>_sweep.toml)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: all CPUs)")
+    parser.add_argument("--out", default=None, help="Output directory (default: models/<model>_sweep/)")
+    args = parser.parse_args()
+    print_report(run_sweep(args.model_name, args.spec, args.jobs, args.out))
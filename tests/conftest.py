@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+'''
+Make the top-level project modules importable from the tests, which are
+run from the project root like the Julia model tests.
+'''
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the content-hash build cache (build_cache.py) and the
+generator's use of it.
+These run without Julia.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import json
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+from pathlib import Path
+
+from build_cache import BuildCache, write_if_changed
+
+project_root = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("in.txt").write_text("a")
+    return BuildCache(tmp_path / "manifest.json")
+
+
+def make_output(text="out"):
+    def action():
+        write_if_changed("out.txt", text + Path("in.txt").read_text())
+    return action
+
+
+class TestBuildCache:
+    """Test suite for target freshness and the manifest."""
+
+    def test_rebuilds_only_on_change(self, cache):
+        args = ("out.txt", ["in.txt"], ["out.txt"])
+        assert cache.build(*args, make_output())
+        assert not cache.build(*args, make_output())
+        assert cache.build(*args, make_output(), force=True)
+        Path("in.txt").write_text("b")
+        assert cache.build(*args, make_output())
+        assert Path("out.txt").read_text() == "outb"
+        assert cache.build(*args, make_output(), params={"dotted": True})
+        assert not cache.build(*args, make_output(), params={"dotted": True})
+
+    def test_outputs_checked(self, cache):
+        args = ("out.txt", ["in.txt"], ["out.txt"])
+        cache.build(*args, make_output())
+        Path("out.txt").write_text("edited")
+        assert cache.build(*args, make_output())
+        os.remove("out.txt")
+        assert cache.build(*args, make_output())
+
+    def test_manifest(self, cache):
+        cache.build("out.txt", ["in.txt"], ["out.txt"], make_output())
+        manifest = json.loads(cache.manifest_path.read_text())
+        entry = manifest["targets"]["out.txt"]
+        assert set(entry) == {"inputs", "params", "outputs", "built", "seconds"}
+        assert entry["inputs"]["in.txt"] == manifest["files"]["in.txt"]["sha256"]
+        # Another instance sees the target as built
+        assert BuildCache(cache.manifest_path).is_fresh("out.txt", ["in.txt"], ["out.txt"])
+
+    def test_unchanged_file_not_rewritten(self, tmp_path):
+        path = tmp_path / "model.jl"
+        assert write_if_changed(path, "x = 1\n")
+        os.utime(path, ns=(0, 0))
+        assert not write_if_changed(path, "x = 1\n")
+        assert path.stat().st_mtime_ns == 0
+        assert write_if_changed(path, "x = 2\n")
+
+
+class TestGenerator:
+    """Test suite for cached code generation."""
+
+    def test_generate_once(self, tmp_path):
+        shutil.copytree(project_root / "templates", tmp_path / "templates")
+        (tmp_path / "models").mkdir()
+        shutil.copy(project_root / "models" / "pendulum.toml", tmp_path / "models")
+
+        def generate(*extra):
+            return subprocess.run(
+                [sys.executable, str(project_root / "generate_julia_odesolver.py"), "pendulum", *extra],
+                cwd=tmp_path, capture_output=True, text=True, check=True).stdout
+
+        out = generate()
+        assert "Up to date" not in out
+        gui = tmp_path / "models" / "pendulum_gui.jl"
+        mtime = gui.stat().st_mtime_ns
+        assert generate().count("Up to date") == 3
+        assert "Julia code unchanged" in generate("--force")
+        assert gui.stat().st_mtime_ns == mtime
+
+        # Only the solvers built from the changed template are regenerated
+        template = tmp_path / "templates" / "ode_numpy_solver.py.template"
+        template.write_text(template.read_text() + "\n# changed\n")
+        out = generate()
+        assert out.count("Up to date") == 2
+        assert "Wrote NumPy code" in out
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the post-hoc Jacobian eigenanalysis in eigen_analysis.py.
+These run without Julia.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import shutil
+import pytest
+import numpy as np
+from pathlib import Path
+
+from generate_julia_odesolver import generate_numpy_code
+from eigen_analysis import analyze_result, batched_jacobian, trajectory_eigenvalues
+from numpy_solver import load_backend, model_params
+from result_io import write_result
+from stability import load_eigenvalues
+
+project_root = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(project_root)
+    template = (project_root / "templates" / "ode_numpy_solver.py.template").read_text()
+    for model_name in ("pendulum", "lorenz_attractor"):
+        generate_numpy_code(model_name, template)
+        shutil.copy(project_root / "models" / f"{model_name}_numpy.py", tmp_path)
+    return tmp_path
+
+
+def pendulum_jacobian(u, p):
+    J = np.zeros((len(u), 2, 2))
+    J[:, 0, 1] = 1.0
+    J[:, 1, 0] = -(p.g / p.length) * np.cos(u[:, 0])
+    J[:, 1, 1] = -p.damping
+    return J
+
+
+def lorenz_jacobian(u, p):
+    x, y, z = u.T
+    J = np.zeros((len(u), 3, 3))
+    J[:, 0, :2] = [-p.sigma, p.sigma]
+    J[:, 1, 0], J[:, 1, 1], J[:, 1, 2] = p.rho - z, -1.0, -x
+    J[:, 2, 0], J[:, 2, 1], J[:, 2, 2] = y, x, -p.beta
+    return J
+
+
+class TestJacobian:
+    """Test suite for batched Jacobians of the generated rhs."""
+
+    @pytest.mark.parametrize("method,tol", [("central", 1e-8), ("complex", 1e-13)])
+    def test_pendulum(self, models_dir, method, tol):
+        backend = load_backend("pendulum", models_dir)
+        p = model_params(backend)
+        u = np.random.default_rng(0).uniform(-3, 3, size=(50, 2))
+        J = batched_jacobian(backend.rhs, np.zeros(50), u, p, method)
+        assert J.shape == (50, 2, 2)
+        np.testing.assert_allclose(J, pendulum_jacobian(u, p), atol=tol)
+
+    @pytest.mark.parametrize("method", ["central", "complex"])
+    def test_lorenz(self, models_dir, method):
+        backend = load_backend("lorenz_attractor", models_dir)
+        p = model_params(backend)
+        u = np.random.default_rng(1).normal(scale=10.0, size=(20, 3))
+        J = batched_jacobian(backend.rhs, np.zeros(20), u, p, method)
+        np.testing.assert_allclose(J, lorenz_jacobian(u, p), atol=1e-6)
+
+    def test_batches_agree(self, models_dir, monkeypatch):
+        backend = load_backend("lorenz_attractor", models_dir)
+        p = model_params(backend)
+        u = np.random.default_rng(2).normal(scale=10.0, size=(100, 3))
+        whole = trajectory_eigenvalues(backend.rhs, np.zeros(100), u, p)
+        monkeypatch.setattr("eigen_analysis.MAX_BATCH_ELEMENTS", 9 * 7)
+        batched = trajectory_eigenvalues(backend.rhs, np.zeros(100), u, p)
+        np.testing.assert_array_equal(batched, whole)
+
+
+class TestAnalyzeResult:
+    """Test suite for eigenanalysis of a stored trajectory."""
+
+    def test_writes_eigen_result(self, models_dir):
+        backend = load_backend("pendulum", models_dir)
+        t = np.linspace(0.01, 5.0, 500)
+        u = np.column_stack([np.cos(t), -np.sin(t)])
+        write_result(models_dir / "pendulum.pkr", ["t", "theta", "omega"], np.column_stack([t, u]))
+        path, t_eig, eigs = analyze_result("pendulum", stride=10, models_dir=models_dir)
+        assert path == models_dir / "pendulum_eigen.pkr"
+        np.testing.assert_array_equal(t_eig, t[::10])
+        expected = np.linalg.eigvals(pendulum_jacobian(u[::10], model_params(backend)))
+        np.testing.assert_allclose(np.sort_complex(eigs), np.sort_complex(expected), atol=1e-7)
+        # Damped pendulum: Re(λ) = -damping / 2 while g cos(theta) > damping^2 / 4
+        t_loaded, eigs_loaded = load_eigenvalues("pendulum", models_dir)
+        np.testing.assert_array_equal(t_loaded, t_eig)
+        np.testing.assert_allclose(eigs_loaded.real, -0.05, atol=1e-7)
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
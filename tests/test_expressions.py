@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the shared model expression parser and its Julia, NumPy and
+LaTeX emitters (expressions.py), and the tools built on it.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import time
+from pathlib import Path
+import pytest
+import numpy as np
+import toml
+
+from expressions import (
+    CircularDependencyError, ExpressionError, JacobianTooLarge, dependency_graph, derivative,
+    jacobian, parse, sort_equations, strongly_connected_components, to_julia, to_numpy, tokenize
+)
+from generate_julia_odesolver import (
+    generate_julia_code, generate_numpy_code, get_dependencies, load_model_context,
+    substitute_expressions
+)
+from numpy_solver import load_backend, model_params
+from odemodel2tex import substitute_symbols
+from plot_utils import convert_julia_to_python
+
+project_root = Path(__file__).resolve().parent.parent
+templates = project_root / "templates"
+
+
+def evaluate(expr, **values):
+    return eval(parse(expr).to_numpy(), {"np": np}, values)
+
+
+class TestParser:
+    """Test suite for tokenizing and parsing model expressions."""
+
+    def test_tokens(self):
+        kinds = [(k, v) for k, v, _ in tokenize("2.5e-3*x .^ y")]
+        assert kinds == [("number", "2.5e-3"), ("op", "*"), ("name", "x"),
+                         ("op", ".^"), ("name", "y"), ("end", "")]
+
+    @pytest.mark.parametrize("expr, expected", [
+        ("-x^2", -9.0),             # ^ binds tighter than unary minus
+        ("2^3^2", 512.0),           # and is right associative
+        ("8 / 2 / 2", 2.0),
+        ("1 - 2 - 3", -4.0),
+        ("1/2x", 1 / 6),            # numeric coefficients bind tighter than /
+        ("2(x + 1)", 8.0),
+        ("2^-1", 0.5),
+        ("x .* x ./ 3", 3.0),
+    ])
+    def test_precedence_follows_julia(self, expr, expected):
+        assert evaluate(expr, x=3.0) == pytest.approx(expected)
+
+    def test_symbols_and_functions(self):
+        e = parse("-damping * omega - (g / length) * sin(theta)")
+        assert e.symbols == {"damping", "omega", "g", "length", "theta"}
+        assert e.functions == {"sin"}
+
+    def test_parsed_once(self):
+        assert parse("a * (b + c)") is parse("a * (b + c)")
+
+    @pytest.mark.parametrize("expr", ["", "a +", "(a", "a $ b", "max(a,", "a b"])
+    def test_errors_name_the_expression(self, expr):
+        with pytest.raises(ExpressionError, match="position"):
+            parse(expr)
+
+    def test_dependency_graph(self):
+        eqs = {"f_x": "a * f_y", "f_y": "y", "f_z": "f_x + f_y + f_z"}
+        assert dependency_graph(eqs) == {"f_x": {"f_y"}, "f_y": set(), "f_z": {"f_x", "f_y", "f_z"}}
+        assert get_dependencies("f_xy + f_x", ["f_x", "f_xy", "f_y"]) == ["f_x", "f_xy"]
+
+
+class TestEmitters:
+    """Test suite for the Julia, NumPy and LaTeX emitters."""
+
+    @pytest.mark.parametrize("expr", [
+        "-damping * omega - (g / length) * sin(theta)",
+        "x * (rho - z) - y",
+        "a - (b - c)",
+        "(-x)^2 + a^b^c",
+        "-(a * b) + +(c)",
+        "ifelse(x > 0, x, 0.0)",
+    ])
+    def test_julia_round_trip(self, expr):
+        assert parse(expr).to_julia() == expr
+
+    def test_derivative_names(self):
+        assert substitute_expressions("dP / P + dPx", ["P"]) == "dP_dt / P + dPx"
+
+    def test_numpy(self):
+        assert parse("x^2 + max(y, 0) * pi").to_numpy() == "x**2 + np.maximum(y, 0) * np.pi"
+        assert parse("lambda * a").to_numpy({"a": "(-0.5)"}) == "lambda_ * (-0.5)"
+
+    def test_parameters_substituted_safely(self):
+        py_expr = convert_julia_to_python("a^2 + lambda", {"a": -0.5})
+        assert py_expr == "(-0.5)**2 + lambda_"
+        assert eval(py_expr, {}, {"lambda_": 1.0}) == 1.25
+
+    def test_long_sums(self):
+        """Godley flow sums can have thousands of terms."""
+        expr = " + ".join(f"-(k{i} * x{i})" for i in range(5000))
+        e = parse(expr)
+        assert e.to_julia() == expr
+        assert len(e.symbols) == 10000
+        assert e.to_latex().count(r"\cdot") == 5000
+
+    def test_latex(self):
+        symbols = {"P_init": "P_0"}
+        assert parse("(g / length) * sin(theta)").to_latex() == \
+            r"\frac{g}{length} \cdot \sin\left(\theta\right)"
+        assert parse("2x^2 + P_init * sqrt(abs(y))").to_latex(symbols) == \
+            r"2 x^{2} + P_0 \cdot \sqrt{\left|y\right|}"
+        assert parse("f_lambda / lambda + dP * 1.0e-3").to_latex(dotted=True, variables=["P"]) == \
+            r"\frac{\dot{\lambda}}{\lambda} + \dot{P} \cdot 10^{-3}"
+
+    def test_odemodel2tex(self):
+        assert substitute_symbols("u * (Phi + f_P / P - alpha)") == \
+            r"u \cdot \left(\Phi + \frac{\frac{dP}{dt}}{P} - \alpha\right)"
+
+
+
+class TestDerivative:
+    """Test suite for symbolic differentiation and the chain-rule Jacobian."""
+
+    @pytest.mark.parametrize("expr", [
+        "-damping * omega - (g / length) * sin(theta)",
+        "x^3 - 2x^-1 + sqrt(x) / (1 + x^2)",
+        "exp(-k * x) * log(x) + tanh(x)^2",
+        "x^y + atan(x * y) - cos(x) / y",
+        "max(x, 0.5) + min(y, x) + abs(x - y)",
+        "ifelse(x > 1, x^2, -x) * (x >= y)",
+    ])
+    def test_matches_finite_differences(self, expr):
+        values = {"x": 1.3, "y": 0.7, "k": 0.4, "theta": 0.3, "omega": -0.2,
+                  "damping": 0.1, "g": 9.81, "length": 1.0}
+        tree = parse(expr).tree
+        for symbol in parse(expr).symbols:
+            d = derivative(tree, symbol)
+            exact = 0.0 if d is None else eval(to_numpy(d), {"np": np}, values)
+            h = 1e-6
+            plus = evaluate(expr, **{**values, symbol: values[symbol] + h})
+            minus = evaluate(expr, **{**values, symbol: values[symbol] - h})
+            assert exact == pytest.approx((plus - minus) / (2 * h), rel=1e-6, abs=1e-8), symbol
+
+    def test_simplified(self):
+        assert to_julia(derivative(parse("3x^2 + k * y").tree, "x")) == "3 * (2 * x)"
+        assert derivative(parse("k * y").tree, "x") is None
+        assert to_julia(derivative(parse("x^-1").tree, "x")) == "-x^(-2)"
+
+    def test_chain_rule(self):
+        eqs = {"b": "x^2", "a": "2b + y", "f_x": "a * y", "f_y": "ifelse(x > 0, 1.0, 2.0)"}
+        partials, rows = jacobian(eqs, ["b", "a", "f_x", "f_y"], ["x", "y"])
+        assert set(rows["f_x"]) == {"x", "y"}
+        # f_y depends on x only through a comparison: a stored zero
+        assert to_julia(rows["f_y"]["x"]) == "0.0"
+        values = {"x": 1.5, "y": 0.5, "b": 1.5**2, "a": 2 * 1.5**2 + 0.5}
+        for name, tree in partials:
+            values[name] = eval(to_numpy(tree), {"np": np}, values)
+        assert eval(to_numpy(rows["f_x"]["x"]), {"np": np}, values) == pytest.approx(4 * 1.5 * 0.5)
+        assert eval(to_numpy(rows["f_x"]["y"]), {"np": np}, values) == pytest.approx(2 * 1.5**2 + 1.0)
+
+    def test_aliases_and_limits(self):
+        eqs = {"f_x": "-x", "f_y": "dx * y"}
+        _, rows = jacobian(eqs, ["f_x", "f_y"], ["x", "y"], aliases={"dx": "f_x"})
+        assert set(rows["f_y"]) == {"x", "y"}
+        with pytest.raises(JacobianTooLarge):
+            jacobian(eqs, ["f_x", "f_y"], ["x", "y"], aliases={"dx": "f_x"}, max_entries=2)
+        with pytest.raises(ExpressionError, match="floor"):
+            jacobian({"f_x": "floor(x)"}, ["f_x"], ["x"])
+
+
+def write_model(tmp_path, monkeypatch, name, equations, godley=None, variables=("x", "y")):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "models").mkdir(exist_ok=True)
+    config = {
+        "model_name": name,
+        "parameters": {"k": 0.5},
+        "variables": {"names": list(variables)},
+        "initial_conditions": {v: 1.0 for v in variables},
+        "equations": equations,
+        "godley": godley or {},
+        "tspan": {"t0": 0.0, "t1": 1.0},
+        "solver": {"dt": 0.1},
+    }
+    with open(tmp_path / "models" / f"{name}.toml", "w") as f:
+        toml.dump(config, f)
+
+
+def synthetic_model(n):
+    """n equations: a shuffled chain of auxiliary equations feeding
+    ODE terms, plus Godley flows."""
+    rng = np.random.default_rng(0)
+    m = n // 2
+    variables = [f"x{i}" for i in range(m)]
+    aux = {f"a{i}": f"0.5 * a{i + 1} + x{i}" for i in range(m - 1)}
+    aux[f"a{m - 1}"] = f"x{m - 1}"
+    aux = {name: aux[name] for name in rng.permutation(list(aux))}
+    ode = {f"f_x{i}": f"-k * x{i} + a{i} / (1 + x{(i + 1) % m}^2)" for i in range(m - m // 5)}
+    godley = {f"flow{i}": [f"x{i}", f"x{i + 1}", f"k * x{i}", "flow"] for i in range(m - m // 5, m - 1)}
+    return {"auxiliary": aux, "ode": ode}, godley, variables
+
+
+class TestEquationOrder:
+    """Test suite for dependency sorting of auxiliary, ODE and Godley equations."""
+
+    def test_sort(self):
+        eqs = {"f_x": "a * f_y", "a": "b + y", "f_y": "b", "b": "2y"}
+        order = sort_equations(eqs)
+        assert sorted(order) == sorted(eqs)
+        for name, deps in dependency_graph(eqs).items():
+            assert all(order.index(d) < order.index(name) for d in deps)
+        # Independent equations keep their given order
+        assert sort_equations({"c": "1", "a": "2", "b": "3"}) == ["c", "a", "b"]
+
+    def test_cycles_are_named(self):
+        eqs = {"ok": "x", "a": "b + ok", "b": "c", "c": "a", "d": "a", "s": "s + 1"}
+        with pytest.raises(CircularDependencyError, match="a -> b -> c -> a; s -> s") as info:
+            sort_equations(eqs)
+        assert info.value.components == [["a", "b", "c"], ["s"]]
+        assert isinstance(info.value, ValueError)
+
+    def test_components(self):
+        graph = {"a": {"b"}, "b": {"a", "c"}, "c": set(), "d": {"d"}, "e": {"a"}}
+        assert strongly_connected_components(graph) == [["a", "b"], ["d"]]
+
+    def test_auxiliary_after_derivatives(self, tmp_path, monkeypatch):
+        """An auxiliary growth rate may use f_x; dae! needs it after f_x."""
+        equations = {"auxiliary": {"growth": "f_x / x", "drag": "k * y"},
+                     "ode": {"f_x": "-drag * x", "f_y": "growth * y"}}
+        write_model(tmp_path, monkeypatch, "aux", equations)
+        context = load_model_context("aux")
+        names = [name for name, _ in context["equations"]]
+        assert names.index("drag") < names.index("f_x") < names.index("growth") < names.index("f_y")
+
+        generate_numpy_code("aux", (templates / "ode_numpy_solver.py.template").read_text())
+        backend = load_backend("aux", tmp_path / "models")
+        du = backend.rhs(0.0, np.array([2.0, 3.0]), model_params(backend))
+        np.testing.assert_allclose(du, [-1.5 * 2.0, -1.5 * 3.0])
+
+    def test_numpy_derivative_references(self, tmp_path, monkeypatch):
+        """dx in an expression is f_x in the NumPy backend, so it sorts like f_x."""
+        write_model(tmp_path, monkeypatch, "dref", {"ode": {"f_y": "dx * 2", "f_x": "-x"}})
+        generate_numpy_code("dref", (templates / "ode_numpy_solver.py.template").read_text())
+        backend = load_backend("dref", tmp_path / "models")
+        np.testing.assert_allclose(backend.rhs(0.0, np.array([1.0, 0.0]), model_params(backend)), [-1.0, -2.0])
+
+    def test_cycle_reported_by_generator(self, tmp_path, monkeypatch):
+        write_model(tmp_path, monkeypatch, "loop", {"auxiliary": {"a": "f_x + 1"}, "ode": {"f_x": "a", "f_y": "x"}})
+        with pytest.raises(CircularDependencyError, match="a -> f_x -> a"):
+            load_model_context("loop")
+
+    def test_large_model_generation(self, tmp_path, monkeypatch):
+        gui, cmdl, numpy_template = (
+            (templates / name).read_text() for name in
+            ("ode_dae_solver_gui.jl.template", "ode_dae_solver_cmdl.jl.template", "ode_numpy_solver.py.template"))
+
+        def generate(n_equations):
+            equations, godley, variables = synthetic_model(n_equations)
+            write_model(tmp_path, monkeypatch, "big", equations, godley, variables)
+            start = time.perf_counter()
+            context = load_model_context("big")
+            generate_julia_code("big", gui, gui_version=True, context=context)
+            generate_julia_code("big", cmdl, gui_version=False, context=context)
+            generate_numpy_code("big", numpy_template, context=context)
+            return context, variables, time.perf_counter() - start
+
+        # Scaling, not wall clock: 10x the equations may cost ~10x the time
+        # (3x slack for noise), far below the ~100x of a quadratic pass.
+        # Both sizes skip the analytic Jacobian, else only the small one
+        # would build it.
+        monkeypatch.setattr("generate_julia_odesolver.MAX_JACOBIAN_ENTRIES", 1000)
+        small = min(generate(500)[2] for _ in range(2))
+        context, variables, elapsed = generate(5000)
+        assert len(context["equations"]) == 5000
+        assert elapsed < 3 * 10 * small, \
+            f"5000 equations took {elapsed:.2f}s, 500 took {small:.2f}s"
+
+        backend = load_backend("big", tmp_path / "models")
+        du = backend.rhs(0.0, np.ones(len(variables)), model_params(backend))
+        assert np.all(np.isfinite(du))
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the Julia solver source rendered by
+generate_julia_odesolver.py: the explicit ODE and the DAE forms.
+These check the generated code and run without Julia.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import math
+import re
+import shutil
+import pytest
+import numpy as np
+import toml
+from pathlib import Path
+
+from eigen_analysis import batched_jacobian
+from generate_julia_odesolver import generate_julia_code, generate_numpy_code, load_model_context
+from numpy_solver import load_backend, model_params, output_times, solve_model
+
+project_root = Path(__file__).resolve().parent.parent
+templates = project_root / "templates"
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    (tmp_path / "models").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "models"
+
+
+def write_model(models, name, ode, solver=None, auxiliary=None, variables=("x", "y")):
+    config = {
+        "model_name": name,
+        "parameters": {"k": 0.5},
+        "variables": {"names": list(variables)},
+        "initial_conditions": {v: 1.0 for v in variables},
+        "equations": {"ode": ode, "auxiliary": auxiliary or {}},
+        "tspan": {"t0": 0.0, "t1": 1.0},
+        "solver": {"dt": 0.1, **(solver or {})},
+    }
+    with open(models / f"{name}.toml", "w") as f:
+        toml.dump(config, f)
+
+
+def render(name, gui_version=False):
+    template = "ode_dae_solver_gui.jl.template" if gui_version else "ode_dae_solver_cmdl.jl.template"
+    generate_julia_code(name, (templates / template).read_text(), gui_version=gui_version)
+    suffix = "_gui" if gui_version else "_cmdl"
+    return (Path("models") / f"{name}{suffix}.jl").read_text()
+
+
+def julia_output_times(code):
+    """The rendered Julia `output_times`, transliterated line by line to Python."""
+    body = re.search(r"^function output_times\(.*?^end$", code, re.S | re.M).group(0)
+    lines = []
+    for line in body.splitlines()[:-1]:
+        if line.strip() == "end":
+            continue
+        line = (line.replace("function output_times(t0, t1, h, max_rows)", "def f(t0, t1, h, max_rows):")
+                .replace("ceil(Int, ", "math.ceil(").replace(" && ", " and ")
+                .replace("for k in 1:n]", "for k in range(1, n + 1)]").replace("[end]", "[-1]"))
+        lines.append(line + ":" if line.lstrip().startswith("if ") else line)
+    namespace = {"math": math}
+    exec("\n".join(lines), namespace)
+    return namespace["f"]
+
+
+def solve_call(code):
+    call = re.search(r"sol = solve\((?:[^()]|\([^()]*\))*\)", code).group(0)
+    return " ".join(call.split())
+
+
+class TestSolverForm:
+    """Test suite for choosing between ode! and dae!."""
+
+    @pytest.mark.parametrize("gui_version", [False, True])
+    def test_pendulum_is_explicit(self, models, gui_version):
+        shutil.copy(project_root / "models" / "pendulum.toml", models)
+        code = render("pendulum", gui_version)
+        assert "function ode!(du, u, p, t)" in code
+        assert "du[2] = f_omega" in code
+        assert "dae!" not in code and "Sundials" not in code
+        assert "prob = ODEProblem(ODEFunction(ode!; jac=jac!, jac_prototype=jac_prototype), u0, tspan" in code
+        assert "Tsit5(), dt=dt, adaptive=true" in solve_call(code)
+
+    def test_method_honoured(self, models):
+        write_model(models, "rk", {"f_x": "y", "f_y": "-k * x"}, {"method": "RK4"})
+        assert "RK4(), dt=dt, adaptive=false" in solve_call(render("rk"))
+        write_model(models, "dp", {"f_x": "y", "f_y": "-k * x"}, {"method": "Vern7"})
+        assert "Vern7(), dt=dt, adaptive=true" in solve_call(render("dp"))
+
+    def test_derivative_references(self, models):
+        """dx is f_x in ode!, so f_y is evaluated after it."""
+        write_model(models, "dref", {"f_y": "dx * 2", "f_x": "-x"})
+        code = render("dref")
+        assert "function ode!" in code
+        assert code.index("f_x = -x") < code.index("f_y = f_x * 2")
+
+    def test_dae_method_keeps_dae(self, models):
+        write_model(models, "ida", {"f_x": "y", "f_y": "-k * x"}, {"method": "IDA"})
+        code = render("ida", gui_version=True)
+        assert "function dae!(out, du, u, p, t)" in code
+        assert "using Sundials" in code
+        assert "prob = DAEProblem(DAEFunction(dae!; jac=dae_jac!), du0, u0, tspan, params" in code
+        assert "IDA(), dt=dt, callback=cb" in solve_call(code)
+
+    def test_implicit_model_is_dae(self, models, capsys):
+        """Derivatives defined through each other are an algebraic loop."""
+        write_model(models, "loop", {"f_x": "dy + x", "f_y": "0.5 * dx"})
+        context = load_model_context("loop")
+        assert not context["explicit_ode"]
+        assert "Implicit equations" in capsys.readouterr().out
+        code = render("loop")
+        assert "function ode!" not in code
+        assert "out[1] = dx_dt - f_x" in code
+        assert "IDA(), dt=dt, callback=cb" in solve_call(code)
+
+
+class TestOutputGrid:
+    """Test suite for adaptive steps with a separate output grid."""
+
+    @pytest.mark.parametrize("gui_version", [False, True])
+    def test_solver_settings(self, models, gui_version):
+        write_model(models, "grid", {"f_x": "y", "f_y": "-k * x"},
+                    {"abstol": 1e-10, "reltol": 1e-7, "output_dt": 0.25, "max_rows": 100})
+        code = render("grid", gui_version)
+        for line in ["const output_dt = 0.25", "const max_rows = 100",
+                     "const abstol = 1e-10", "const reltol = 1e-07"]:
+            assert line in code
+        assert "abstol=abstol, reltol=reltol, save_everystep=false" in code
+        # Output is written only on steps that pass an output time
+        assert "DiscreteCallback(output_due, output_callback" in code
+        assert "y = integrator(t)" in code
+
+    @pytest.mark.parametrize("solver", [{}, {"output_dt": 0.3}, {"output_dt": 0.07, "max_rows": 9},
+                                        {"dt": 0.05, "output_dt": 0.02, "method": "RK4"}])
+    def test_numpy_rows_match_julia(self, models, solver):
+        """Both backends write rows at the same times for one TOML."""
+        write_model(models, "grid", {"f_x": "y", "f_y": "-k * x"}, solver)
+        julia_times = julia_output_times(render("grid"))
+        generate_numpy_code("grid", (templates / "ode_numpy_solver.py.template").read_text())
+        backend = load_backend("grid", "models")
+        context = load_model_context("grid")
+        expected = julia_times(0.0, 1.0, context["output_dt"], context["max_rows"])
+        t, y = solve_model(backend)
+        np.testing.assert_array_equal(t, expected)
+        np.testing.assert_array_equal(output_times(0.0, 1.0, context["output_dt"], context["max_rows"]), expected)
+        # x'' = -k x with x(0) = y(0) = 1
+        w = np.sqrt(0.5)
+        np.testing.assert_allclose(y[:, 0], np.cos(w * t) + np.sin(w * t) / w, rtol=1e-5)
+
+    def test_defaults(self, models):
+        shutil.copy(project_root / "models" / "pendulum.toml", models)
+        context = load_model_context("pendulum")
+        assert context["output_dt"] == context["dt"]
+        assert context["max_rows"] == 0
+        assert (context["abstol"], context["reltol"]) == (1e-8, 1e-6)
+        generate_numpy_code("pendulum", (templates / "ode_numpy_solver.py.template").read_text())
+        backend = load_backend("pendulum", "models")
+        assert (backend.OUTPUT_DT, backend.MAX_ROWS, backend.ABSTOL, backend.RELTOL) == (0.01, 0, 1e-8, 1e-6)
+
+    def test_dae_is_adaptive(self, models):
+        write_model(models, "ida", {"f_x": "y", "f_y": "-k * x"}, {"method": "IDA"})
+        assert "adaptive" not in solve_call(render("ida"))
+
+    @pytest.mark.parametrize("solver", [{"output_dt": 0.0}, {"max_rows": -1}, {"max_rows": 2.5}])
+    def test_invalid(self, models, solver):
+        write_model(models, "bad", {"f_x": "y", "f_y": "-k * x"}, solver)
+        with pytest.raises(ValueError, match=r"\[solver\]"):
+            load_model_context("bad")
+
+
+class TestSharedBlock:
+    """Test suite for the GUI solver's access to the control block."""
+
+    def test_mapped_once(self, models):
+        shutil.copy(project_root / "models" / "pendulum.toml", models)
+        code = render("pendulum", gui_version=True)
+        # One mapping of the control block, made by map_shared! at startup
+        assert code.count("Mmap.mmap(fd, Vector{UInt8}") == 1
+        assert code.count("open_shared_pendulum()") == 2
+        assert "arr = open_shared_pendulum()" in code.split("function map_shared!()")[1]
+        assert "finalize(arr)" not in code
+        assert "function main()\n    map_shared!()" in code
+        assert "last_run = read_done_id()" in code
+        # Per-step polling is plain loads through the stored pointers
+        accessors = code.split("# Consistent snapshot of the parameter block")[1].split("# Result ring")[0]
+        assert "open_shared" not in accessors and "Mmap" not in accessors
+        assert "write_shared_state(new_state::Char) = unsafe_store!(STATE_PTR[]" in accessors
+        assert "check_gui_state() = Char(unsafe_load(STATE_PTR[]))" in accessors
+        # Without a session the solver prints usage and exits
+        assert 'const SESSION = session_name()' in code
+        session = code.split("function session_name()")[1].split("\nend\n")[0]
+        assert 'LEGACY_SESSION' not in code and "Usage: julia models/pendulum_gui.jl <session>" in session
+        assert "exit(2)" in session
+        # The seqlock retry orders its generation loads
+        seqlock = accessors.split("while true")[1]
+        assert seqlock.count("Threads.atomic_fence()") == 2
+        assert "g1 = unsafe_load(gen_ptr)\n        Threads.atomic_fence()\n        isodd(g1)" in seqlock
+
+
+class TestJacobian:
+    """Test suite for the generated analytic Jacobians."""
+
+    def numpy_backend(self, name):
+        generate_numpy_code(name, (templates / "ode_numpy_solver.py.template").read_text())
+        return load_backend(name, "models")
+
+    def check_against_differences(self, backend, n_samples=20):
+        rng = np.random.default_rng(1)
+        n = len(backend.VARIABLE_NAMES)
+        u = rng.uniform(0.2, 2.0, size=(n_samples, n))
+        t = np.zeros(n_samples)
+        p = model_params(backend)
+        exact = backend.jac(t, u, p)
+        assert exact.shape == (n_samples, n, n)
+        np.testing.assert_allclose(exact, batched_jacobian(backend.rhs, t, u, p), rtol=1e-6, atol=1e-8)
+
+    @pytest.mark.parametrize("model", ["pendulum", "lorenz_attractor"])
+    def test_examples(self, models, model):
+        shutil.copy(project_root / "models" / f"{model}.toml", models)
+        self.check_against_differences(self.numpy_backend(model))
+
+    def test_auxiliary_chain(self, models):
+        """Auxiliary equations, derivative references and piecewise terms."""
+        auxiliary = {"wage": "k * x^2 / (1 + y)", "profit": "1 - wage - 0.1z",
+                     "invest": "max(profit, 0.05) * exp(-k * z)", "growth": "dx / x"}
+        ode = {"f_x": "invest - 0.2x", "f_y": "y * (growth - sqrt(abs(z - y)))",
+               "f_z": "ifelse(y > 1, wage, -wage) + dy * tanh(profit)"}
+        write_model(models, "econ", ode, auxiliary=auxiliary, variables=("x", "y", "z"))
+        backend = self.numpy_backend("econ")
+        self.check_against_differences(backend, 50)
+
+    def test_rendered_ode(self, models):
+        shutil.copy(project_root / "models" / "pendulum.toml", models)
+        code = render("pendulum")
+        assert "function jac!(J, u, p, t)" in code
+        assert "J[2, 1] = J_f_omega__theta" in code
+        assert "J_f_omega__theta = -((g / length) * cos(theta))" in code
+        assert "const jac_prototype = sparse(Int[1, 2, 2], Int[2, 1, 2], zeros(3), 2, 2)" in code
+        # Lorenz: f_x does not depend on z
+        shutil.copy(project_root / "models" / "lorenz_attractor.toml", models)
+        pattern = [(i, j) for i, j, _, _ in load_model_context("lorenz_attractor")["jac_entries"]]
+        assert len(pattern) == 8 and (1, 3) not in pattern
+
+    def test_rendered_dae(self, models):
+        write_model(models, "ida", {"f_x": "y", "f_y": "-k * x + 0.5dx"}, {"method": "IDA"})
+        code = render("ida", gui_version=True)
+        assert "function dae_jac!(J, du, u, p, jac_gamma, t)" in code
+        assert "J[2, 1] -= -k" in code
+        assert "J[2, 1] -= jac_gamma * (0.5)" in code
+        assert "DAEFunction(dae!; jac=dae_jac!)" in code
+
+    def test_not_differentiable(self, models, capsys):
+        write_model(models, "step", {"f_x": "floor(y)", "f_y": "-x"})
+        assert not load_model_context("step")["analytic_jacobian"]
+        assert "No analytic Jacobian" in capsys.readouterr().out
+        code = render("step")
+        assert "jac!" not in code and "prob = ODEProblem(ode!, u0, tspan)" in code
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the incremental live data path used by the pukahaPai viewer.
+These do not need Julia or DearPyGui.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import pytest
+import numpy as np
+
+from live_data import ColumnBuffer, CsvTailReader, MinMaxDecimator, RunningExtrema, WindowExtrema
+
+
+class TestCsvTailReader:
+    """Test suite for live_data.CsvTailReader."""
+
+    @pytest.fixture
+    def csv_path(self, tmp_path):
+        return tmp_path / "model.csv"
+
+    def test_column_buffer_grows(self):
+        buf = ColumnBuffer(["t", "x"], capacity=2)
+        for i in range(10):
+            buf.append_rows([[i, 2 * i]])
+        assert len(buf) == 10
+        assert buf.capacity >= 10
+        np.testing.assert_array_equal(buf.column("x"), 2 * np.arange(10))
+
+    def test_only_new_rows_parsed(self, csv_path):
+        csv_path.write_text("t,x,y\n0.0,1.0,2.0\n0.1,1.1,2.1\n")
+        reader = CsvTailReader(str(csv_path))
+        assert reader.poll() == 2
+        assert reader.poll() == 0, "No new rows should be reported"
+        with open(csv_path, "a") as f:
+            f.write("0.2,1.2,2.2\n")
+        assert reader.poll() == 1
+        np.testing.assert_allclose(reader.column(0), [0.0, 0.1, 0.2])
+        np.testing.assert_allclose(reader.column("y"), [2.0, 2.1, 2.2])
+
+    def test_partial_line_kept(self, csv_path):
+        csv_path.write_text("t,x\n0.0,1.0\n0.1,1.")
+        reader = CsvTailReader(str(csv_path))
+        assert reader.poll() == 1
+        with open(csv_path, "a") as f:
+            f.write("5\n")
+        assert reader.poll() == 1
+        np.testing.assert_allclose(reader.column("x"), [1.0, 1.5])
+
+    def test_truncation_resets(self, csv_path):
+        csv_path.write_text("t,x\n0.0,1.0\n0.1,2.0\n0.2,3.0\n")
+        reader = CsvTailReader(str(csv_path))
+        assert reader.poll() == 3
+        csv_path.write_text("t,x\n0.0,9.0\n")
+        assert reader.poll() == 1
+        np.testing.assert_allclose(reader.column("x"), [9.0])
+        assert reader.runs == 1
+
+    def test_missing_file(self, csv_path):
+        reader = CsvTailReader(str(csv_path))
+        assert reader.poll() == 0
+        assert len(reader) == 0
+
+
+class TestMinMaxDecimator:
+    """Test suite for live_data.MinMaxDecimator."""
+
+    @pytest.fixture
+    def signal(self):
+        y = np.sin(np.linspace(0, 50, 100_000))
+        y[54_321] = 50.0   # spikes that must survive decimation
+        y[777] = -40.0
+        return y
+
+    def test_small_series_untouched(self):
+        dec = MinMaxDecimator(budget=100)
+        dec.update([np.arange(30.0)])
+        np.testing.assert_array_equal(dec.indices(0), np.arange(30))
+
+    def test_budget_and_peaks(self, signal):
+        dec = MinMaxDecimator(budget=1000)
+        dec.update([signal])
+        idx = dec.indices(0)
+        assert len(idx) <= 1000
+        assert np.all(np.diff(idx) >= 0), "Indices must be in time order"
+        assert signal[idx].max() == 50.0
+        assert signal[idx].min() == -40.0
+
+    def test_incremental_matches_full(self, signal):
+        full = MinMaxDecimator(budget=1000)
+        full.update([signal, -signal])
+        inc = MinMaxDecimator(budget=1000)
+        for n in range(0, len(signal), 3_333):
+            inc.update([signal[:n], -signal[:n]])
+        inc.update([signal, -signal])
+        np.testing.assert_array_equal(inc.indices(0), full.indices(0))
+        np.testing.assert_array_equal(inc.indices(1), full.indices(1))
+
+    def test_new_run_resets(self, signal):
+        """A new run that already has more rows must not keep old buckets."""
+        dec = MinMaxDecimator(budget=1000)
+        dec.update([signal[:50_000]], run=0)
+        fresh = MinMaxDecimator(budget=1000)
+        fresh.update([-signal], run=1)
+        dec.update([-signal], run=1)
+        np.testing.assert_array_equal(dec.indices(0), fresh.indices(0))
+
+
+class TestAxisExtrema:
+    """Test suite for the incremental autoscaling helpers in live_data."""
+
+    @pytest.fixture
+    def series(self):
+        t = np.arange(2000) * 0.01
+        return t, np.sin(3 * t) * t
+
+    def test_running_extrema(self, series):
+        t, y = series
+        ext = RunningExtrema(1)
+        for n in range(0, len(t), 77):
+            ext.update([y[:n]])
+        ext.update([y])
+        assert ext.limits(0) == (y.min(), y.max())
+
+    def test_running_extrema_ignores_nan(self):
+        ext = RunningExtrema(1)
+        ext.update([np.array([1.0, np.nan, -2.0])])
+        assert ext.limits(0) == (-2.0, 1.0)
+
+    def test_new_run_resets(self, series):
+        t, y = series
+        ext = RunningExtrema(1)
+        ext.update([y[:100]], run=0)
+        ext.update([np.full(200, 0.5)], run=1)
+        assert ext.limits(0) == (0.5, 0.5)
+        window = WindowExtrema(1, 100.0)
+        window.update(t[:100], [y[:100]], run=0)
+        window.update(t[:200], [np.full(200, 0.5)], run=1)
+        assert window.limits(0) == (0.5, 0.5)
+
+    def test_window_extrema(self, series):
+        t, y = series
+        span = 3.0
+        ext = WindowExtrema(1, span)
+        for n in range(1, len(t), 77):
+            ext.update(t[:n], [y[:n]])
+            in_window = y[:n][t[:n] >= t[n - 1] - span]
+            assert ext.limits(0) == (in_window.min(), in_window.max())
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
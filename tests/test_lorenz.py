@@ -23,9 +23,10 @@ tests/test_lorenz.py ....
 '''
 import pytest
 import subprocess
-import csv
 from pathlib import Path
 
+from result_io import RESULT_SUFFIX, open_result
+
 model_name = 'lorenz_attractor'
 project_root = Path.cwd()
 code_gen = "./generate_julia_odesolver.py"
@@ -49,37 +50,30 @@ class TestLorenzModel:
         assert output_file.exists(), "Generated Julia file not found"
 
         # Step 2: Run the Julia simulation
-        csv_output = project_root / "models" / f"{model_name}.csv"
-        if csv_output.exists():
-            csv_output.unlink()
+        result_output = project_root / "models" / f"{model_name}{RESULT_SUFFIX}"
+        if result_output.exists():
+            result_output.unlink()
 
         run_result = subprocess.run(
             ["julia", str(output_file)],
             capture_output=True, text=True, timeout=60, cwd=project_root
         )
         assert run_result.returncode == 0, f"Julia simulation failed: {run_result.stderr}"
-        assert csv_output.exists(), "CSV output file not generated"
+        assert result_output.exists(), "Result file not generated"
 
 
     @pytest.fixture(scope="class")
     def expected_output_values(self):
-        """Expected values for the first 10 time steps of simulation
+        """Expected values on the first rows of the output grid, t0 + k * output_dt.
         These should be updated based on your known good output."""
-        # return [
-        #     [0.01,0.9179244619031339,0.2663399705346038,0.001264186262354602], 
-        #     [0.02,0.8679194605346884,0.5117404051909129,0.004657588116206182], 
-        #     [0.03,0.8453602114731358,0.744654029075825,0.009842631406158073], 
-        #     [0.04,0.8468056229653078,0.9723321561606141,0.016749755532175038], 
-        #     [0.05,0.8697866436302651,1.2011314216557525,0.02551483842756989]
-        # ]
-        return [ [9.765625e-6,0.9999023799832181,0.0002734081369992548,2.669672907644265e-9],
-            [1.953125e-5,0.9998047961932501,0.0005467869211641305,8.00814326997958e-9],
-            [2.9296875e-5,0.9997072486236934,0.000820136362659159,1.6014536129513706e-8],
-            [3.90625e-5,0.999609737268147,0.001093456471647039,2.668797702401555e-8],
-            [4.8828125e-5,0.9995122621202112,0.0013667472582886361,4.0027591986315424e-8]
-            ]
+        return [
+            [0.01,0.9179244619031339,0.2663399705346038,0.001264186262354602],
+            [0.02,0.8679194605346884,0.5117404051909129,0.004657588116206182],
+            [0.03,0.8453602114731358,0.744654029075825,0.009842631406158073],
+            [0.04,0.8468056229653078,0.9723321561606141,0.016749755532175038],
+            [0.05,0.8697866436302651,1.2011314216557525,0.02551483842756989],
+        ]
 
-    
     def test_generate_julia_cmdl(self):
         """Test generating the  command-line Julia script."""
         result = subprocess.run([ code_gen, model_name
@@ -95,14 +89,14 @@ class TestLorenzModel:
     def test_run_julia_simulation(self):
         """Test running the generated Julia simulation"""
         julia_script = project_root / "models" / f"{model_name}_cmdl.jl"
-        csv_output = project_root / "models" / f"{model_name}.csv"
+        result_output = project_root / "models" / f"{model_name}{RESULT_SUFFIX}"
         
         # Ensure the Julia script exists (should be generated by previous test)
         assert julia_script.exists(), "Julia script not found. Run generation test first."
         
-        # Remove existing CSV if it exists to ensure clean test
-        if csv_output.exists():
-            csv_output.unlink()
+        # Remove existing results if they exist to ensure clean test
+        if result_output.exists():
+            result_output.unlink()
         
         # Run the Julia simulation
         result = subprocess.run([
@@ -111,19 +105,18 @@ class TestLorenzModel:
         
         assert result.returncode == 0, f"Julia simulation failed: {result.stderr}"
         
-        # Check that CSV output was generated
-        assert csv_output.exists(), "CSV output file not generated"
+        # Check that the result file was generated
+        assert result_output.exists(), "Result file not generated"
     
 
-    def test_csv_output_format(self):
-        """Test that the CSV output has the correct format"""
-        csv_output = project_root / "models" / f"{model_name}.csv"
-        assert csv_output.exists(), "CSV output file not found"
-        with open(csv_output, 'r') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
+    def test_result_output_format(self):
+        """Test that the result file has the correct format"""
+        result_output = project_root / "models" / f"{model_name}{RESULT_SUFFIX}"
+        assert result_output.exists(), "Result file not found"
+        result = open_result(result_output)
+        rows = [result.names] + result.data.tolist()
         # Check that we have data
-        assert len(rows) > n_rows, "CSV should have at least 10 rows of data"
+        assert len(rows) > n_rows, "Results should have at least 10 rows of data"
         # Check that each row has the expected number of columns (adjust as needed)
         # Assuming format: time, theta, omega (3 columns)
         for i, row in enumerate(rows[1:n_rows+1]):
@@ -132,14 +125,13 @@ class TestLorenzModel:
     
     
 
-    def test_csv_output_values(self, expected_output_values):
-        """Test that the CSV output values are within expected tolerances"""
-        csv_output = project_root / "models" / f"{model_name}.csv"
-        assert csv_output.exists(), "CSV output file not found"
+    def test_result_output_values(self, expected_output_values):
+        """Test that the result file values are within expected tolerances"""
+        result_output = project_root / "models" / f"{model_name}{RESULT_SUFFIX}"
+        assert result_output.exists(), "Result file not found"
         
-        with open(csv_output, 'r') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
+        result = open_result(result_output)
+        rows = [result.names] + result.data.tolist()
         
         # Test first 10 rows against expected values
         tolerance = 1e-6  # Adjust tolerance as needed
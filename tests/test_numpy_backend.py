@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the NumPy reference backend: code generation from the TOML
+model and the RK4 / Dormand-Prince integrators in numpy_solver.py.
+These run without Julia.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import csv
+from types import SimpleNamespace
+import pytest
+import numpy as np
+from pathlib import Path
+
+from generate_julia_odesolver import generate_numpy_code, julia_to_numpy
+from numpy_solver import (
+    rk4, dopri5, load_backend, model_params, output_times, solve_model, write_csv,
+    integrate_ensemble, solve_ensemble
+)
+
+project_root = Path(__file__).resolve().parent.parent
+template_path = project_root / "templates" / "ode_numpy_solver.py.template"
+
+
+def build_backend(model_name, monkeypatch):
+    monkeypatch.chdir(project_root)
+    generate_numpy_code(model_name, template_path.read_text())
+    return load_backend(model_name, project_root / "models")
+
+
+def decay(t, y, p):
+    return -p.k * y
+
+
+def decay_members(t, y, p):
+    """Ensemble form: one rate per member, state `(n_members, 1)`"""
+    return -p.k[:, None] * y
+
+
+class TestTranslation:
+    """Test suite for Julia model syntax to NumPy translation."""
+
+    def test_operators_and_functions(self):
+        assert julia_to_numpy("x^2 + sin(y)", ["x", "y"]) == "x**2 + np.sin(y)"
+        assert julia_to_numpy("a .* b ./ c", []) == "a * b / c"
+        assert julia_to_numpy("max(x, 0.0)", ["x"]) == "np.maximum(x, 0.0)"
+
+    def test_keywords_and_derivatives(self):
+        assert julia_to_numpy("lambda * (1 - lambda)", ["lambda"]) == "lambda_ * (1 - lambda_)"
+        assert julia_to_numpy("f_lambda / lambda + dP / P", ["lambda", "P"]) == \
+            "f_lambda / lambda_ + f_P / P"
+
+
+class TestIntegrators:
+    """Test suite for the RK4 and Dormand-Prince integrators."""
+
+    def test_rk4_is_fourth_order(self):
+        p = SimpleNamespace(k=1.0)
+        errors = []
+        for dt in (0.1, 0.05):
+            t, y = list(rk4(decay, [1.0], 0.0, 1.0, dt, p))[-1]
+            assert t == 1.0
+            errors.append(abs(y[0] - np.exp(-1.0)))
+        assert errors[0] / errors[1] == pytest.approx(16.0, rel=0.1)
+
+    def test_rk4_lands_on_t1(self):
+        steps = list(rk4(decay, [1.0], 0.0, 1.05, 0.1, SimpleNamespace(k=1.0)))
+        assert len(steps) == 11
+        assert steps[-1][0] == 1.05
+
+    def test_dopri5_meets_tolerance(self):
+        p = SimpleNamespace(k=2.0)
+        steps = list(dopri5(decay, [1.0], 0.0, 3.0, p, dt=0.1, rtol=1e-8, atol=1e-10))
+        t = np.array([s[0] for s in steps])
+        y = np.array([s[1][0] for s in steps])
+        assert t[-1] == 3.0
+        assert np.all(np.diff(t) > 0)
+        np.testing.assert_allclose(y, np.exp(-2.0 * t), rtol=1e-6)
+        # Adaptive: far fewer steps than a fixed dt of the same accuracy
+        assert len(steps) < 200
+
+    def test_dense_output(self):
+        """Output times between steps are interpolated to the method's order."""
+        p = SimpleNamespace(k=2.0)
+        t_out = np.linspace(0.0, 3.0, 61)[1:]
+        steps = list(dopri5(decay, [1.0], 0.0, 3.0, p, dt=0.1, rtol=1e-9, atol=1e-12, t_out=t_out))
+        t = np.array([s[0] for s in steps])
+        np.testing.assert_array_equal(t, t_out)
+        np.testing.assert_allclose([s[1][0] for s in steps], np.exp(-2.0 * t), rtol=1e-7)
+        # RK4 steps of 0.1 sampled at 0.05 spacing: the Hermite cubic is third order
+        steps = list(rk4(decay, [1.0], 0.0, 3.0, 0.1, p, t_out=t_out))
+        np.testing.assert_array_equal([s[0] for s in steps], t_out)
+        np.testing.assert_allclose([s[1][0] for s in steps], np.exp(-2.0 * t_out), rtol=1e-3)
+        # On-step output times are the steps themselves
+        on_step = list(rk4(decay, [1.0], 0.0, 3.0, 0.1, p, t_out=t_out[1::2]))
+        plain = list(rk4(decay, [1.0], 0.0, 3.0, 0.1, p))
+        np.testing.assert_array_equal([s[1] for s in on_step], [s[1] for s in plain])
+
+    def test_output_times_max_rows(self):
+        np.testing.assert_allclose(output_times(0.0, 1.0, 0.1), 0.1 * np.arange(1, 11))
+        t = output_times(0.0, 1.0, 0.01, max_rows=8)
+        assert len(t) == 8 and t[-1] == 1.0
+        np.testing.assert_allclose(np.diff(t), 0.125)
+
+
+class TestGeneratedBackend:
+    """Test suite for the generated models/<model>_numpy.py modules."""
+
+    def test_pendulum_rhs(self, monkeypatch):
+        backend = build_backend("pendulum", monkeypatch)
+        p = model_params(backend)
+        du = backend.rhs(0.0, np.array([0.5, 0.2]), p)
+        np.testing.assert_allclose(du, [0.2, -0.1 * 0.2 - 9.81 * np.sin(0.5)])
+
+    def test_rhs_broadcasts_over_members(self, monkeypatch):
+        backend = build_backend("lorenz_attractor", monkeypatch)
+        u = np.random.default_rng(0).normal(size=(4, 3))
+        rho = np.array([10.0, 20.0, 28.0, 35.0])
+        du = backend.rhs(0.0, u, model_params(backend, {"rho": rho}))
+        assert du.shape == (4, 3)
+        for i in range(4):
+            single = backend.rhs(0.0, u[i], model_params(backend, {"rho": rho[i]}))
+            np.testing.assert_allclose(du[i], single)
+
+    def test_matches_julia_reference(self, monkeypatch):
+        """First fixed step agrees with a known good Julia pendulum run."""
+        backend = build_backend("pendulum", monkeypatch)
+        t, y = next(rk4(backend.rhs, backend.INITIAL_CONDITIONS, backend.T0,
+                        backend.T1, backend.DT, model_params(backend)))
+        assert t == pytest.approx(0.01)
+        np.testing.assert_allclose(y, [0.7850512998056338, -0.06932447565427709], atol=1e-6)
+
+    def test_methods_agree(self, monkeypatch):
+        backend = build_backend("lorenz_attractor", monkeypatch)
+        backend.T1 = 1.0
+        t_fixed, y_fixed = solve_model(backend, "rk4")
+        t_adapt, y_adapt = solve_model(backend, "dopri5", rtol=1e-10, atol=1e-10)
+        assert t_fixed[-1] == t_adapt[-1] == 1.0
+        np.testing.assert_allclose(y_adapt[-1], y_fixed[-1], rtol=1e-5)
+
+    def test_csv_output_contract(self, monkeypatch, tmp_path):
+        backend = build_backend("pendulum", monkeypatch)
+        backend.T1 = 0.1
+        t, y = solve_model(backend, "rk4")
+        path = tmp_path / "pendulum.csv"
+        write_csv(path, backend.VARIABLE_NAMES, t, y)
+        with open(path) as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ["t", "theta", "omega"]
+        assert len(rows) == 11
+        assert float(rows[1][0]) == pytest.approx(0.01)
+        np.testing.assert_allclose(np.array(rows[1:], dtype=float), np.column_stack([t, y]))
+
+
+class TestEnsemble:
+    """Test suite for vectorised ensemble integration."""
+
+    def test_members_match_single_runs(self, monkeypatch):
+        backend = build_backend("pendulum", monkeypatch)
+        backend.T1 = 2.0
+        damping = [0.0, 0.1, 0.5, 1.0]
+        t, y, n_valid = solve_ensemble(backend, {"damping": damping}, "rk4")
+        assert y.shape == (4, 200, 2)
+        assert np.all(n_valid == 200)
+        for i, d in enumerate(damping):
+            t_single, y_single = solve_model(backend, "rk4", {"damping": d})
+            np.testing.assert_allclose(t, t_single)
+            np.testing.assert_allclose(y[i], y_single, rtol=1e-12, atol=1e-12)
+
+    def test_member_dicts(self, monkeypatch):
+        backend = build_backend("lorenz_attractor", monkeypatch)
+        backend.T1 = 0.5
+        _, y_dicts, _ = solve_ensemble(backend, [{"rho": 20.0}, {"rho": 28.0, "beta": 3.0}])
+        _, y_arrays, _ = solve_ensemble(backend, {"rho": [20.0, 28.0], "beta": [2.6, 3.0]})
+        np.testing.assert_array_equal(y_dicts, y_arrays)
+
+    def test_divergent_members_terminate(self):
+        k = np.array([1.0, -60.0, 2.0])
+        t_out = 0.1 * np.arange(1, 201)
+        y, n_valid = integrate_ensemble(decay_members, np.ones((3, 1)), 0.0, t_out,
+                                        SimpleNamespace(k=k), "rk4", dt=0.01)
+        assert n_valid[0] == n_valid[2] == 200
+        assert n_valid[1] < 200
+        assert np.all(np.isnan(y[1, n_valid[1]:]))
+        np.testing.assert_allclose(y[0, :, 0], np.exp(-t_out), rtol=1e-8)
+        np.testing.assert_allclose(y[2, :, 0], np.exp(-2 * t_out), rtol=1e-7)
+
+    def test_adaptive_lands_on_output_grid(self):
+        k = np.array([0.5, 1.0, 4.0])
+        t_out = np.linspace(0.25, 5.0, 20)
+        y, n_valid = integrate_ensemble(decay_members, np.ones((3, 1)), 0.0, t_out,
+                                        SimpleNamespace(k=k), "dopri5", dt=0.1,
+                                        rtol=1e-9, atol=1e-12)
+        exact = np.exp(-np.outer(k, t_out))
+        np.testing.assert_allclose(y[:, :, 0], exact, rtol=1e-6, atol=1e-10)
+
+    def test_memmap_output(self, monkeypatch, tmp_path):
+        backend = build_backend("pendulum", monkeypatch)
+        backend.T1 = 0.5
+        path = tmp_path / "ensemble.npy"
+        t, y, _ = solve_ensemble(backend, {"g": [9.81, 1.62]}, "rk4", out_path=path)
+        assert isinstance(y, np.memmap)
+        stored = np.load(path, mmap_mode="r")
+        assert stored.shape == (2, len(t), 2)
+        np.testing.assert_array_equal(stored, y)
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the compiled auxiliary equation evaluator in plot_utils.py.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import pytest
+import numpy as np
+import pandas as pd
+
+from plot_utils import compile_derived_variables, compute_derived_variables
+
+CONFIG = {
+    "parameters": {"a": 2.0, "b": 0.5},
+    "equations": {"auxiliary": {
+        "w": "v * 2",                 # out of order on purpose
+        "v": "lambda * a + u",
+        "u": "exp(-b*t) + x^2",
+        "c": "a*b",
+    }},
+}
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"t": np.linspace(0, 1, 50), "x": rng.random(50), "lambda": rng.random(50)})
+
+
+class TestDerivedVariables:
+    """Test suite for plot_utils.compute_derived_variables."""
+
+    def test_values_in_dependency_order(self, df):
+        out = compute_derived_variables(df, CONFIG)
+        assert list(out.columns) == ["t", "x", "lambda", "u", "c", "v", "w"]
+        u = np.exp(-0.5 * df.t) + df.x ** 2
+        np.testing.assert_allclose(out.u, u)
+        np.testing.assert_allclose(out.v, df["lambda"] * 2.0 + u)
+        np.testing.assert_allclose(out.w, 2 * out.v)
+        assert (out.c == 1.0).all() and len(out.c) == len(df)
+        assert list(df.columns) == ["t", "x", "lambda"], "Input must not be modified"
+
+    def test_compiled_once(self, df):
+        first = compile_derived_variables(CONFIG, list(df.columns))
+        assert compile_derived_variables(dict(CONFIG), list(df.columns)) is first
+        changed = {**CONFIG, "parameters": {"a": 3.0, "b": 0.5}}
+        assert compile_derived_variables(changed, list(df.columns)) is not first
+
+    def test_cycles_and_missing_inputs_skipped(self, df, capsys):
+        config = {"equations": {"auxiliary": {"p": "q + 1", "q": "p", "r": "nope * 2", "s": "x + 1"}}}
+        out = compute_derived_variables(df, config)
+        assert list(out.columns) == ["t", "x", "lambda", "s"]
+        err = capsys.readouterr().out
+        assert "circular" in err and "['p', 'q']" in err
+        assert "missing ['nope']" in err
+
+    def test_failures_are_isolated(self, df, capsys):
+        config = {"equations": {"auxiliary": {
+            "bad": "undefined_function(x)", "uses_bad": "bad * 2",
+            "broken": "x +* 2", "good": "lambda + 1",
+        }}}
+        out = compute_derived_variables(df, config)
+        assert list(out.columns) == ["t", "x", "lambda", "good"]
+        np.testing.assert_allclose(out.good, df["lambda"] + 1)
+        err = capsys.readouterr().out
+        assert "Could not compute bad" in err and "Could not compute broken" in err
+        assert "Could not compute uses_bad: needs ['bad']" in err
+
+    def test_long_chain(self):
+        n = 2000
+        aux = {f"v{i}": f"v{i + 1} + 1" for i in range(n)}
+        aux[f"v{n}"] = "x"
+        df = pd.DataFrame({"t": [0.0, 1.0], "x": [1.0, 2.0]})
+        out = compute_derived_variables(df, {"equations": {"auxiliary": aux}})
+        np.testing.assert_array_equal(out.v0, [n + 1.0, n + 2.0])
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
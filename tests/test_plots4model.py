@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the compact HTML report in plots4model.py: peak-preserving
+decimation, the shared time axis, parallel figure jobs and the written
+report.
+These run without Julia.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import json
+import shutil
+import pytest
+import numpy as np
+import plotly.graph_objects as go
+from pathlib import Path
+
+from eigen_analysis import analyze_result
+from plots4model import SharedTimeAxis, build_figures, compact_figure, main, peak_indices
+from result_io import write_result
+
+project_root = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def spiky():
+    t = np.linspace(0.0, 10.0, 20001)
+    y = np.sin(t)
+    y[12345] = 50.0
+    y[777] = -50.0
+    return t, y
+
+
+class TestDecimation:
+    """Test suite for report trace decimation."""
+
+    def test_peaks_survive_budget(self, spiky):
+        t, y = spiky
+        idx = peak_indices([y], 1000)
+        assert len(idx) <= 1000
+        assert np.all(np.diff(idx) > 0)
+        assert 12345 in idx and 777 in idx
+        assert y[idx].max() == y.max() and y[idx].min() == y.min()
+
+    def test_small_traces_untouched(self, spiky):
+        t, y = spiky
+        assert peak_indices([y], 0) is None
+        assert peak_indices([y[:100]], 1000) is None
+
+    def test_time_series_share_axis(self, spiky):
+        t, y = spiky
+        axis = SharedTimeAxis(t)
+        fig = go.Figure([go.Scatter(x=t, y=y), go.Scatter(x=t, y=np.cos(t))])
+        phase = go.Figure(go.Scatter(x=y, y=np.cos(t)))
+        shared = compact_figure(fig, 1000, axis)
+        assert compact_figure(phase, 1000, axis) == []
+        axis.finish()
+        assert [j for j, _ in shared] == [0, 1]
+        for trace, (j, idx) in zip(fig.data, shared):
+            assert trace.x is None
+            np.testing.assert_array_equal(axis.t[axis.idx][axis.positions(idx)], t[idx])
+            assert len(trace.y) == len(idx) <= 1000
+        assert len(phase.data[0].x) <= 1000
+
+
+class TestReport:
+    """Test suite for the written HTML report."""
+
+    @pytest.fixture
+    def model_dir(self, tmp_path, monkeypatch):
+        (tmp_path / "models").mkdir()
+        shutil.copy(project_root / "models" / "pendulum.toml", tmp_path / "models")
+        t = np.linspace(0.0, 100.0, 50001)
+        write_result(tmp_path / "models" / "pendulum.pkr", ["t", "theta", "omega"],
+                     np.column_stack([t, np.sin(t), np.cos(t)]))
+        monkeypatch.chdir(tmp_path)
+        return tmp_path
+
+    def test_budget_shrinks_report(self, model_dir, capsys):
+        html = model_dir / "models" / "pendulum.html"
+        main("pendulum", max_points=0)
+        full = html.stat().st_size
+        main("pendulum", max_points=500)
+        compact = html.stat().st_size
+        assert compact < full / 10
+        text = html.read_text()
+        assert text.count("renderFigure(\"sim-") == 2
+        assert '"bdata"' in text
+        out = capsys.readouterr().out
+        assert "KiB" in out and "built in" in out
+
+    def test_parallel_report_is_deterministic(self, model_dir, capsys):
+        html = model_dir / "models" / "pendulum.html"
+        main("pendulum", max_points=500, jobs=1)
+        serial = html.read_text()
+        main("pendulum", max_points=500, jobs=2, force=True)
+        assert html.read_text() == serial
+        assert capsys.readouterr().out.count("built in") == 2
+
+    def test_report_cached(self, model_dir, capsys):
+        html = model_dir / "models" / "pendulum.html"
+        main("pendulum", max_points=500)
+        main("pendulum", max_points=500)
+        assert "Up to date: models/pendulum.html" in capsys.readouterr().out
+        # A new result file rebuilds the report
+        t = np.linspace(0.0, 10.0, 1001)
+        write_result(model_dir / "models" / "pendulum.pkr", ["t", "theta", "omega"],
+                     np.column_stack([t, np.cos(t), np.sin(t)]))
+        main("pendulum", max_points=500)
+        assert "built in" in capsys.readouterr().out
+        html.write_text("edited")
+        main("pendulum", max_points=500)
+        assert "built in" in capsys.readouterr().out
+
+    def test_posthoc_stability(self, model_dir):
+        """eigen_analysis output is reported without [eigenvalues] all."""
+        html = model_dir / "models" / "pendulum.html"
+        main("pendulum", max_points=500)
+        assert "No stability analysis is available" in html.read_text()
+        shutil.copy(project_root / "models" / "pendulum_numpy.py", model_dir / "models")
+        analyze_result("pendulum", stride=100)
+        main("pendulum", max_points=500)
+        text = html.read_text()
+        assert "No stability analysis is available" not in text
+        assert "Stability Analysis for Model" in text
+
+    def test_jobs_in_order(self, model_dir):
+        result_file = model_dir / "models" / "pendulum.pkr"
+        fig_jobs = [("time_series", (["omega"],)), ("phase_2d", (["theta", "omega"], [1.0, 1.0])),
+                    ("time_series", (["theta"],))]
+        built = build_figures(fig_jobs, result_file, "t", 500, jobs=2)
+        assert [len(figs) for figs in built] == [1, 1, 1]
+        titles = [json.loads(figs[0][0])["layout"]["title"]["text"] for figs in built]
+        assert titles == ["Time Series: omega", "Phase Plot: omega vs theta", "Time Series: theta"]
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the binary result format in result_io.py: writing, memory
+mapped reading, following a file that is still being written, and the CSV
+converters.  These run without Julia.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from live_data import MinMaxDecimator, RunningExtrema
+from result_io import (
+    ResultTailReader, ResultWriter, export_csv, import_csv, load_result,
+    open_result, read_result_header, result_path, write_result
+)
+
+
+@pytest.fixture
+def solver_rows():
+    t = 0.01 * np.arange(1, 101)
+    return np.column_stack([t, np.sin(t), np.cos(t)])
+
+
+class TestResultFile:
+    """Test suite for writing and mapping result files."""
+
+    def test_round_trip(self, tmp_path, solver_rows):
+        path = tmp_path / "model.pkr"
+        write_result(path, ["t", "x", "y"], solver_rows)
+        header = read_result_header(path)
+        assert header["names"] == ["t", "x", "y"]
+        assert header["n_rows"] == 100
+        assert header["header_bytes"] % 64 == 0
+        result = open_result(path)
+        assert isinstance(result.data, np.memmap)
+        np.testing.assert_array_equal(result.data, solver_rows)
+        np.testing.assert_array_equal(result.column("y"), solver_rows[:, 2])
+        np.testing.assert_array_equal(result.columns(["t", "y"]), solver_rows[:, [0, 2]])
+        assert list(result.to_dataframe().columns) == ["t", "x", "y"]
+
+    def test_only_synced_rows_visible(self, tmp_path, solver_rows):
+        path = tmp_path / "model.pkr"
+        writer = ResultWriter(path, ["t", "x", "y"], sync_every=50)
+        writer.append(solver_rows[:30])
+        assert len(open_result(path)) == 0
+        writer.append(solver_rows[30:60])
+        assert len(open_result(path)) == 60
+        writer.close()
+        np.testing.assert_array_equal(open_result(path).data, solver_rows[:60])
+
+    def test_complex_eigenvalues(self, tmp_path):
+        path = tmp_path / "model_eigen.pkr"
+        rows = np.array([[0.5, -1 + 2j, -1 - 2j], [1.0, 0.25 + 0j, -3 + 0j]])
+        write_result(path, ["t", "e1", "e2"], rows, dtype=np.complex128)
+        result = open_result(path)
+        assert result.data.dtype == np.complex128
+        np.testing.assert_array_equal(result.data, rows)
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "model.pkr"
+        path.write_text("t,x\n0.0,1.0\n")
+        with pytest.raises(ValueError):
+            open_result(path)
+
+
+class TestConversion:
+    """Test suite for the CSV export / import converters."""
+
+    def test_csv_round_trip(self, tmp_path, solver_rows):
+        path = tmp_path / "model.pkr"
+        write_result(path, ["t", "x", "y"], solver_rows)
+        csv_path = export_csv(path)
+        df = pd.read_csv(csv_path, float_precision="round_trip")
+        assert list(df.columns) == ["t", "x", "y"]
+        np.testing.assert_array_equal(df.to_numpy(), solver_rows)
+        back = import_csv(csv_path, tmp_path / "back.pkr")
+        np.testing.assert_array_equal(open_result(back).data, solver_rows)
+
+    def test_complex_export_is_julia_style(self, tmp_path):
+        path = tmp_path / "model_eigen.pkr"
+        write_result(path, ["t", "e1"], [[0.5, -1 + 2j]], dtype=np.complex128)
+        lines = export_csv(path).read_text().splitlines()
+        assert lines == ["t,e1", "0.5+0im,-1.0+2im"]
+
+    def test_newest_result_wins(self, tmp_path, solver_rows):
+        write_result(tmp_path / "model.pkr", ["t", "x", "y"], solver_rows)
+        csv_path = tmp_path / "model.csv"
+        pd.DataFrame(solver_rows[:5], columns=["t", "x", "y"]).to_csv(csv_path, index=False)
+        os.utime(csv_path, ns=(0, 0))
+        assert result_path("model", tmp_path).suffix == ".pkr"
+        assert len(load_result("model", tmp_path)) == 100
+        assert result_path("other", tmp_path) is None
+
+
+class TestResultTailReader:
+    """Test suite for following a result file during a run."""
+
+    def test_reads_new_records_only(self, tmp_path, solver_rows):
+        path = tmp_path / "model.pkr"
+        writer = ResultWriter(path, ["t", "x", "y"], sync_every=10)
+        reader = ResultTailReader(path)
+        assert reader.poll() == 0
+        writer.append(solver_rows[:5])
+        assert reader.poll() == 0, "Unsynced records must not be read"
+        writer.append(solver_rows[5:20])
+        assert reader.poll() == 20
+        assert not reader.changed()
+        writer.append(solver_rows[20:40])
+        assert reader.changed()
+        assert reader.poll() == 20
+        np.testing.assert_array_equal(reader.column("x"), solver_rows[:40, 1])
+        writer.close()
+
+    def test_new_run_resets(self, tmp_path, solver_rows):
+        path = tmp_path / "model.pkr"
+        write_result(path, ["t", "x", "y"], solver_rows)
+        reader = ResultTailReader(path)
+        assert reader.poll() == 100
+        os.unlink(path)
+        write_result(path, ["t", "x", "y"], solver_rows[:3])
+        assert reader.poll() == 3
+        np.testing.assert_array_equal(reader.column("t"), solver_rows[:3, 0])
+        assert reader.runs == 1
+
+    def test_plot_state_follows_runs(self, tmp_path, solver_rows):
+        """The viewer's per-run plot state, fed as update_plots does."""
+        path = tmp_path / "model.pkr"
+        reader = ResultTailReader(path)
+        decimator, extrema = MinMaxDecimator(budget=20), RunningExtrema(2)
+
+        def frame():
+            reader.poll()
+            columns = [reader.column(i) for i in (1, 2)]
+            decimator.update(columns, reader.runs)
+            extrema.update(columns, reader.runs)
+
+        write_result(path, ["t", "x", "y"], solver_rows[:50])
+        frame()
+        assert extrema.limits(0) == (solver_rows[0, 1], solver_rows[49, 1])
+        # A new run, already longer than the last one, in a new file
+        write_result(tmp_path / "next.pkr", ["t", "x", "y"], -solver_rows)
+        os.replace(tmp_path / "next.pkr", path)
+        frame()
+        assert reader.runs == 1
+        assert extrema.limits(0) == (-solver_rows[:, 1].max(), -solver_rows[:, 1].min())
+        fresh = MinMaxDecimator(budget=20)
+        fresh.update([-solver_rows[:, 1], -solver_rows[:, 2]])
+        np.testing.assert_array_equal(decimator.indices(0), fresh.indices(0))
+        # A manual reset starts over too
+        reader.reset()
+        frame()
+        assert reader.runs == 2 and len(reader) == 100
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the shared memory data path between solver and viewer.
+A Python stand-in producer is used in place of the Julia solver.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import gc
+import os
+import sys
+import ctypes
+import subprocess
+import multiprocessing
+from multiprocessing import shared_memory
+import pytest
+import numpy as np
+from pathlib import Path
+
+from shared_mem import (
+    ResultRing, RingReader, create_ctypes_struct,
+    seqlock_begin, seqlock_end, seqlock_read, request_run,
+    SHM_DIR, new_session_name, ring_name, parse_session_name,
+    list_sessions, reclaim_stale_segments
+)
+
+project_root = Path(__file__).resolve().parent.parent
+
+
+class TestResultRing:
+    """Test suite for shared_mem.ResultRing and RingReader."""
+
+    @pytest.fixture
+    def ring(self):
+        ring = ResultRing(f"pukaha_test_ring_{os.getpid()}", n_cols=3, capacity=16, create=True)
+        yield ring
+        ring.close()
+
+    def test_reader_sees_only_new_records(self, ring):
+        reader = RingReader(ring, ["t", "x", "y"])
+        assert reader.poll() == 0
+        ring.append([[0.0, 1.0, 2.0], [0.1, 1.1, 2.1]])
+        assert reader.poll() == 2
+        assert reader.poll() == 0, "Unchanged sequence counter should skip the read"
+        ring.append([0.2, 1.2, 2.2])
+        assert reader.poll() == 1
+        np.testing.assert_allclose(reader.column("t"), [0.0, 0.1, 0.2])
+        np.testing.assert_allclose(reader.column("y"), [2.0, 2.1, 2.2])
+
+    def test_wraparound_and_overrun(self, ring):
+        reader = RingReader(ring)
+        rows = np.column_stack([np.arange(40.0)] * 3)
+        ring.append(rows[:10])
+        assert reader.poll() == 10
+        ring.append(rows[10:40])  # 30 more than a 16 slot ring can hold
+        assert reader.poll() == 16
+        assert reader.dropped == 14
+        np.testing.assert_allclose(reader.column(0)[-16:], np.arange(24.0, 40.0))
+
+    def test_new_run_resets_reader(self, ring):
+        reader = RingReader(ring)
+        ring.append(np.ones((5, 3)))
+        reader.poll()
+        ring.reset()
+        ring.append(np.zeros((7, 3)))
+        assert reader.poll() == 7
+        assert len(reader) == 7
+        assert reader.runs == 1
+        # A manual reset is a run boundary as well, and re-reads the ring
+        reader.reset()
+        assert reader.runs == 2
+        assert reader.poll() == 7
+
+    def test_change_notification(self, ring):
+        reader = RingReader(ring)
+        reader.poll()
+        assert not reader.changed()
+        assert reader.wait(timeout=0.01) == 0, "Idle ring should time out"
+        ring.append([1.0, 2.0, 3.0])
+        assert reader.changed()
+        assert reader.wait(timeout=1.0) == 1
+        assert not reader.changed()
+
+    def test_standin_producer(self, ring, tmp_path):
+        """Replay a CSV through the ring from another process."""
+        data = np.column_stack([np.linspace(0, 1, 12), np.sin(np.arange(12)), np.cos(np.arange(12))])
+        csv_path = tmp_path / "model.csv"
+        np.savetxt(csv_path, data, delimiter=",", header="t,x,y", comments="")
+        reader = RingReader(ring)
+        result = subprocess.run(
+            [sys.executable, "shared_mem.py", str(csv_path), ring.name, "--chunk", "5", "--delay", "0"],
+            capture_output=True, text=True, timeout=30, cwd=project_root
+        )
+        assert result.returncode == 0, f"Stand-in producer failed: {result.stderr}"
+        reader.poll()
+        np.testing.assert_allclose(np.column_stack([reader.column(i) for i in range(3)]), data)
+
+
+PARAMS = {"t0": ("c_double", 0.0), "t1": ("c_double", 10.0),
+          "a": ("c_double", 0.0), "b": ("c_double", 0.0), "n": ("c_int", 0)}
+
+
+def _seqlock_writer(name, n_updates):
+    """Writer process: keeps a == b == n at every consistent generation."""
+    shm = shared_memory.SharedMemory(name=name)
+    struct = create_ctypes_struct(PARAMS).from_buffer(shm.buf)
+    for i in range(1, n_updates + 1):
+        seqlock_begin(struct)
+        struct.a = float(i)
+        struct.b = float(i)
+        struct.n = i
+        seqlock_end(struct)
+    del struct
+    shm.close()
+
+
+class TestSeqlock:
+    """Test suite for the seqlocked parameter block."""
+
+    @pytest.fixture
+    def block(self):
+        ParamStruct = create_ctypes_struct(PARAMS)
+        shm = shared_memory.SharedMemory(name=f"pukaha_test_params_{os.getpid()}",
+                                         create=True, size=ctypes.sizeof(ParamStruct))
+        yield shm, ParamStruct
+        gc.collect()  # drop struct views into the buffer before closing
+        shm.close()
+        shm.unlink()
+
+    def test_layout(self):
+        fields = [name for name, _ in create_ctypes_struct(PARAMS)._fields_]
+        assert fields == ["state", "generation", "run_id", "done_id", "t0", "t1", "a", "b", "n"]
+
+    def test_unchanged_generation_skips_read(self, block):
+        shm, ParamStruct = block
+        struct = ParamStruct.from_buffer(shm.buf)
+        gen, copy = seqlock_read(struct)
+        assert gen % 2 == 0 and copy is not None
+        assert seqlock_read(struct, gen) == (gen, None)
+        seqlock_begin(struct)
+        struct.a = 3.0
+        seqlock_end(struct)
+        gen2, copy = seqlock_read(struct, gen)
+        assert gen2 == gen + 2
+        assert copy.a == 3.0
+
+    def test_request_run_is_one_generation(self, block):
+        shm, ParamStruct = block
+        struct = ParamStruct.from_buffer(shm.buf)
+        gen, _ = seqlock_read(struct)
+        assert request_run(struct) == 1
+        gen2, copy = seqlock_read(struct, gen)
+        assert gen2 == gen + 2
+        assert copy.run_id == 1 and copy.state == b'r'
+
+    def test_no_torn_reads(self, block):
+        shm, ParamStruct = block
+        struct = ParamStruct.from_buffer(shm.buf)
+        ctx = multiprocessing.get_context("fork")
+        writer = ctx.Process(target=_seqlock_writer, args=(shm.name, 20000))
+        writer.start()
+        reads = 0
+        last = None
+        while writer.is_alive() or reads == 0:
+            gen, copy = seqlock_read(struct, last)
+            if copy is not None:
+                assert copy.a == copy.b == copy.n, "Torn parameter read"
+                last = gen
+                reads += 1
+        writer.join()
+        assert writer.exitcode == 0
+        assert struct.generation == 40000
+
+
+@pytest.mark.skipif(not os.path.isdir(SHM_DIR), reason="needs POSIX shared memory in /dev/shm")
+class TestSessions:
+    """Test suite for session scoped segment names and stale reclamation."""
+
+    def test_names_are_unique_and_parse(self):
+        a = new_session_name("lorenz_attractor")
+        b = new_session_name("lorenz_attractor")
+        assert a != b
+        assert parse_session_name(a) == (a, "lorenz_attractor", os.getpid())
+        assert parse_session_name(ring_name(a)) == (a, "lorenz_attractor", os.getpid())
+        assert parse_session_name("pukaha_shared") is None
+
+    def test_registry_and_reclaim(self):
+        live = ResultRing(ring_name(new_session_name("pendulum")), n_cols=2, capacity=4, create=True)
+        # A segment owned by a process that has already exited
+        dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                              capture_output=True, text=True)
+        stale = f"pukaha_pendulum_{int(dead.stdout)}_0"
+        Path(SHM_DIR, stale).write_bytes(b"\0" * 64)
+        try:
+            sessions = list_sessions()
+            live_session = parse_session_name(live.name)[0]
+            assert sessions[live_session]["alive"]
+            assert not sessions[stale]["alive"]
+            reclaimed = reclaim_stale_segments()
+            assert stale in reclaimed
+            assert live.name not in reclaimed
+            assert not Path(SHM_DIR, stale).exists()
+        finally:
+            Path(SHM_DIR, stale).unlink(missing_ok=True)
+            live.close()
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
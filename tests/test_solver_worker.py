@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the persistent solver worker run protocol, using the Python
+stand-in worker in place of the Julia solver.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import gc
+import time
+import ctypes
+import multiprocessing
+from multiprocessing import shared_memory
+import pytest
+import numpy as np
+
+from shared_mem import (
+    ResultRing, RingReader, create_ctypes_struct, seqlock_begin, seqlock_end,
+    new_session_name, ring_name, request_run, wait_for_run
+)
+from solver_worker import run_worker
+
+PARAMS = {"t0": ("c_double", 0.0), "t1": ("c_double", 1.0), "k": ("c_double", 1.0)}
+ParamStruct = create_ctypes_struct(PARAMS)
+DT = 0.01
+
+
+def decay(t, y, p):
+    return -p.k * y
+
+
+class TestStandinWorker:
+    """Test suite for the warm worker: several runs from one process."""
+
+    @pytest.fixture
+    def session(self):
+        session = new_session_name("worker_test")
+        shm = shared_memory.SharedMemory(name=session, create=True,
+                                         size=ctypes.sizeof(ParamStruct))
+        struct = ParamStruct.from_buffer(shm.buf)
+        struct.state = b'i'
+        for name, (_, val) in PARAMS.items():
+            setattr(struct, name, val)
+        ring = ResultRing(ring_name(session), n_cols=2, capacity=1024, create=True)
+        ctx = multiprocessing.get_context("fork")
+        worker = ctx.Process(target=run_worker, args=(session, PARAMS, decay, [1.0], DT))
+        worker.start()
+        del struct
+        yield shm, ring, worker
+        ParamStruct.from_buffer(shm.buf).state = b'q'
+        worker.join(timeout=5)
+        if worker.is_alive():
+            worker.kill()
+        gc.collect()  # drop struct views into the buffer before closing
+        ring.close()
+        shm.close()
+        shm.unlink()
+
+    def test_runs_reuse_one_process(self, session):
+        shm, ring, worker = session
+        struct = ParamStruct.from_buffer(shm.buf)
+        reader = RingReader(ring, ["t", "y"])
+        pid = worker.pid
+
+        run = request_run(struct)
+        assert wait_for_run(struct, run, timeout=10)
+        reader.poll()
+        assert reader.column("t")[-1] == pytest.approx(1.0)
+        assert reader.column("y")[-1] == pytest.approx(np.exp(-1.0), rel=1e-8)
+        assert struct.state == b's'
+
+        # Second run: new parameters and time span, same warm process
+        seqlock_begin(struct)
+        struct.k = 2.0
+        struct.t1 = 0.5
+        seqlock_end(struct)
+        run = request_run(struct)
+        assert wait_for_run(struct, run, timeout=10)
+        reader.poll()
+        assert len(reader) == 51
+        assert reader.column("y")[-1] == pytest.approx(np.exp(-1.0), rel=1e-8)
+        assert worker.is_alive() and worker.pid == pid
+
+    def test_stop_ends_run_but_not_worker(self, session):
+        shm, ring, worker = session
+        struct = ParamStruct.from_buffer(shm.buf)
+        struct.t1 = 1e9
+        run = request_run(struct)
+        while ring.write_index < 10:
+            time.sleep(0.001)
+        struct.state = b's'
+        assert wait_for_run(struct, run, timeout=10)
+        assert worker.is_alive()
+
+    def test_quit(self, session):
+        shm, ring, worker = session
+        struct = ParamStruct.from_buffer(shm.buf)
+        struct.state = b'q'
+        worker.join(timeout=5)
+        assert worker.exitcode == 0
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
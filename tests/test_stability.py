@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+'''
+Unit tests for stability.py: loading eigenvalue files into a complex array
+and the stability figures and reports built from it.
+These run without Julia.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import os
+import pytest
+import numpy as np
+
+from result_io import write_result
+from stability import (
+    StabilitySummary, generate_stability_figures, generate_stability_report_html,
+    generate_stability_report_md, load_eigenvalues, parse_eigen_csv
+)
+
+JULIA_EIGEN_CSV = """t,e1,e2,e3,...
+0.0,-0.5 + 2.0im,-0.5 - 2.0im,-1.0 + 0.0im
+0.5,0.25 + 1.5im,0.25 - 1.5im,−2.0e-3 + 0.0im
+1.0,NaN + NaN*im,-0.1 - 0.0im,-1.0 + 0.0im
+"""
+
+EXPECTED = np.array([[-0.5 + 2j, -0.5 - 2j, -1.0],
+                     [0.25 + 1.5j, 0.25 - 1.5j, -2e-3],
+                     [complex(np.nan, np.nan), -0.1, -1.0]])
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    (tmp_path / "models").mkdir()
+    return tmp_path / "models"
+
+
+class TestLoadEigenvalues:
+    """Test suite for parsing and caching eigenvalue files."""
+
+    def test_julia_csv(self, models_dir):
+        path = models_dir / "m_eigen.csv"
+        path.write_text(JULIA_EIGEN_CSV)
+        t, eigs = parse_eigen_csv(path)
+        assert t.dtype == np.float64 and eigs.dtype == np.complex128
+        np.testing.assert_array_equal(t, [0.0, 0.5, 1.0])
+        np.testing.assert_array_equal(eigs, EXPECTED)
+
+    def test_malformed_cells_are_nan(self, models_dir):
+        path = models_dir / "m_eigen.csv"
+        path.write_text("0.0,-1.0 + 1.0im\n0.5,garbage\n")
+        t, eigs = parse_eigen_csv(path)
+        np.testing.assert_array_equal(t, [0.0, 0.5])
+        assert eigs[0, 0] == -1 + 1j
+        assert np.isnan(eigs[1, 0])
+
+    def test_binary_matches_csv(self, models_dir):
+        (models_dir / "m_eigen.csv").write_text(JULIA_EIGEN_CSV)
+        t_csv, eigs_csv = load_eigenvalues("m", models_dir)
+        write_result(models_dir / "m_eigen.pkr", ["t", "e1", "e2", "e3"],
+                     np.column_stack([t_csv, eigs_csv]), dtype=np.complex128)
+        t, eigs = load_eigenvalues("m", models_dir)
+        np.testing.assert_array_equal(t, t_csv)
+        np.testing.assert_array_equal(eigs, eigs_csv)
+
+    def test_cached_until_file_changes(self, models_dir):
+        path = models_dir / "m_eigen.csv"
+        path.write_text(JULIA_EIGEN_CSV)
+        first = load_eigenvalues("m", models_dir)
+        assert load_eigenvalues("m", models_dir) is first
+        path.write_text(JULIA_EIGEN_CSV + "1.5,-3.0 + 0.0im,-3.0 + 0.0im,-3.0 + 0.0im\n")
+        os.utime(path, ns=(0, 0))
+        t, _ = load_eigenvalues("m", models_dir)
+        assert len(t) == 4
+
+    def test_missing_or_empty(self, models_dir):
+        assert load_eigenvalues("m", models_dir) is None
+        (models_dir / "m_eigen.csv").write_text("t,e1,e2,e3,...\n")
+        assert load_eigenvalues("m", models_dir) is None
+
+
+def loop_intervals(t, max_real):
+    """The original per-sample interval search, as a reference."""
+    intervals, start = [], None
+    for i in range(len(max_real)):
+        if max_real[i] > 0:
+            if start is None:
+                start = t[i]
+        elif start is not None:
+            intervals.append((start, t[i - 1]))
+            start = None
+    if start is not None:
+        intervals.append((start, t[-1]))
+    return intervals
+
+
+class TestStabilitySummary:
+    """Test suite for the array-based stability summary."""
+
+    def test_intervals_match_loop(self):
+        rng = np.random.default_rng(1)
+        t = np.cumsum(rng.uniform(0.01, 0.1, 5000))
+        re = rng.normal(size=(5000, 3)) - 1.2
+        summary = StabilitySummary(t, re.astype(np.complex128))
+        expected = loop_intervals(t, re.max(axis=1))
+        assert summary.n_intervals == len(expected) > 10
+        np.testing.assert_array_equal(summary.starts, [a for a, _ in expected])
+        np.testing.assert_array_equal(summary.ends, [b for _, b in expected])
+        assert summary.n_unstable == np.count_nonzero(re.max(axis=1) > 0)
+        assert summary.worst_value == re.max()
+
+    def test_crossings_interpolated(self):
+        t = np.arange(6.0)
+        re = np.array([1.0, -1.0, -3.0, 1.0, 2.0, 3.0])[:, None]
+        summary = StabilitySummary(t, re.astype(np.complex128))
+        np.testing.assert_array_equal(summary.starts, [0.0, 3.0])
+        np.testing.assert_array_equal(summary.ends, [0.0, 5.0])
+        # Starts unstable: no onset crossing; ends unstable: no recovery
+        np.testing.assert_allclose(summary.onset_times, [np.nan, 2.75])
+        np.testing.assert_allclose(summary.recovery_times, [0.5, np.nan])
+        np.testing.assert_allclose(summary.crossing_times, [0.5, 2.75])
+        assert summary.time_unstable == 2.0
+        assert (summary.worst_time, summary.worst_value) == (5.0, 3.0)
+
+    def test_stable_run(self):
+        t = np.linspace(0.0, 1.0, 11)
+        summary = StabilitySummary(t, np.full((11, 2), -1.0 + 1j))
+        assert summary.stable and summary.n_intervals == 0
+        assert len(summary.crossing_times) == 0
+
+    def test_non_finite_rows_undetermined(self):
+        """NaN eigenvalues (a failed Jacobian) are not counted as stable."""
+        t = np.arange(4.0)
+        eigs = np.array([[-1.0, -2.0], [np.nan, np.nan], [np.nan, -1.0], [np.nan, 0.5]], dtype=np.complex128)
+        summary = StabilitySummary(t, eigs)
+        np.testing.assert_array_equal(summary.undetermined, [False, True, True, False])
+        assert (summary.n_undetermined, summary.n_unstable) == (2, 1)
+        assert not summary.stable
+        summary = StabilitySummary(t[:2], eigs[:2])
+        assert not summary.stable and summary.n_unstable == 0 and summary.worst_index is None
+
+
+class TestStabilityOutput:
+    """Test suite for the figures and report built from the eigen array."""
+
+    def test_figures(self):
+        t = np.array([0.0, 0.5, 1.0])
+        fig_max, fig_reals = generate_stability_figures(t, EXPECTED)
+        np.testing.assert_array_equal(fig_max.data[0].y, [-0.5, 0.25, -0.1])
+        assert [tr.name for tr in fig_reals.data] == ["Re(λ1)", "Re(λ2)", "Re(λ3)"]
+
+    def test_report(self, tmp_path, monkeypatch):
+        (tmp_path / "models").mkdir()
+        monkeypatch.chdir(tmp_path)
+        t = np.array([0.0, 0.5, 1.0])
+        html = open(generate_stability_report_html("m", t, EXPECTED)).read()
+        assert "Number of time steps:</strong> 3" in html
+        assert "Interval 1: t = 0.500 to t = 0.500" in html
+        md = open(generate_stability_report_md("m", t, EXPECTED)).read()
+        assert "Interval 1: $t = 0.500$ to $t = 0.500$" in md
+        assert "Number of time steps**: 3" in md
+        # The last step has a NaN eigenvalue
+        assert "At **1** time steps the eigenvalues were not finite" in md
+        assert "At <strong>1</strong> time steps the eigenvalues were not finite" in html
+
+    def test_report_undetermined(self, tmp_path, monkeypatch):
+        (tmp_path / "models").mkdir()
+        monkeypatch.chdir(tmp_path)
+        t = np.array([0.0, 1.0])
+        eigs = np.array([[-1.0, -2.0], [np.nan, np.nan]], dtype=np.complex128)
+        md = open(generate_stability_report_md("m", t, eigs)).read()
+        assert "Stability Undetermined" in md and "remained stable" not in md
+        html = open(generate_stability_report_html("m", t, eigs)).read()
+        assert "Stability Undetermined" in html and "remained stable" not in html
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])
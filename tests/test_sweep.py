@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the parallel parameter sweep runner, using the NumPy backend
+of the pendulum model over a short time span.
+
+| Copyright © 2025, Bijou M. Smith
+| License: GNU General Public License v3.0  <https://www.gnu.org/licenses/gpl-3.0.html>
+'''
+import pytest
+import numpy as np
+from pathlib import Path
+
+from result_io import open_result
+from sweep import load_index, load_sweep_spec, run_key, run_sweep, sweep_samples, INDEX_NAME
+
+project_root = Path(__file__).resolve().parent.parent
+
+GRID_SPEC = '''
+[sweep]
+mode = "grid"
+method = "RK4"
+
+[sweep.parameters]
+damping = [0.0, 0.5]
+g = { min = 1.0, max = 10.0, n = 3 }
+'''
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    """A models directory holding a short-tspan pendulum backend and spec."""
+    backend = (project_root / "models" / "pendulum_numpy.py").read_text()
+    (tmp_path / "pendulum_numpy.py").write_text(backend.replace("T1 = 100.0", "T1 = 0.5"))
+    (tmp_path / "pendulum_sweep.toml").write_text(GRID_SPEC)
+    return tmp_path
+
+
+class TestSweepSpec:
+    """Test suite for sweep spec expansion."""
+
+    BASE = {"mass": 1.0, "length": 1.0, "damping": 0.1, "g": 9.81}
+
+    def test_grid_is_cartesian_product(self, models_dir):
+        spec = load_sweep_spec("pendulum", models_dir=models_dir)
+        samples = sweep_samples(spec, self.BASE)
+        assert len(samples) == 6
+        assert {s["damping"] for s in samples} == {0.0, 0.5}
+        assert sorted({s["g"] for s in samples}) == [1.0, 5.5, 10.0]
+        assert all(s["mass"] == 1.0 for s in samples)
+
+    def test_lhs_one_sample_per_stratum(self):
+        spec = {"mode": "lhs", "samples": 10, "seed": 3,
+                "parameters": {"g": {"min": 0.0, "max": 10.0}, "damping": {"min": 0.0, "max": 1.0},
+                               "mass": 2.0}}
+        samples = sweep_samples(spec, self.BASE)
+        for name, width in (("g", 1.0), ("damping", 0.1)):
+            strata = sorted(int(s[name] / width) for s in samples)
+            assert strata == list(range(10))
+        assert all(s["mass"] == 2.0 for s in samples)
+
+    def test_lhs_draws_from_value_lists(self):
+        spec = {"mode": "lhs", "samples": 8, "parameters": {"damping": [0.0, 0.5],
+                                                            "g": {"min": 0.0, "max": 10.0}}}
+        samples = sweep_samples(spec, self.BASE)
+        assert sorted(s["damping"] for s in samples) == [0.0] * 4 + [0.5] * 4
+        with pytest.raises(ValueError, match="no values"):
+            sweep_samples({"mode": "lhs", "samples": 2, "parameters": {"g": []}}, self.BASE)
+
+    def test_unknown_parameter(self):
+        with pytest.raises(ValueError, match="not in the model"):
+            sweep_samples({"parameters": {"gravity": [1.0]}}, self.BASE)
+
+    def test_run_key_is_stable(self):
+        assert run_key({"a": 1.0, "b": 2}) == run_key({"b": 2.0, "a": 1.0})
+        assert run_key({"a": 1.0}) != run_key({"a": 1.0000001})
+
+
+class TestRunSweep:
+    """Test suite for running, indexing and resuming a sweep."""
+
+    def test_runs_and_indexes(self, models_dir):
+        out_dir = models_dir / "pendulum_sweep"
+        report = run_sweep("pendulum", jobs=2, models_dir=models_dir)
+        assert report["completed"] == 6 and report["skipped"] == 0
+        index = load_index(out_dir)
+        assert len(index) == 6
+        assert set(index["status"]) == {"ok"}
+        assert (index["n_rows"] == 50).all()
+        for _, row in index.iterrows():
+            data = open_result(out_dir / row["file"]).data
+            assert data[-1, 1] == pytest.approx(row["theta_final"])
+            assert data[:, 2].max() == pytest.approx(row["omega_max"])
+        # Queryable: stronger gravity swings faster
+        fast = index.query("damping == 0.0").sort_values("g")
+        assert fast["omega_min"].is_monotonic_decreasing
+
+    def test_resume_skips_finished_runs(self, models_dir):
+        out_dir = models_dir / "pendulum_sweep"
+        run_sweep("pendulum", jobs=1, models_dir=models_dir)
+        # Simulate an interruption: the last two runs never made the index
+        lines = (out_dir / INDEX_NAME).read_text().splitlines(keepends=True)
+        (out_dir / INDEX_NAME).write_text("".join(lines[:-2]) + lines[-2][:10])
+        report = run_sweep("pendulum", jobs=1, models_dir=models_dir)
+        assert report["skipped"] == 4
+        assert report["completed"] == 2
+        assert len(load_index(out_dir)) == 6
+
+    def test_resume_reruns_torn_record(self, models_dir):
+        """A half-written last line names its run but must not count as done."""
+        out_dir = models_dir / "pendulum_sweep"
+        run_sweep("pendulum", jobs=1, models_dir=models_dir)
+        path = out_dir / INDEX_NAME
+        lines = path.read_text().splitlines(keepends=True)
+        torn_run = load_index(out_dir)["run_id"].iloc[-1]
+        torn = lines[-1][:lines[-1].index(torn_run) + len(torn_run) + 1]
+        path.write_text("".join(lines[:-1]) + torn)
+        assert len(load_index(out_dir)) == 5
+        report = run_sweep("pendulum", jobs=1, models_dir=models_dir)
+        assert report["skipped"] == 5 and report["completed"] == 1
+        index = load_index(out_dir)
+        assert len(index) == 6 and torn_run in set(index["run_id"])
+        assert index["status"].notna().all()
+
+    def test_resume_retries_failed_runs(self, models_dir):
+        out_dir = models_dir / "pendulum_sweep"
+        run_sweep("pendulum", jobs=1, models_dir=models_dir)
+        index = load_index(out_dir)
+        failed_run = index["run_id"].iloc[2]
+        index.loc[2, "status"] = "failed: solver error"
+        index.to_csv(out_dir / INDEX_NAME, index=False)
+        report = run_sweep("pendulum", jobs=1, models_dir=models_dir)
+        assert report["skipped"] == 5 and report["completed"] == 1
+        # The retry's record supersedes the failed one
+        index = load_index(out_dir)
+        assert len(index) == 6 and set(index["status"]) == {"ok"}
+        assert index["run_id"].iloc[-1] == failed_run
+        assert run_sweep("pendulum", jobs=1, models_dir=models_dir)["completed"] == 0
+
+
+if __name__ == "__main__":
+    # Allow running the test directly
+    pytest.main([__file__, "-v"])